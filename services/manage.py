@@ -7,6 +7,8 @@ import sys
 def main():
     """Run administrative tasks."""
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'translation.settings')
+    # Commands run in a single process, so the local memory cache can be used for the caches of WIKI_SINGLE_PROCESS
+    os.environ.setdefault('WIKI_SINGLE_PROCESS', '1')
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
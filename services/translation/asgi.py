@@ -9,8 +9,22 @@ https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'translation.settings')
 
-application = get_asgi_application()
+# Same as get_asgi_application(), with the handler which streams the responses read from the DB on the thread of the request
+django.setup(set_prefix=False)
+
+# Imported once the apps are loaded. SentenceEvents streams the sentence changes of the projects, and passes the other requests to django
+from wiki_translation.events import SentenceEvents
+from wiki_translation.handlers import ASGIHandler
+
+django_application = ASGIHandler()
+
+application = SentenceEvents(django_application)
+
+# Builds the transliteration indexes of TRANSLITERATION['WARM_LANGUAGES'] in the background
+from wiki_translation.transliteration import option, transliterator
+
+transliterator.warm(option('WARM_LANGUAGES', []))
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -45,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Records the timings of every request when WIKI_METRICS is enabled, it is left out otherwise
+    'wiki_translation.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -84,13 +87,52 @@ WSGI_APPLICATION = 'translation.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# The database is chosen with environment variables. DATABASE_ENGINE is sqlite (default) or postgresql
+DATABASE_ENGINE = os.environ.get('DATABASE_ENGINE', 'sqlite')
+
+if DATABASE_ENGINE == 'postgresql':
+    # Needs psycopg2 (pip install psycopg2-binary)
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DATABASE_NAME', 'translation'),
+            'USER': os.environ.get('DATABASE_USER', ''),
+            'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+            'HOST': os.environ.get('DATABASE_HOST', ''),
+            'PORT': os.environ.get('DATABASE_PORT', ''),
+            # Seconds a connection is kept open for the next requests. 0 closes it at the end of each request
+            'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            # DATABASE_POOLER=pgbouncer when connecting through PgBouncer in transaction pooling mode.
+            # The pooler may give each transaction a different server connection, which breaks server side cursors
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DATABASE_POOLER', '') == 'pgbouncer',
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            # Same as django.db.backends.sqlite3, but begins the transactions in SQLITE_TRANSACTION_MODE
+            'ENGINE': 'wiki_translation.backends.sqlite3',
+            'NAME': os.environ.get('DATABASE_NAME', BASE_DIR / 'db.sqlite3'),
+        }
     }
+
+# Journal mode of the SQLite DB. It is stored in the DB file, so it is set once with `manage.py configure_sqlite`.
+# WAL lets the readers work during a write
+SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+
+# PRAGMAs run on every new SQLite connection. NORMAL sync is safe with WAL and skips a fsync per commit,
+# and a writer waits busy_timeout milliseconds for the lock instead of failing with "database is locked"
+SQLITE_PRAGMAS = {
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
 }
 
+# IMMEDIATE transactions take the write lock when they begin. Saves read the sentences before writing them,
+# and a DEFERRED transaction fails at once when another save commits between its read and its write
+SQLITE_TRANSACTION_MODE = os.environ.get('SQLITE_TRANSACTION_MODE', 'IMMEDIATE')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -135,7 +177,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'wiki_translation.authentication.StatelessJWTAuthentication',
     ),
 }
 
@@ -144,3 +186,103 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
 
+# Tokens carry the role of the user, so requests are authenticated without loading the user and its groups.
+# Claims are trusted for USER_CACHE_TTL seconds, or until the role of the user changes, then they are checked against the DB.
+# Role changes are read from the revocation list in the cache, so the claims are only trusted when the cache is shared (see CACHES)
+WIKI_AUTH = {
+    'STATELESS': os.environ.get('WIKI_AUTH_STATELESS', '1') == '1',
+    'USER_CACHE_SIZE': 1000,
+    'USER_CACHE_TTL': 5 * 60,
+}
+
+# Roles, the user directory, the revocation list of the tokens and the project lists are cached in the default cache.
+# With more than one worker process (uvicorn --workers, gunicorn) the cache has to be shared by all of them, like redis or memcached:
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache CACHE_LOCATION=redis://127.0.0.1:6379
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# Lets the caches use the local memory cache, see wiki_translation.shared_cache.is_shared. manage.py sets it.
+# Set WIKI_SINGLE_PROCESS=1 for a server started with one worker
+WIKI_SINGLE_PROCESS = os.environ.get('WIKI_SINGLE_PROCESS', '0') == '1'
+
+# Cache of the serialized project list of each user and role. CACHE is the alias of the django cache used for it, any backend can be
+# used, as long as it is shared by the processes (see CACHES).
+# Lists are invalidated when their projects change, TIMEOUT only limits how long unused lists are kept
+PROJECT_LIST_CACHE = {
+    'ENABLED': os.environ.get('PROJECT_LIST_CACHE_ENABLED', '1') == '1',
+    'CACHE': os.environ.get('PROJECT_LIST_CACHE_ALIAS', 'default'),
+    'TIMEOUT': 5 * 60,
+}
+
+# Number of project ids of the urls kept with the integer keys of their projects, per process
+PROJECT_RESOLVER = {
+    'SIZE': 10000,
+}
+
+# Backend used for running the sentence ingestion of new projects.
+# Any class with a submit(fn, *args) method can be used
+INGESTION_BACKEND = {
+    'BACKEND': 'wiki_translation.ingestion.ThreadPoolBackend',
+    'OPTIONS': {
+        'max_workers': 4,
+    },
+}
+
+# Change feed of the sentence edits, streamed to the clients by GET /wiki/<project_id>/sentence/events under ASGI.
+# BACKEND is the pub/sub the saves are published to. The in process one only reaches the clients of the same process,
+# a class with the same methods can share the events of every process through a broker like redis.
+# Clients with queue_size events waiting are told to reload instead, and a comment is sent on idle streams every KEEPALIVE seconds
+CHANGE_FEED = {
+    'BACKEND': 'wiki_translation.changes.InProcessPubSub',
+    'OPTIONS': {
+        'queue_size': 1000,
+    },
+    'KEEPALIVE': 15,
+    # Seconds a ticket of the event stream can be used to connect
+    'TICKET_SECONDS': 30,
+}
+
+# Minutes after which the recover_ingestion command takes the job of an unfinished project as lost
+INGESTION_STALE_MINUTES = 30
+
+# Max number of articles fetched from wikipedia at the same time by a batch of projects
+INGESTION_FETCH_CONCURRENCY = 4
+
+# Cache of wikipedia summaries. Entries expire after TTL seconds and the least recently used
+# entries above MAX_ENTRIES are evicted. CHECK_REVISION refetches the page when a new revision is published.
+# LOCAL_ARTICLES takes the summaries from the articles imported by import_wikipedia_dump before fetching them from wikipedia
+WIKI_ARTICLE_CACHE = {
+    'MAX_ENTRIES': 1000,
+    'TTL': 24 * 60 * 60,
+    'CHECK_REVISION': False,
+    'LOCAL_ARTICLES': os.environ.get('WIKI_LOCAL_ARTICLES', '1') == '1',
+}
+
+# Transliteration suggestions. LEXICON_DIR has the optional seed lexicons, <language>.tsv with "word<TAB>latin<TAB>count" lines
+# (the lexicons of the Dakshina dataset can be used as they are). LRU_SIZE is the number of ranked prefixes cached per language.
+# Indexes are rebuilt in the background when the translations of the language were changed by another process, checked every REFRESH_SECONDS.
+# WARM_LANGUAGES are built in the background when the server starts, comma separated in the environment
+TRANSLITERATION = {
+    'LEXICON_DIR': BASE_DIR / 'transliteration',
+    'LRU_SIZE': 10000,
+    'REFRESH_SECONDS': 300,
+    'WARM_LANGUAGES': [language for language in os.environ.get('TRANSLITERATION_WARM_LANGUAGES', '').split(',') if language],
+}
+
+# Local nltk data directory with the punkt model (python -m nltk.downloader -d nltk_data punkt).
+# The model is loaded once at startup and is never downloaded while serving requests
+NLTK_DATA_PATH = os.environ.get('NLTK_DATA_PATH', BASE_DIR / 'nltk_data')
+
+# Per request timings of DB queries, serializers, wikipedia requests and tokenization.
+# When enabled, they are sent in the Server-Timing header and as Prometheus histograms per view on /metrics
+WIKI_METRICS = {
+    'ENABLED': os.environ.get('WIKI_METRICS_ENABLED', '') == '1',
+    'SERVER_TIMING': True,
+    # GET /metrics is served to requests with this bearer token, or from these addresses only
+    'TOKEN': os.environ.get('WIKI_METRICS_TOKEN', ''),
+    'ALLOWED_IPS': [ip for ip in os.environ.get('WIKI_METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',') if ip],
+}
@@ -15,8 +15,10 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from wiki_translation.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('wiki/', include('wiki_translation.urls'))
+    path('wiki/', include('wiki_translation.urls')),
+    path('metrics', metrics_view)
 ]
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'translation.settings')
 
 application = get_wsgi_application()
+
+# Builds the transliteration indexes of TRANSLITERATION['WARM_LANGUAGES'] in the background
+from wiki_translation.transliteration import option, transliterator
+
+transliterator.warm(option('WARM_LANGUAGES', []))
@@ -4,3 +4,19 @@ from django.apps import AppConfig
 class WikiTranslationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'wiki_translation'
+
+    def ready(self):
+        #Load the sentence tokenizer once at startup, so requests never load or download it.
+        #A missing model does not stop the startup: it is reported by the wiki_translation.E001 check of check --deploy,
+        #and tokenizing raises ImproperlyConfigured till it is downloaded
+        from django.core.exceptions import ImproperlyConfigured
+        from . import tokenizer
+        try:
+            tokenizer.load()
+        except ImproperlyConfigured as e:
+            tokenizer.logger.warning('%s', e)
+        #Registers the hook which tunes every new SQLite connection
+        from . import database
+        #Registers the signals which invalidate the cached roles, user directory and project lists, write the translation memory keys and segment store,
+        #and count out the deleted sentences
+        from . import roles, directory, project_cache, memory, segments, progress
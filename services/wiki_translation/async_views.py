@@ -0,0 +1,173 @@
+import json
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from .etags import add_etag, check_conditions, project_etag, projects_etag, sentence_etag, sentences_etag
+from .models import Project, Sentence
+from .pagination import SentenceCursorPagination
+from .serializers import ProjectSerializer, SentenceSerializer
+from .ingestion import start_async_ingestion, start_ingestion
+from .project_cache import project_resolver
+from .roles import get_role, has_project_access, is_manager, scoped_projects
+from .views import filter_sentences
+
+#Async views of the read endpoints and of the project creation, for ASGI servers.
+#DRF views are sync only, so these are plain Django views with the same authentication, permissions and responses
+
+def json_response(data, status = 200, headers = None):
+    #Same JSON as the DRF renderer, which keeps the Indic text unescaped
+    return JsonResponse(data, status = status, headers = headers, safe = False, json_dumps_params = {'ensure_ascii': False})
+
+def error_response(error, status):
+    return json_response({'error': error}, status = status)
+
+def authenticate(request):
+    #Same authentication classes as the DRF views. Returns the user, or None when no credentials are given
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        result = authentication_class().authenticate(request)
+        if (result is not None):
+            return result[0]
+    return None
+
+async def authenticate_request(request):
+    #IsAuthenticated and HasProjectRole checks. Returns (user, role, None), or (None, None, error response)
+    try:
+        #Stateless tokens need no query, the others load the user on the worker thread of the async ORM
+        user = await sync_to_async(authenticate)(request)
+    except AuthenticationFailed as e:
+        detail = e.detail.get('detail', e.detail) if isinstance(e.detail, dict) else e.detail
+        return None, None, error_response(str(detail), status.HTTP_401_UNAUTHORIZED)
+    if (user is None):
+        return None, None, error_response('Authentication credentials were not provided.', status.HTTP_401_UNAUTHORIZED)
+    role = await sync_to_async(get_role)(user)
+    if (role is None):
+        return None, None, error_response('Not enough permission', status.HTTP_403_FORBIDDEN)
+    return user, role, None
+
+#Decorator: Async counterpart of @api_view with the IsAuthenticated and HasProjectRole permissions. The view gets the role of the user
+def async_api_view(methods):
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if (request.method not in methods):
+                return error_response(f'Method "{request.method}" not allowed.', status.HTTP_405_METHOD_NOT_ALLOWED)
+            user, role, error = await authenticate_request(request)
+            if (error is not None):
+                return error
+            request.user = user
+            return await view(request, role, *args, **kwargs)
+        #Requests are authenticated by tokens like the DRF views. csrf_exempt of Django 4.1 would make the view sync
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+def create_project(data):
+    #Validation queries the DB, so the whole save runs on the worker thread of the async ORM
+    serializer = ProjectSerializer(data = data)
+    if (serializer.is_valid()):
+        return serializer.save(status = Project.Status.PENDING), serializer.data
+    return None, serializer.errors
+
+#GET and POST async API for path "async/"
+@async_api_view(['GET', 'POST'])
+async def async_project_view(request, role):
+    if (request.method == 'GET'):
+        projects = [project async for project in scoped_projects(request.user, role)]
+        etag = projects_etag(projects)
+        not_modified = check_conditions(request, etag)
+        if (not_modified is not None):
+            return not_modified
+        return add_etag(json_response(ProjectSerializer(projects, many = True).data), etag)
+
+    if (not is_manager(role)):
+        return error_response('Not enough permission', status.HTTP_403_FORBIDDEN)
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return error_response('Body should be a JSON object', status.HTTP_400_BAD_REQUEST)
+    if (not isinstance(data, dict)):
+        return error_response('Body should be a JSON object', status.HTTP_400_BAD_REQUEST)
+    try:
+        #Set the created_by field before saving with current user
+        data['created_by'] = request.user.id
+        project, result = await sync_to_async(create_project)(data)
+        if (project is None):
+            return json_response(result, status = status.HTTP_400_BAD_REQUEST)
+        if (isinstance(request, ASGIRequest)):
+            #Fetch waits on the event loop of the server
+            start_async_ingestion(project)
+        else:
+            #Under WSGI the event loop ends with the request, so the job goes to the ingestion backend
+            await sync_to_async(start_ingestion)(project)
+    except Exception as e:
+        #Return with error message to show the cause of failure
+        return error_response(str(e), status.HTTP_500_INTERNAL_SERVER_ERROR)
+    status_url = request.build_absolute_uri(reverse(async_project_status_view, args = [project.project_id]))
+    return json_response(dict(result, status_url = status_url), status = status.HTTP_202_ACCEPTED, headers = {'Location': status_url})
+
+#GET async API for path "async/project/<str:project_id>"
+@async_api_view(['GET'])
+async def async_single_project_view(request, role, project_id):
+    try:
+        project = await project_resolver.aget_project(scoped_projects(request.user, role), project_id)
+    except Project.DoesNotExist as e:
+        return error_response(str(e), status.HTTP_404_NOT_FOUND)
+    etag = project_etag(project)
+    not_modified = check_conditions(request, etag)
+    if (not_modified is not None):
+        return not_modified
+    return add_etag(json_response(ProjectSerializer(project).data), etag)
+
+#GET async API for path "async/project/<str:project_id>/status"
+@async_api_view(['GET'])
+async def async_project_status_view(request, role, project_id):
+    try:
+        project = await project_resolver.aget_project(scoped_projects(request.user, role).only('project_id', 'status', 'status_message'), project_id)
+    except Project.DoesNotExist as e:
+        return error_response(str(e), status.HTTP_404_NOT_FOUND)
+    return json_response({'project_id': project.project_id, 'status': project.status, 'error': project.status_message})
+
+#GET async API for path "async/<str:project_id>/sentence"
+@async_api_view(['GET'])
+async def async_sentences_view(request, role, project_id):
+    try:
+        project = await project_resolver.aget_project(scoped_projects(request.user, role), project_id)
+    except Project.DoesNotExist as e:
+        return error_response(str(e), status.HTTP_404_NOT_FOUND)
+    etag = sentences_etag(project, request.GET)
+    not_modified = check_conditions(request, etag)
+    if (not_modified is not None):
+        return not_modified
+    sentences, fields, error = filter_sentences(Sentence.objects.filter(project = project).order_by('sentence_id'), request.GET)
+    if (error):
+        return error_response(error, status.HTTP_400_BAD_REQUEST)
+
+    if ('cursor' in request.GET or 'limit' in request.GET):
+        #Same cursor pagination as the sync view, the page is read on the worker thread of the async ORM
+        paginator = SentenceCursorPagination()
+        page = await sync_to_async(paginator.paginate_queryset)(sentences, Request(request))
+        return add_etag(json_response(paginator.get_paginated_response(SentenceSerializer(page, many = True, fields = fields).data).data), etag)
+
+    sentences = [sentence async for sentence in sentences]
+    return add_etag(json_response(SentenceSerializer(sentences, many = True, fields = fields).data), etag)
+
+#GET async API for path "async/sentence/<int:sentence_id>"
+@async_api_view(['GET'])
+async def async_single_sentence_view(request, role, sentence_id):
+    try:
+        sentence = await Sentence.objects.select_related('project').aget(sentence_id = sentence_id)
+    except Sentence.DoesNotExist as e:
+        return error_response(str(e), status.HTTP_404_NOT_FOUND)
+    if (not has_project_access(request.user, sentence.project, role)):
+        return error_response('Not enough permission', status.HTTP_403_FORBIDDEN)
+    etag = sentence_etag(sentence)
+    not_modified = check_conditions(request, etag)
+    if (not_modified is not None):
+        return not_modified
+    return add_etag(json_response(SentenceSerializer(sentence).data), etag)
@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from .roles import NO_ROLE, SUPERUSER, get_role, revoked_since
+from .shared_cache import is_shared
+
+#Claims added to the tokens at login. Access tokens made by a refresh copy them from the refresh token
+ROLE_CLAIM = 'role'
+USERNAME_CLAIM = 'username'
+AUTH_TIME_CLAIM = 'auth_time'
+
+def option(name, default):
+    return getattr(settings, 'WIKI_AUTH', {}).get(name, default)
+
+def token_for_user(user):
+    #Returns the refresh token of the user, with the role of the user at login time
+    refresh = RefreshToken.for_user(user)
+    refresh[ROLE_CLAIM] = get_role(user) or NO_ROLE
+    refresh[USERNAME_CLAIM] = user.get_username()
+    refresh[AUTH_TIME_CLAIM] = time.time()
+    return refresh
+
+#Fields of the user kept by the cache and the claims, the ones the views use
+USER_FIELDS = ('username', 'is_superuser', 'is_active')
+
+def build_user(user_id, fields, role):
+    #User built without a query. Only the fields the views use are known, which is enough to use it as a foreign key.
+    #A new instance is built for every request, so the requests never share one, nor the role kept on it by get_role
+    user = User(pk = user_id, **fields)
+    user._state.adding = False
+    user._state.db = DEFAULT_DB_ALIAS
+    user._wiki_role = role
+    return user
+
+#Small LRU of users per process. Each entry keeps the fields of the user, the role and the time the role was last known to be right
+class UserCache:
+
+    def __init__(self, max_entries = None):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_max_entries(self):
+        return self.max_entries if self.max_entries is not None else option('USER_CACHE_SIZE', 1000)
+
+    def get(self, user_id, role, valid_since):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if (entry is None or entry[1] != role or entry[2] <= valid_since):
+                return None
+            self.entries.move_to_end(user_id)
+        return build_user(user_id, entry[0], role)
+
+    def set(self, user, role, checked_on):
+        fields = {name: getattr(user, name) for name in USER_FIELDS}
+        with self.lock:
+            self.entries[user.pk] = (fields, role, checked_on)
+            self.entries.move_to_end(user.pk)
+            while (len(self.entries) > self.get_max_entries()):
+                self.entries.popitem(last = False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+#Shared by every request of the process
+user_cache = UserCache()
+
+def user_from_claims(user_id, validated_token):
+    #Tokens are only issued to active users. A user deactivated since is in the revocation list, as the save invalidates the role,
+    #so the claims of the token are not trusted anymore and the user is loaded from the DB, which rejects it
+    role = validated_token[ROLE_CLAIM]
+    return build_user(user_id, {'username': validated_token.get(USERNAME_CLAIM, ''), 'is_superuser': role == SUPERUSER, 'is_active': True}, role)
+
+#Authentication: Trusts the role claims of the token, and loads the user from the DB only when the claims may be stale
+class StatelessJWTAuthentication(JWTAuthentication):
+
+    def get_user(self, validated_token):
+        if (ROLE_CLAIM not in validated_token or AUTH_TIME_CLAIM not in validated_token or not option('STATELESS', True) or not is_shared()):
+            #Tokens issued before the claims were added, or no shared cache (see is_shared)
+            return super().get_user(validated_token)
+        user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        role = validated_token[ROLE_CLAIM]
+        now = time.time()
+        #Claims older than the TTL or than the last role change are checked against the DB
+        valid_since = max(now - option('USER_CACHE_TTL', 5 * 60), revoked_since(user_id))
+
+        user = user_cache.get(user_id, role, valid_since)
+        if (user is not None):
+            return user
+        if (validated_token[AUTH_TIME_CLAIM] > valid_since):
+            user = user_from_claims(user_id, validated_token)
+            user_cache.set(user, role, validated_token[AUTH_TIME_CLAIM])
+            return user
+
+        #Falls back to the DB. Inactive or deleted users are rejected here
+        user = super().get_user(validated_token)
+        if ((get_role(user) or NO_ROLE) == role):
+            user_cache.set(user, role, now)
+        #Otherwise the role changed, the token keeps hitting the DB till the user logs in again
+        return user
@@ -0,0 +1,10 @@
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+#SQLite backend which starts the transactions in SQLITE_TRANSACTION_MODE
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def _start_transaction_under_autocommit(self):
+        #A DEFERRED transaction which reads and then writes fails at once with "database is locked" when another connection
+        #has written in between, and busy_timeout does not help there. IMMEDIATE takes the write lock at BEGIN, so the writers wait for each other
+        self.cursor().execute(f'BEGIN {getattr(settings, "SQLITE_TRANSACTION_MODE", "DEFERRED")}')
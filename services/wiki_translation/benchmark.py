@@ -0,0 +1,264 @@
+import gc
+import json
+import random
+import time
+from contextlib import contextmanager
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from .authentication import token_for_user
+from .models import ArticleCacheEntry, Project, Sentence
+from .memory import translation_memory
+from .progress import repair_progress
+from .roles import ANNOTATOR, MANAGER
+from .utils import article_cache, normalizeTitle
+from . import async_views, views
+
+try:
+    import resource
+except ImportError:
+    #Not available on Windows, peak RSS is not recorded there
+    resource = None
+
+#Generated users, projects and run data are found with these prefixes
+USER_PREFIX = 'bench_'
+TITLE_PREFIX = 'Bench_'
+RUN_TITLE_PREFIX = 'Bench_Run_'
+PASSWORD = 'benchmark'
+
+LANGUAGES = ['te', 'ta', 'hi', 'kn', 'ml']
+
+#Words of the synthetic sentences. A small vocabulary gives the search and the translation memory realistic overlaps
+WORDS = ('india country river mountain people language history state capital city population north south east west '
+         'culture music film temple king empire trade war peace science school university border coast island').split()
+
+#Rows written per query while generating the data
+GENERATE_BATCH_SIZE = 2000
+
+#A p95 regression smaller than this is noise, whatever the threshold is
+MIN_REGRESSION_MS = 2.0
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else 0
+
+def peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource is not None else None
+
+def synthetic_sentence(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(6, 14))).capitalize() + '.'
+
+def clear_data():
+    #Projects and sentences are deleted along with the users who created them
+    User.objects.filter(username__startswith = USER_PREFIX).delete()
+
+def generate_data(projects = 200, sentences = 50, managers = 10, annotators = 50, translated = 0.5, seed = 1, log = None):
+    #Creates superuser, Manager and Annotator users, and projects with sentences, of which the given fraction is translated
+    rng = random.Random(seed)
+    clear_data()
+    manager_group, _ = Group.objects.get_or_create(name = MANAGER)
+    annotator_group, _ = Group.objects.get_or_create(name = ANNOTATOR)
+    #Hashing is slow, so all the users get the same hash
+    password = make_password(PASSWORD)
+    User.objects.bulk_create([User(username = f'{USER_PREFIX}superuser', password = password, is_superuser = True, is_staff = True)] +
+                             [User(username = f'{USER_PREFIX}manager_{i}', password = password) for i in range(managers)] +
+                             [User(username = f'{USER_PREFIX}annotator_{i}', password = password) for i in range(annotators)])
+    manager_ids = list(User.objects.filter(username__startswith = f'{USER_PREFIX}manager_').order_by('id').values_list('id', flat = True))
+    annotator_ids = list(User.objects.filter(username__startswith = f'{USER_PREFIX}annotator_').order_by('id').values_list('id', flat = True))
+    manager_group.user_set.add(*manager_ids)
+    annotator_group.user_set.add(*annotator_ids)
+
+    now = timezone.now()
+    for start in range(0, projects, GENERATE_BATCH_SIZE):
+        batch = []
+        for i in range(start, min(start + GENERATE_BATCH_SIZE, projects)):
+            title = f'{TITLE_PREFIX}{i:06d}'
+            language = LANGUAGES[i % len(LANGUAGES)]
+            batch.append(Project(article_title = title, target_language = language, project_id = f'{language}_{title.lower()}',
+                                 created_on = now, created_by_id = manager_ids[i % len(manager_ids)], assigned_to = annotator_ids[i % len(annotator_ids)]))
+        Project.objects.bulk_create(batch)
+        #Sentences are written a batch at a time, so the memory used does not depend on the scale
+        rows = []
+        for project in batch:
+            for _ in range(sentences):
+                rows.append(Sentence(project = project, original_sentence = synthetic_sentence(rng),
+                                     translated_sentence = synthetic_sentence(rng) if rng.random() < translated else ''))
+                if (len(rows) == GENERATE_BATCH_SIZE):
+                    #bulk_create does not send post_save, so the keys of the translation memory are added here
+                    translation_memory.add(Sentence.objects.bulk_create(rows))
+                    rows = []
+        translation_memory.add(Sentence.objects.bulk_create(rows))
+        if (log is not None):
+            log(f'{min(start + GENERATE_BATCH_SIZE, projects)}/{projects} projects')
+    #bulk_create does not update the progress counters
+    repair_progress()
+
+def offline_summary(title, language = 'en'):
+    #Offline stand-in for wikipedia, the same title always gets the same summary
+    rng = random.Random(title)
+    return ' '.join(synthetic_sentence(rng) for _ in range(20))
+
+@contextmanager
+def offline_wikipedia():
+    fetcher, revision_fetcher = article_cache.fetcher, article_cache.revision_fetcher
+    article_cache.fetcher, article_cache.revision_fetcher = offline_summary, lambda title, language: 1
+    try:
+        yield
+    finally:
+        article_cache.fetcher, article_cache.revision_fetcher = fetcher, revision_fetcher
+
+#Users, project and sentences the scenarios work on
+class BenchmarkData:
+
+    def __init__(self):
+        self.superuser = User.objects.get(username = f'{USER_PREFIX}superuser')
+        self.manager = User.objects.get(username = f'{USER_PREFIX}manager_0')
+        self.project = Project.objects.filter(created_by = self.manager).order_by('project_id').first()
+        self.annotator = User.objects.get(id = self.project.assigned_to)
+        self.sentence_ids = list(Sentence.objects.filter(project = self.project).order_by('sentence_id').values_list('sentence_id', flat = True))
+        self.refresh = str(token_for_user(self.annotator))
+        self.run_id = int(time.time())
+        self.last_sentence_id = Sentence.objects.order_by('-sentence_id').values_list('sentence_id', flat = True).first() or 0
+        self.clients = {}
+
+    def client(self, user):
+        #Requests are authenticated with the access token of a login, so the authentication is measured as well
+        if (user.id not in self.clients):
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION = f'Bearer {token_for_user(user).access_token}')
+            self.clients[user.id] = client
+        return self.clients[user.id]
+
+    def cleanup(self):
+        #Removes the projects and sentences created by the scenarios
+        Project.objects.filter(article_title__startswith = RUN_TITLE_PREFIX).delete()
+        ArticleCacheEntry.objects.filter(title__startswith = normalizeTitle(RUN_TITLE_PREFIX)).delete()
+        Sentence.objects.filter(project = self.project, sentence_id__gt = self.last_sentence_id).delete()
+
+def sentence_patch(data, i):
+    rng = random.Random(i)
+    return [{'sentence_id': sentence_id, 'translated_sentence': f'Translation {i}'} for sentence_id in rng.sample(data.sentence_ids, min(20, len(data.sentence_ids)))]
+
+def run_title(data, i):
+    return f'{RUN_TITLE_PREFIX}{data.run_id}_{i}'
+
+#Scenarios: name -> (route of wiki_translation/urls.py, request). Every route has at least one scenario
+SCENARIOS = {
+    'projects GET superuser': ('', lambda data, i: data.client(data.superuser).get(reverse(views.project_view))),
+    'projects GET manager': ('', lambda data, i: data.client(data.manager).get(reverse(views.project_view))),
+    'projects GET annotator': ('', lambda data, i: data.client(data.annotator).get(reverse(views.project_view))),
+    'projects POST': ('', lambda data, i: data.client(data.manager).post(reverse(views.project_view), {'article_title': run_title(data, i), 'target_language': 'te'}, format = 'json')),
+    'batch POST': ('batch/', lambda data, i: data.client(data.manager).post(reverse(views.project_batch_view),
+                                                                           {'article_titles': [f'{run_title(data, i)}_{n}' for n in range(5)], 'target_languages': ['te', 'hi']}, format = 'json')),
+    'login POST': ('login/', lambda data, i: APIClient().post(reverse(views.login_api), {'username': data.annotator.username, 'password': PASSWORD})),
+    'login refresh POST': ('login/refresh/', lambda data, i: APIClient().post(reverse(views.token_refresh_api), {'refresh_token': data.refresh}, format = 'json')),
+    'sentences GET': ('<str:project_id>/sentence', lambda data, i: data.client(data.annotator).get(reverse(views.sentences_view, args = [data.project.project_id]))),
+    'sentences GET page': ('<str:project_id>/sentence', lambda data, i: data.client(data.annotator).get(reverse(views.sentences_view, args = [data.project.project_id]), {'limit': 100})),
+    'sentences POST': ('<str:project_id>/sentence', lambda data, i: data.client(data.manager).post(reverse(views.sentences_view, args = [data.project.project_id]),
+                                                                                                   {'original_sentence': f'Benchmark sentence {i}.', 'project': data.project.project_id}, format = 'json')),
+    'sentences PATCH': ('<str:project_id>/sentence', lambda data, i: data.client(data.annotator).patch(reverse(views.sentences_view, args = [data.project.project_id]),
+                                                                                                       sentence_patch(data, i), format = 'json')),
+    'events ticket POST': ('<str:project_id>/sentence/events/ticket', lambda data, i: data.client(data.annotator).post(reverse(views.sentence_events_ticket_view, args = [data.project.project_id]))),
+    'suggestions GET': ('<str:project_id>/sentence/suggestions', lambda data, i: data.client(data.annotator).get(reverse(views.sentence_suggestions_view, args = [data.project.project_id]), {'limit': 20})),
+    'sentence GET': ('sentence/<int:sentence_id>', lambda data, i: data.client(data.annotator).get(reverse(views.single_sentence_view, args = [data.sentence_ids[i % len(data.sentence_ids)]]))),
+    'sentence PATCH': ('sentence/<int:sentence_id>', lambda data, i: data.client(data.annotator).patch(reverse(views.single_sentence_view, args = [data.sentence_ids[i % len(data.sentence_ids)]]),
+                                                                                                       {'translated_sentence': f'Translation {i}'}, format = 'json')),
+    'users GET': ('users/', lambda data, i: data.client(data.manager).get(reverse(views.getUsers))),
+    'export GET': ('export/', lambda data, i: data.client(data.annotator).get(reverse(views.export_view), {'type': 'jsonl', 'project': data.project.project_id})),
+    'search GET': ('search/', lambda data, i: data.client(data.annotator).get(reverse(views.search_view), {'q': WORDS[i % len(WORDS)]})),
+    'transliterate GET': ('transliterate/', lambda data, i: data.client(data.annotator).get(reverse(views.transliteration_view),
+                                                                                            {'lang': LANGUAGES[i % len(LANGUAGES)], 'prefix': WORDS[i % len(WORDS)][:1 + i % 4]})),
+    'project GET': ('project/<str:project_id>', lambda data, i: data.client(data.manager).get(reverse(views.single_project_view, args = [data.project.project_id]))),
+    'project PATCH': ('project/<str:project_id>', lambda data, i: data.client(data.manager).patch(reverse(views.single_project_view, args = [data.project.project_id]),
+                                                                                                  {'assigned_to': data.annotator.id}, format = 'json')),
+    'project status GET': ('project/<str:project_id>/status', lambda data, i: data.client(data.annotator).get(reverse(views.project_status_view, args = [data.project.project_id]))),
+    #Async views, run by the test client through async_to_sync like a WSGI server would
+    'async projects GET': ('async/', lambda data, i: data.client(data.manager).get(reverse(async_views.async_project_view))),
+    'async projects POST': ('async/', lambda data, i: data.client(data.manager).post(reverse(async_views.async_project_view), {'article_title': f'{run_title(data, i)}_async', 'target_language': 'te'}, format = 'json')),
+    'async sentences GET': ('async/<str:project_id>/sentence', lambda data, i: data.client(data.annotator).get(reverse(async_views.async_sentences_view, args = [data.project.project_id]))),
+    'async sentence GET': ('async/sentence/<int:sentence_id>', lambda data, i: data.client(data.annotator).get(reverse(async_views.async_single_sentence_view, args = [data.sentence_ids[i % len(data.sentence_ids)]]))),
+    'async project GET': ('async/project/<str:project_id>', lambda data, i: data.client(data.manager).get(reverse(async_views.async_single_project_view, args = [data.project.project_id]))),
+    'async project status GET': ('async/project/<str:project_id>/status', lambda data, i: data.client(data.annotator).get(reverse(async_views.async_project_status_view, args = [data.project.project_id]))),
+}
+
+def measure(data, request, requests):
+    #Returns the latencies in ms, the queries of each request and the failed requests. The first request warms up the caches and is not counted
+    latencies = []
+    queries = []
+    errors = []
+    for i in range(requests + 1):
+        #Query log keeps at most 9000 queries, after that the captured queries can not be counted
+        reset_queries()
+        with CaptureQueriesContext(connection) as captured:
+            began = time.perf_counter()
+            response = request(data, i)
+            if (response.streaming):
+                b''.join(response.streaming_content)
+            elapsed = (time.perf_counter() - began) * 1000
+        if (i == 0):
+            continue
+        latencies.append(elapsed)
+        queries.append(len(captured.captured_queries))
+        if (response.status_code >= 400):
+            errors.append(response.status_code)
+    return latencies, queries, errors
+
+def run_scenarios(requests = 50, names = None, log = None):
+    #Returns {scenario: stats} and the peak RSS of the process
+    data = BenchmarkData()
+    results = {}
+    try:
+        with offline_wikipedia():
+            for name, (route, request) in SCENARIOS.items():
+                if (names and name not in names):
+                    continue
+                #Garbage of the previous scenario is not collected in the middle of this one
+                gc.collect()
+                #Login hashes the password on every request, so it gets fewer requests
+                latencies, queries, errors = measure(data, request, max(requests // 10, 1) if route == 'login/' else requests)
+                results[name] = {
+                    'route': route,
+                    'requests': len(latencies),
+                    'errors': len(errors),
+                    'p50_ms': round(percentile(latencies, 0.5), 2),
+                    'p95_ms': round(percentile(latencies, 0.95), 2),
+                    'p99_ms': round(percentile(latencies, 0.99), 2),
+                    'queries': round(percentile(queries, 0.5)),
+                    'max_queries': max(queries, default = 0),
+                }
+                if (log is not None):
+                    log(name, results[name])
+    finally:
+        data.cleanup()
+    #Size of the data is kept with the results, as a baseline is only valid for the same scale
+    return {'scenarios': results, 'peak_rss_kb': peak_rss_kb(), 'projects': Project.objects.count(), 'sentences': Sentence.objects.count()}
+
+def compare(results, baseline, threshold = 0.2):
+    #Returns the regressions against the baseline. Latency and memory may grow by the threshold, the query count may not grow at all
+    failures = []
+    for name, stats in results['scenarios'].items():
+        if (stats['errors']):
+            failures.append(f'{name}: {stats["errors"]} failed requests')
+        base = baseline.get('scenarios', {}).get(name)
+        if (base is None):
+            continue
+        if (stats['p95_ms'] > base['p95_ms'] * (1 + threshold) and stats['p95_ms'] - base['p95_ms'] > MIN_REGRESSION_MS):
+            failures.append(f'{name}: p95 {stats["p95_ms"]}ms, baseline {base["p95_ms"]}ms')
+        if (stats['queries'] > base['queries']):
+            failures.append(f'{name}: {stats["queries"]} queries per request, baseline {base["queries"]}')
+    if (results.get('peak_rss_kb') and baseline.get('peak_rss_kb') and results['peak_rss_kb'] > baseline['peak_rss_kb'] * (1 + threshold)):
+        failures.append(f'peak RSS {results["peak_rss_kb"]}KB, baseline {baseline["peak_rss_kb"]}KB')
+    return failures
+
+def load_baseline(path):
+    with open(path) as file:
+        return json.load(file)
+
+def save_baseline(path, results):
+    with open(path, 'w') as file:
+        json.dump(results, file, indent = 2, sort_keys = True)
+        file.write('\n')
@@ -0,0 +1,121 @@
+import asyncio
+import threading
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.utils.module_loading import import_string
+from .etags import sentence_etag
+
+#Change feed of the sentences. Saves publish compact deltas to the channel of their project, after the commit,
+#and the clients of GET /wiki/<project_id>/sentence/events get them as server sent events (events.py)
+
+#Event sent to a client which missed events, it has to get the sentences again
+RESET = 'reset'
+
+#Salt of the stream tickets, so no other signed value of the service can be used as one
+TICKET_SALT = 'wiki_translation.changes.ticket'
+
+#Messages of one client, waiting on the event loop of its stream
+class Subscription:
+
+    def __init__(self, channel, queue_size):
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize = queue_size)
+
+    def put(self, event, data):
+        #Called from the thread of the save, the message is queued on the event loop of the client
+        self.loop.call_soon_threadsafe(self.put_nowait, event, data)
+
+    def put_nowait(self, event, data):
+        if (self.queue.full()):
+            #Client is too slow, the queued deltas are dropped and it is told to reload
+            while (not self.queue.empty()):
+                self.queue.get_nowait()
+            event, data = RESET, {}
+        self.queue.put_nowait((event, data))
+
+    async def get(self):
+        #Returns the next (event, data)
+        return await self.queue.get()
+
+#Pub/sub within the process, for a single server process. Any class with the same publish(channel, event, data),
+#subscribe(channel) and unsubscribe(subscription) methods can be used instead, to share the events through a broker
+class InProcessPubSub:
+
+    def __init__(self, queue_size = 1000):
+        self.queue_size = queue_size
+        self.subscriptions = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, channel):
+        #Has to be called on the event loop of the client
+        subscription = Subscription(channel, self.queue_size)
+        with self.lock:
+            self.subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.channel, set())
+            subscriptions.discard(subscription)
+            if (not subscriptions):
+                self.subscriptions.pop(subscription.channel, None)
+
+    def publish(self, channel, event, data):
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.put(event, data)
+            except RuntimeError:
+                #Event loop of the client is closed
+                self.unsubscribe(subscription)
+
+    def count(self, channel):
+        with self.lock:
+            return len(self.subscriptions.get(channel, ()))
+
+_pubsubs = {}
+
+def option(name, default):
+    return getattr(settings, 'CHANGE_FEED', {}).get(name, default)
+
+def get_pubsub():
+    backend = option('BACKEND', 'wiki_translation.changes.InProcessPubSub')
+    options = option('OPTIONS', {})
+    key = (backend, tuple(sorted(options.items())))
+    if (key not in _pubsubs):
+        _pubsubs[key] = import_string(backend)(**options)
+    return _pubsubs[key]
+
+def issue_ticket(project_key, user_id):
+    #Ticket for the event stream of one project, given in the url by EventSource, which can not send headers.
+    #It is signed and expires after TICKET_SECONDS, so a url written in the logs does not give access for long, and the access token is never in it
+    return signing.dumps({'project': project_key, 'user': user_id}, salt = TICKET_SALT, compress = True)
+
+def read_ticket(ticket):
+    #Returns the project key of a valid ticket, otherwise None
+    try:
+        return signing.loads(ticket, salt = TICKET_SALT, max_age = option('TICKET_SECONDS', 30))['project']
+    except (signing.BadSignature, KeyError, TypeError):
+        #SignatureExpired is a BadSignature
+        return None
+
+def delta(sentence):
+    #version is the ETag of the sentence, which the client can send in If-Match when it saves the sentence
+    return {'sentence_id': sentence.sentence_id, 'translated_sentence': sentence.translated_sentence, 'version': sentence_etag(sentence)}
+
+def publish(project_key, event, data):
+    #Clients are only told about committed changes, rolled back saves publish nothing
+    transaction.on_commit(lambda: get_pubsub().publish(project_key, event, data))
+
+def publish_sentences(project_key, sentences):
+    #New and changed sentences of a project. Clients which do not have a sentence get the sentences again
+    publish(project_key, 'sentences', [delta(sentence) for sentence in sentences])
+
+def publish_sentence_change(previous_project_key, sentence):
+    #For a sentence saved by PATCH, which can move it to another project as well
+    if (sentence.project_id != previous_project_key):
+        publish(previous_project_key, 'removed', [sentence.sentence_id])
+    publish_sentences(sentence.project_id, [sentence])
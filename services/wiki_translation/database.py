@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    #PRAGMAs are per connection, so they are run on every new SQLite connection
+    if (connection.vendor == 'sqlite'):
+        with connection.cursor() as cursor:
+            for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+                cursor.execute(f'PRAGMA {name} = {value}')
+
+def set_journal_mode(cursor, mode):
+    #Journal mode is stored in the DB file, so it is set once by the configure_sqlite command, not by every connection.
+    #Returns the mode SQLite is in afterwards, which is "memory" for an in-memory DB
+    cursor.execute(f'PRAGMA journal_mode = {mode}')
+    return cursor.fetchone()[0]
@@ -0,0 +1,74 @@
+import hashlib
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from .roles import MANAGER, ANNOTATOR
+from .shared_cache import is_shared
+
+#Values of isAdminOrManager used by the frontend
+ADMIN_OR_MANAGER = 1
+ANNOTATOR_ONLY = 0
+NO_ROLE = 2
+
+#Filters accepted by the role query param of the user directory
+ROLE_FILTERS = {
+    'manager': ADMIN_OR_MANAGER,
+    'annotator': ANNOTATOR_ONLY,
+    'none': NO_ROLE,
+}
+
+#Cached directory is valid for an hour, even if an invalidation is missed
+DIRECTORY_CACHE_TIMEOUT = 60 * 60
+
+STATE_KEY = 'wiki_translation:users:state'
+
+def get_state():
+    #Version is changed on every user or group change. modified is used for the Last-Modified header
+    state = cache.get(STATE_KEY)
+    if (state is None):
+        state = {'version': 1, 'modified': timezone.now().replace(microsecond = 0)}
+        cache.add(STATE_KEY, state, None)
+        state = cache.get(STATE_KEY, state)
+    return state
+
+def invalidate_directory():
+    state = get_state()
+    cache.set(STATE_KEY, {'version': state['version'] + 1, 'modified': timezone.now().replace(microsecond = 0)}, None)
+
+def in_group(name):
+    return Exists(Group.objects.filter(name = name, user = OuterRef('pk')))
+
+def build_directory():
+    #Roles of all the users are computed in a single query
+    users = User.objects.annotate(is_manager = in_group(MANAGER), is_annotator = in_group(ANNOTATOR)) \
+        .order_by('id').values_list('id', 'username', 'is_superuser', 'is_manager', 'is_annotator')
+    return [
+        (user_id, username, ADMIN_OR_MANAGER if is_superuser or is_manager else (ANNOTATOR_ONLY if is_annotator else NO_ROLE))
+        for user_id, username, is_superuser, is_manager, is_annotator in users
+    ]
+
+def get_directory():
+    #Returns the list of (id, name, isAdminOrManager) and the state it was built for
+    if (not is_shared()):
+        #Built on every request, the version is the hash of the directory and the time of the last change is not known
+        directory = build_directory()
+        return directory, {'version': hashlib.md5(repr(directory).encode()).hexdigest(), 'modified': None}
+    state = get_state()
+    key = f'wiki_translation:users:{state["version"]}'
+    directory = cache.get(key)
+    if (directory is None):
+        directory = build_directory()
+        cache.set(key, directory, DIRECTORY_CACHE_TIMEOUT)
+    return directory, state
+
+@receiver(post_save, sender = User)
+@receiver(post_delete, sender = User)
+@receiver(post_save, sender = Group)
+@receiver(post_delete, sender = Group)
+@receiver(m2m_changed, sender = User.groups.through)
+def user_or_group_changed(sender, **kwargs):
+    if (kwargs.get('action', 'post_add') in ('post_add', 'post_remove', 'post_clear')):
+        invalidate_directory()
@@ -0,0 +1,174 @@
+import bz2
+import gzip
+import html
+import json
+import multiprocessing
+import re
+from collections import deque
+from itertools import islice
+from xml.etree.ElementTree import iterparse
+
+#Parsing of wikipedia dumps for the import_wikipedia_dump command. Pages are streamed, so the memory used does not grow with the dump.
+#Nothing here uses django, so the lead sections can be extracted in worker processes
+
+DUMP_FORMATS = ['xml', 'jsonl']
+
+#Links to these namespaces are not a part of the text. Interlanguage links are matched by LANGUAGE_LINK
+HIDDEN_NAMESPACES = {'file', 'image', 'media', 'category'}
+LANGUAGE_LINK = re.compile(r'^[a-z]{2,3}(-[a-z]+)*$')
+
+COMMENT = re.compile(r'<!--.*?-->', re.S)
+HEADING = re.compile(r'^[ \t]*==', re.M)
+REF = re.compile(r'<ref[^>/]*/>|<ref[^>]*>.*?</ref>', re.S | re.I)
+TEMPLATE = re.compile(r'\{\{[^{}]*\}\}')
+TABLE = re.compile(r'\{\|.*?\|\}', re.S)
+LINK = re.compile(r'\[\[([^\[\]]*)\]\]')
+EXTERNAL_LINK = re.compile(r'\[(?:https?:)?//[^\s\]]*\s*([^\]]*)\]')
+QUOTES = re.compile(r"'{2,}")
+TAG = re.compile(r'<[^>]+>')
+MAGIC_WORD = re.compile(r'__[A-Z]+__')
+EMPTY_PARENTHESES = re.compile(r'\(\s*[,;]?\s*\)')
+SPACE_BEFORE_PUNCTUATION = re.compile(r'[ \t]+([,.;:])')
+LIST_MARKER = re.compile(r'^[*#:;]+\s*')
+
+def open_dump(path):
+    #Dumps are read as bytes, compressed ones are decompressed while they are read
+    if (path.endswith('.bz2')):
+        return bz2.open(path, 'rb')
+    if (path.endswith('.gz')):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+def dump_format(path):
+    #Format from the extension, dumps of the pages-articles kind are xml
+    name = path.rsplit('/', 1)[-1].lower()
+    for extension in ('.bz2', '.gz'):
+        if (name.endswith(extension)):
+            name = name[:-len(extension)]
+    return 'jsonl' if name.endswith(('.jsonl', '.json', '.ndjson')) else 'xml'
+
+def replace_link(match):
+    target, _, label = match.group(1).partition('|')
+    namespace, colon, _ = target.partition(':')
+    namespace = namespace.strip().lower()
+    if (colon and (namespace in HIDDEN_NAMESPACES or LANGUAGE_LINK.match(namespace))):
+        return ''
+    #Label is the last part, file links have their options before it
+    return (label.rsplit('|', 1)[-1] if label else target).strip()
+
+def replace_nested(pattern, replacement, text):
+    #Innermost matches are replaced first, till nothing is left. Each pass removes one level of nesting
+    while True:
+        text, count = pattern.subn(replacement, text)
+        if (count == 0):
+            return text
+
+def lead_section(wikitext):
+    #Returns the plain text of the lead section of the page, like the summary returned by wikipedia.
+    #Templates, tables, references, files and categories are removed, links are replaced with their text
+    text = COMMENT.sub('', wikitext)
+    heading = HEADING.search(text)
+    if (heading is not None):
+        text = text[:heading.start()]
+    text = REF.sub('', text)
+    text = replace_nested(TEMPLATE, '', text)
+    text = TABLE.sub('', text)
+    text = replace_nested(LINK, replace_link, text)
+    text = EXTERNAL_LINK.sub(r'\1', text)
+    text = QUOTES.sub('', text)
+    text = html.unescape(TAG.sub('', text))
+    text = MAGIC_WORD.sub('', text)
+    text = EMPTY_PARENTHESES.sub('', text)
+    text = SPACE_BEFORE_PUNCTUATION.sub(r'\1', text)
+    lines = (' '.join(LIST_MARKER.sub('', line).split()) for line in text.splitlines())
+    return '\n'.join(line for line in lines if line)
+
+def local_name(tag):
+    #Tags of the dump are in the namespace of the export schema version
+    return tag.rsplit('}', 1)[-1]
+
+def iter_xml_pages(stream):
+    #Yields (title, revision id, wikitext) of the articles of a MediaWiki XML dump. Redirects and other namespaces are skipped.
+    #Each page is cleared once it is read, and removed from the root, so the parsed tree stays small
+    events = iterparse(stream, events = ('start', 'end'))
+    _, root = next(events)
+    page = {}
+    for event, element in events:
+        name = local_name(element.tag)
+        if (event == 'start'):
+            if (name == 'revision'):
+                page['in_revision'] = True
+            continue
+        if (name == 'title'):
+            page['title'] = element.text or ''
+        elif (name == 'ns'):
+            page['ns'] = element.text
+        elif (name == 'redirect'):
+            page['redirect'] = True
+        elif (name == 'id' and page.get('in_revision') and 'revision_id' not in page):
+            page['revision_id'] = int(element.text)
+        elif (name == 'text' and page.get('in_revision')):
+            page['text'] = element.text or ''
+        elif (name == 'revision'):
+            page['in_revision'] = False
+        elif (name == 'page'):
+            if (page.get('ns', '0') == '0' and not page.get('redirect') and page.get('title')):
+                yield page['title'], page.get('revision_id'), page.get('text', '')
+            page = {}
+            root.clear()
+
+def iter_jsonl_pages(stream):
+    #Yields (title, revision id, wikitext or None, summary or None) from a dump with one JSON object per line.
+    #Objects with a plain text summary ('summary', 'extract' or 'opening_text' of the CirrusSearch dumps) are stored as they are,
+    #objects with only the wikitext ('text') get their lead section extracted. Lines without a title, like the index lines of CirrusSearch, are skipped
+    for line in stream:
+        line = line.strip()
+        if (not line):
+            continue
+        page = json.loads(line)
+        if (not isinstance(page, dict) or not page.get('title') or page.get('namespace', 0) != 0 or page.get('redirect') is True):
+            continue
+        revision_id = page.get('revision_id', page.get('version'))
+        summary = page.get('summary') or page.get('extract') or page.get('opening_text')
+        yield page['title'], int(revision_id) if revision_id is not None else None, page.get('text') if summary is None else None, summary
+
+def iter_pages(stream, format):
+    #Yields (title, revision id, wikitext or None, summary or None) of the dump
+    if (format == 'jsonl'):
+        yield from iter_jsonl_pages(stream)
+    else:
+        for title, revision_id, text in iter_xml_pages(stream):
+            yield title, revision_id, text, None
+
+def extract_articles(pages):
+    #Returns (title, revision id, summary) of the pages with a lead section. Runs in the worker processes
+    articles = []
+    for title, revision_id, text, summary in pages:
+        summary = summary.strip() if summary is not None else lead_section(text or '')
+        if (summary):
+            articles.append((title, revision_id, summary))
+    return articles
+
+def chunked(items, size):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if (not chunk):
+            return
+        yield chunk
+
+def iter_articles(pages, workers = 1, chunk_size = 200):
+    #Yields (title, revision id, summary) of the pages in the order of the dump. With more than one worker, the lead sections are
+    #extracted by a pool of processes. At most two chunks per worker are in flight, so a fast parser does not fill the memory
+    if (workers <= 1):
+        for chunk in chunked(pages, chunk_size):
+            yield from extract_articles(chunk)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        pending = deque()
+        for chunk in chunked(pages, chunk_size):
+            pending.append(pool.apply_async(extract_articles, (chunk,)))
+            if (len(pending) >= workers * 2):
+                yield from pending.popleft().get()
+        while (pending):
+            yield from pending.popleft().get()
@@ -0,0 +1,59 @@
+import hashlib
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_etags, quote_etag, urlencode
+
+#Strong ETags of the project and sentence resources. They are computed from updated_on, which is already loaded with the
+#resource, so a request with a matching If-None-Match gets 304 without serializing anything
+
+def make_etag(*parts):
+    return quote_etag(hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest())
+
+def project_etag(project):
+    return make_etag('project', project.project_id, project.updated_on.isoformat())
+
+def projects_etag(projects):
+    #Changes when a project is added, removed or changed
+    return make_etag('projects', *(f'{project.project_id}@{project.updated_on.isoformat()}' for project in projects))
+
+def sentences_version(project):
+    #Version of the sentences of the project, from the counters of progress.py, which are loaded with the project.
+    #A new, changed or deleted sentence moves last_activity, and the count
+    last_activity = project.last_activity.isoformat() if project.last_activity else ''
+    return hashlib.md5(f'sentences:{project.project_id}:{project.sentence_count}:{last_activity}'.encode()).hexdigest()
+
+def sentences_etag(project, query_params = None):
+    #Paged, filtered and reduced lists are different bodies, so the normalized query params are part of the ETag
+    query = urlencode(sorted((key, value) for key, values in (query_params or {}).lists() for value in values)) if query_params else ''
+    return quote_etag(f'{sentences_version(project)}-{hashlib.md5(query.encode()).hexdigest()}')
+
+def check_sentences_version(request, project):
+    #If-Match of a PATCH of the sentences, with the ETag of any GET of the list. Only the version part is compared,
+    #as the query params of that GET are not known. Returns 412 when the sentences were changed since, otherwise None
+    if_match = request.META.get('HTTP_IF_MATCH')
+    if (not if_match):
+        return None
+    tags = parse_etags(if_match)
+    version = sentences_version(project)
+    if ('*' in tags or any(tag.strip('"').split('-')[0] == version for tag in tags if not tag.startswith('W/'))):
+        return None
+    return precondition_failed()
+
+def sentence_etag(sentence):
+    return make_etag('sentence', sentence.sentence_id, sentence.updated_on.isoformat())
+
+def check_conditions(request, etag):
+    #Returns 304 for a GET with a matching If-None-Match, 412 for a PATCH with a stale If-Match, otherwise None
+    response = get_conditional_response(request, etag = etag)
+    if (response is not None and response.status_code == 412):
+        return precondition_failed()
+    return response
+
+def precondition_failed():
+    return JsonResponse({'error': 'It was changed by someone else, get it again before saving'}, status = 412)
+
+def add_etag(response, etag):
+    response['ETag'] = etag
+    #Browser has to revalidate with the ETag before using its copy
+    response['Cache-Control'] = 'private, no-cache'
+    return response
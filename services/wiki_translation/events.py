@@ -0,0 +1,111 @@
+import asyncio
+import json
+import re
+from io import BytesIO
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from rest_framework import status
+from .async_views import authenticate_request, error_response
+from .changes import get_pubsub, option, read_ticket
+from .models import Project
+from .project_cache import project_resolver
+from .roles import scoped_projects
+
+#Server sent events of the sentence changes of a project, for path "wiki/<str:project_id>/sentence/events".
+#Django 4.1 can not stream a response from an async iterator, so the stream is served by this ASGI app in front of django
+
+EVENTS_PATH = re.compile(r'^/wiki/(?P<project_id>[^/]+)/sentence/events$')
+
+def event_message(event, data):
+    #json.dumps escapes the new lines, so the data is a single line
+    return f'event: {event}\ndata: {json.dumps(data, ensure_ascii = False)}\n\n'.encode()
+
+#ASGI app: serves the event streams and passes every other request to django
+class SentenceEvents:
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        match = EVENTS_PATH.match(scope['path']) if scope['type'] == 'http' else None
+        if (match is None):
+            return await self.application(scope, receive, send)
+        await self.stream(scope, receive, send, match['project_id'])
+
+    async def stream(self, scope, receive, send, project_id):
+        request = ASGIRequest(scope, BytesIO())
+        if (request.method != 'GET'):
+            return await self.application.send_response(error_response(f'Method "{request.method}" not allowed.', status.HTTP_405_METHOD_NOT_ALLOWED), send)
+        try:
+            project, error = await self.get_project(request, project_id)
+        finally:
+            #Stream makes no more queries, the connection is not kept open for it
+            await sync_to_async(close_old_connections)()
+        if (error is not None):
+            return await self.application.send_response(error, send)
+
+        pubsub = get_pubsub()
+        #Subscribed before the response starts, so a client which gets the sentences once the stream is open misses no change
+        subscription = pubsub.subscribe(project.pk)
+        disconnected = asyncio.ensure_future(self.wait_for_disconnect(receive))
+        try:
+            await send({'type': 'http.response.start', 'status': status.HTTP_200_OK, 'headers': self.headers(request)})
+            #Milliseconds the browser waits before it connects again
+            await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+            message = asyncio.ensure_future(subscription.get())
+            while True:
+                done, pending = await asyncio.wait([message, disconnected], timeout = option('KEEPALIVE', 15), return_when = asyncio.FIRST_COMPLETED)
+                if (disconnected in done):
+                    break
+                if (message in done):
+                    body = event_message(*message.result())
+                    message = asyncio.ensure_future(subscription.get())
+                else:
+                    #Comment line, keeps the proxies from closing an idle stream
+                    body = b': keepalive\n\n'
+                await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+            message.cancel()
+        finally:
+            pubsub.unsubscribe(subscription)
+            disconnected.cancel()
+
+    async def get_project(self, request, project_id):
+        #Returns (project, None), or (None, error response)
+        if ('ticket' in request.GET):
+            #EventSource of the browsers can not send headers, so they give a ticket of POST /wiki/<project_id>/sentence/events/ticket in the url.
+            #Permissions were checked when it was issued
+            project_key = read_ticket(request.GET['ticket'])
+            if (project_key is None):
+                return None, error_response('Ticket is invalid or expired', status.HTTP_401_UNAUTHORIZED)
+            project = await Project.objects.filter(pk = project_key, project_id = project_id).only('id', 'project_id').afirst()
+            if (project is None):
+                return None, error_response('Project matching query does not exist.', status.HTTP_404_NOT_FOUND)
+            return project, None
+        user, role, error = await authenticate_request(request)
+        if (error is not None):
+            return None, error
+        try:
+            #Same permission checks as GET /wiki/<str:project_id>/sentence
+            return await project_resolver.aget_project(scoped_projects(user, role).only('id', 'project_id'), project_id), None
+        except Project.DoesNotExist as e:
+            return None, error_response(str(e), status.HTTP_404_NOT_FOUND)
+
+    async def wait_for_disconnect(self, receive):
+        while True:
+            if ((await receive())['type'] == 'http.disconnect'):
+                return
+
+    def headers(self, request):
+        headers = [
+            (b'Content-Type', b'text/event-stream; charset=utf-8'),
+            (b'Cache-Control', b'no-cache'),
+            #Stops nginx from buffering the events
+            (b'X-Accel-Buffering', b'no'),
+        ]
+        #corsheaders is a django middleware, so the stream sets the header itself for the whitelisted origins
+        origin = request.META.get('HTTP_ORIGIN')
+        if (origin in getattr(settings, 'CORS_ORIGIN_WHITELIST', [])):
+            headers.append((b'Access-Control-Allow-Origin', origin.encode('latin1')))
+        return headers
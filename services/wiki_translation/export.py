@@ -0,0 +1,58 @@
+import json
+from xml.sax.saxutils import escape, quoteattr
+from .models import Sentence
+
+#Number of rows fetched from the DB at a time. Only one chunk is kept in memory
+EXPORT_CHUNK_SIZE = 2000
+
+#Language of the wikipedia articles the sentences are taken from
+SOURCE_LANGUAGE = 'en'
+
+def export_rows(projects, include_untranslated = False):
+    #Yields (project_id, target_language, original_sentence, translated_sentence) ordered by project and sentence.
+    #Projects are ordered by their integer key, so the rows come in the order of the (project, sentence_id) index
+    sentences = Sentence.objects.filter(project__in = projects)
+    if (not include_untranslated):
+        sentences = sentences.exclude(translated_sentence__isnull = True).exclude(translated_sentence = '')
+    return sentences.order_by('project', 'sentence_id') \
+        .values_list('project__project_id', 'project__target_language', 'original_sentence', 'translated_sentence') \
+        .iterator(chunk_size = EXPORT_CHUNK_SIZE)
+
+def tsv_field(text):
+    #Tabs and new lines would break the columns, so they are escaped
+    return (text or '').replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+def to_tsv(rows):
+    yield 'project_id\ttarget_language\toriginal_sentence\ttranslated_sentence\n'
+    for row in rows:
+        yield '\t'.join(tsv_field(value) for value in row) + '\n'
+
+def to_jsonl(rows):
+    for project_id, target_language, original_sentence, translated_sentence in rows:
+        yield json.dumps({
+            'project_id': project_id,
+            'target_language': target_language,
+            'original_sentence': original_sentence,
+            'translated_sentence': translated_sentence,
+        }, ensure_ascii = False) + '\n'
+
+def to_tmx(rows):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<tmx version="1.4">\n'
+    yield f'<header creationtool="wiki_translation" creationtoolversion="1.0" segtype="sentence" o-tmf="wiki_translation" adminlang="en" srclang="{SOURCE_LANGUAGE}" datatype="plaintext"/>\n'
+    yield '<body>\n'
+    for project_id, target_language, original_sentence, translated_sentence in rows:
+        yield (
+            f'<tu><prop type="project">{escape(project_id)}</prop>'
+            f'<tuv xml:lang="{SOURCE_LANGUAGE}"><seg>{escape(original_sentence)}</seg></tuv>'
+            f'<tuv xml:lang={quoteattr(target_language)}><seg>{escape(translated_sentence or "")}</seg></tuv></tu>\n'
+        )
+    yield '</body>\n'
+    yield '</tmx>\n'
+
+#Export types: (formatter, content type, file extension)
+EXPORT_TYPES = {
+    'tsv': (to_tsv, 'text/tab-separated-values; charset=utf-8', 'tsv'),
+    'jsonl': (to_jsonl, 'application/jsonl; charset=utf-8', 'jsonl'),
+    'tmx': (to_tmx, 'application/x-tmx+xml; charset=utf-8', 'tmx'),
+}
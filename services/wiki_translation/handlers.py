@@ -0,0 +1,43 @@
+from itertools import islice
+from asgiref.sync import sync_to_async
+from django.core.handlers import asgi
+
+#Number of parts of a streaming response read per call to the thread of the request
+STREAM_BATCH_SIZE = 500
+
+def next_parts(iterator, count):
+    return list(islice(iterator, count))
+
+#ASGI handler of translation/asgi.py. Django 4.1 iterates streaming responses on the event loop, so a response streamed
+#from a DB iterator, like the export, fails with SynchronousOnlyOperation there. Their parts are read here a batch at a time
+#on the thread of the request, which runs the sync views and keeps the cursor of the iterator
+class ASGIHandler(asgi.ASGIHandler):
+
+    async def send_response(self, response, send):
+        if (not response.streaming):
+            return await super().send_response(response, send)
+        await send({'type': 'http.response.start', 'status': response.status_code, 'headers': self.response_headers(response)})
+        try:
+            iterator = iter(response)
+            while True:
+                parts = await sync_to_async(next_parts)(iterator, STREAM_BATCH_SIZE)
+                if (not parts):
+                    break
+                await send({'type': 'http.response.body', 'body': b''.join(parts), 'more_body': True})
+            await send({'type': 'http.response.body'})
+        finally:
+            #Sends request_finished, which closes the DB connection of the thread
+            await sync_to_async(response.close)()
+
+    def response_headers(self, response):
+        #Same headers as the django handler, cookies included
+        headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode('ascii')
+            if isinstance(value, str):
+                value = value.encode('latin1')
+            headers.append((bytes(header), bytes(value)))
+        for cookie in response.cookies.values():
+            headers.append((b'Set-Cookie', cookie.output(header = '').encode('ascii').strip()))
+        return headers
@@ -0,0 +1,203 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import Project, Sentence
+from .progress import add_progress, is_translated
+from .project_cache import project_list_cache
+from .memory import translation_memory
+from .transliteration import transliterator
+from .changes import RESET, publish
+from . import metrics, segments, utils
+
+#Number of sentences inserted per query
+BULK_BATCH_SIZE = 500
+
+#Backend: Runs the job in the calling thread. Useful for tests and management commands
+class SyncBackend:
+
+    def submit(self, fn, *args):
+        fn(*args)
+
+#Backend: Runs the job on a pool of worker threads, so the request thread is not blocked
+class ThreadPoolBackend:
+
+    def __init__(self, max_workers=None):
+        self.pool = ThreadPoolExecutor(max_workers = max_workers, thread_name_prefix = 'ingestion')
+
+    def submit(self, fn, *args):
+        self.pool.submit(fn, *args)
+
+#Backend instances are created once per configuration, so the pool is shared by all the requests
+_backends = {}
+
+def get_backend():
+    config = getattr(settings, 'INGESTION_BACKEND', {'BACKEND': 'wiki_translation.ingestion.ThreadPoolBackend'})
+    options = config.get('OPTIONS', {})
+    key = (config['BACKEND'], tuple(sorted(options.items())))
+    if (key not in _backends):
+        _backends[key] = import_string(config['BACKEND'])(**options)
+    return _backends[key]
+
+def start_ingestion(project : Project):
+    #Job is submitted only after the project is committed, otherwise the worker may not find it
+    transaction.on_commit(lambda: get_backend().submit(run_ingestion, project.project_id))
+
+#Jobs running on the event loop. The loop keeps only weak references to its tasks
+running_jobs = set()
+
+def start_async_ingestion(project : Project):
+    #Runs the job on the event loop of the ASGI server, so waiting for wikipedia does not hold a thread.
+    #Async views save the project in autocommit mode, so it is already committed
+    context = contextvars.copy_context()
+    context.run(metrics.detach)
+    job = asyncio.get_running_loop().create_task(arun_ingestion(project.project_id), context = context)
+    running_jobs.add(job)
+    job.add_done_callback(running_jobs.discard)
+    return job
+
+def start_batch_ingestion(projects):
+    #Projects of the same article share a single fetch and tokenize
+    project_ids_by_title = {}
+    for project in projects:
+        project_ids_by_title.setdefault(project.article_title, []).append(project.project_id)
+    transaction.on_commit(lambda: get_backend().submit(run_batch_ingestion, project_ids_by_title))
+
+def set_status(project_ids, status, message = ''):
+    #update does not set auto_now fields, and updated_on is the ETag of the project
+    Project.objects.filter(project_id__in = project_ids).update(status = status, status_message = message, updated_on = timezone.now())
+    #update does not send post_save either
+    project_list_cache.invalidate_projects(project_ids)
+
+async def aset_status(project_ids, status, message = ''):
+    await Project.objects.filter(project_id__in = project_ids).aupdate(status = status, status_message = message, updated_on = timezone.now())
+    await sync_to_async(project_list_cache.invalidate_projects)(project_ids)
+
+#Statuses of the projects which have an ingestion job queued or running
+UNFINISHED = (Project.Status.PENDING, Project.Status.FETCHING, Project.Status.TOKENIZING)
+
+def recover_stale_projects(older_than, requeue = False):
+    #Jobs of the thread pool are lost when the server stops, and their projects would stay unfinished forever.
+    #Projects unfinished and unchanged for older_than (a timedelta) are moved to failed, or ingested again in this thread.
+    #Every step of a job sets updated_on, so running jobs are left alone when older_than is longer than a job takes
+    stale = Project.objects.filter(status__in = UNFINISHED, updated_on__lt = timezone.now() - older_than)
+    projects = list(stale.only('project_id', 'article_title'))
+    if (requeue):
+        project_ids_by_title = {}
+        for project in projects:
+            project_ids_by_title.setdefault(project.article_title, []).append(project.project_id)
+        run_batch_ingestion(project_ids_by_title)
+    else:
+        project_ids = [project.project_id for project in projects]
+        #Projects which moved on meanwhile are not failed
+        stale.filter(project_id__in = project_ids).update(status = Project.Status.FAILED, updated_on = timezone.now(),
+                                                          status_message = 'Ingestion was interrupted, the server stopped before it finished')
+        project_list_cache.invalidate_projects(project_ids)
+    return [project.project_id for project in projects]
+
+def get_fetch_concurrency():
+    #Max number of articles fetched from wikipedia at the same time by a batch
+    return getattr(settings, 'INGESTION_FETCH_CONCURRENCY', 4)
+
+def run_ingestion(project_id):
+    #Worker threads get their own DB connection, which has to be cleaned up by the job
+    close_old_connections()
+    try:
+        article_title = Project.objects.values_list('article_title', flat = True).get(project_id = project_id)
+    except Project.DoesNotExist:
+        return
+    finally:
+        close_old_connections()
+    with metrics.collect(metrics.INGESTION_VIEW):
+        ingest_article(article_title, [project_id])
+
+def run_batch_ingestion(project_ids_by_title):
+    items = list(project_ids_by_title.items())
+    with metrics.collect(metrics.INGESTION_VIEW):
+        if (get_fetch_concurrency() <= 1):
+            for article_title, project_ids in items:
+                ingest_article(article_title, project_ids)
+            return
+        #Bounded pool, so wikipedia gets only a few requests at a time
+        with ThreadPoolExecutor(max_workers = get_fetch_concurrency(), thread_name_prefix = 'ingestion-fetch') as pool:
+            #Fetch threads run in a copy of the context, so their timings are added to the metrics of the job
+            futures = [pool.submit(contextvars.copy_context().run, ingest_article, *item) for item in items]
+            for future in futures:
+                future.result()
+
+async def arun_ingestion(project_id):
+    try:
+        article_title = await Project.objects.values_list('article_title', flat = True).aget(project_id = project_id)
+    except Project.DoesNotExist:
+        return
+    with metrics.collect(metrics.INGESTION_VIEW):
+        await aingest_article(article_title, [project_id])
+
+def ingest_article(article_title, project_ids):
+    #Worker threads get their own DB connection, which has to be cleaned up by the job
+    close_old_connections()
+    try:
+        #Summary and sentences are taken from the article cache when the article was already fetched
+        set_status(project_ids, Project.Status.FETCHING)
+        entry = utils.article_cache.get_entry(article_title)
+
+        set_status(project_ids, Project.Status.TOKENIZING)
+        save_sentences(project_ids, entry)
+    except Exception as e:
+        #Keep the projects, so the cause of failure can be seen from the status endpoint
+        set_status(project_ids, Project.Status.FAILED, str(e))
+    finally:
+        close_old_connections()
+
+async def aingest_article(article_title, project_ids):
+    #Same steps as ingest_article, with the fetch awaited on the event loop
+    try:
+        await aset_status(project_ids, Project.Status.FETCHING)
+        entry = await utils.article_cache.aget_entry(article_title)
+
+        await aset_status(project_ids, Project.Status.TOKENIZING)
+        #Tokenizing and the transaction are not async, they run on the worker thread of the async ORM
+        await sync_to_async(save_sentences)(project_ids, entry)
+    except Exception as e:
+        await aset_status(project_ids, Project.Status.FAILED, str(e))
+
+def save_sentences(project_ids, entry):
+    summary_list = utils.article_cache.get_entry_sentences(entry)
+    with transaction.atomic():
+        add_sentences_for_projects(project_ids, summary_list)
+        set_status(project_ids, Project.Status.READY)
+
+def add_sentences_for_projects(project_ids, summary_list):
+    summary_list = [summary.strip() for summary in summary_list if len(summary.strip()) > 0]
+    #Jobs get the project ids of the urls, sentences reference the integer key of the project. Projects deleted since are skipped
+    projects = list(Project.objects.filter(project_id__in = project_ids).values_list('id', 'target_language'))
+
+    #Sentences already translated to the same language in another project are filled with that translation
+    known = segments.lookup(summary_list, [target_language for _, target_language in projects])
+    hashes = [segments.source_hash(summary) for summary in summary_list]
+    sentences = []
+    #Prefilled translations by language, for the transliteration index
+    prefilled = {}
+    for project_key, target_language in projects:
+        for summary, summary_hash in zip(summary_list, hashes):
+            translated_sentence = known.get((summary_hash, target_language))
+            if (translated_sentence is not None):
+                prefilled.setdefault(target_language, []).append(translated_sentence)
+            sentences.append(Sentence(project_id = project_key, original_sentence = summary, translated_sentence = translated_sentence or '',
+                                      prefilled = translated_sentence is not None))
+    sentences = Sentence.objects.bulk_create(sentences, batch_size = BULK_BATCH_SIZE)
+    #bulk_create does not send post_save. The project lists are invalidated by the status update which follows
+    translation_memory.add(sentences)
+    for target_language, translations in prefilled.items():
+        #Words of the prefilled translations are suggested once they are committed, like the saved ones
+        transaction.on_commit(lambda target_language = target_language, translations = translations: transliterator.update(target_language, [], translations))
+    for project_key, target_language in projects:
+        translated = sum(1 for summary_hash in hashes if is_translated(known.get((summary_hash, target_language))))
+        add_progress(project_key, sentences = len(summary_list), translated = translated)
+        #Clients which have the project open get all the sentences once they are committed, rather than a delta of each one
+        publish(project_key, RESET, {})
+    return sentences
@@ -0,0 +1,42 @@
+import warnings
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from wiki_translation.benchmark import SCENARIOS, compare, load_baseline, run_scenarios, save_baseline
+
+#Command: Runs the scenarios of every endpoint on the generated data and compares the results to a baseline
+class Command(BaseCommand):
+    help = ('Measures p50/p95/p99 latency, queries per request and peak RSS of every endpoint on the data of generate_benchmark_data, '
+            'and fails when they regress from the baseline')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type = int, default = 100, help = 'Number of requests per scenario')
+        parser.add_argument('--scenario', action = 'append', choices = list(SCENARIOS), help = 'Runs only the given scenarios')
+        parser.add_argument('--baseline', default = str(settings.BASE_DIR / 'benchmarks' / 'baseline.json'), help = 'JSON file of the baseline')
+        parser.add_argument('--save', action = 'store_true', help = 'Saves the results as the new baseline instead of comparing')
+        parser.add_argument('--threshold', type = float, default = 0.5, help = 'Allowed growth of latency and memory, 0.5 is 50%%')
+
+    def handle(self, *args, **options):
+        def log(name, stats):
+            self.stdout.write(f'{name:28} p50 {stats["p50_ms"]:8.2f}ms  p95 {stats["p95_ms"]:8.2f}ms  p99 {stats["p99_ms"]:8.2f}ms  '
+                              f'queries {stats["queries"]:3}  errors {stats["errors"]}')
+
+        #Test client requests use the testserver host, and new projects are ingested inside the request
+        with override_settings(ALLOWED_HOSTS = ['testserver'], INGESTION_BACKEND = {'BACKEND': 'wiki_translation.ingestion.SyncBackend'}), warnings.catch_warnings():
+            #Project.created_on is set with a naive datetime, which warns on every new project
+            warnings.filterwarnings('ignore', message = 'DateTimeField .* received a naive datetime')
+            results = run_scenarios(requests = options['requests'], names = options['scenario'], log = log)
+        self.stdout.write(f'peak RSS {results["peak_rss_kb"]}KB')
+
+        if (options['save']):
+            save_baseline(options['baseline'], results)
+            self.stdout.write(self.style.SUCCESS(f'Baseline saved to {options["baseline"]}'))
+            return
+        try:
+            baseline = load_baseline(options['baseline'])
+        except FileNotFoundError:
+            raise CommandError(f'No baseline at {options["baseline"]}, run with --save first')
+        failures = compare(results, baseline, options['threshold'])
+        if (failures):
+            raise CommandError('Regressions:\n' + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('No regressions'))
@@ -0,0 +1,110 @@
+import random
+import threading
+import time
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+from wiki_translation.benchmark import percentile
+from wiki_translation.database import set_journal_mode
+from wiki_translation.memory import translation_memory
+from wiki_translation.models import Project, Sentence
+from wiki_translation.progress import add_progress
+from wiki_translation.views import sentences_view
+
+#SQLite settings before the database was tuned: rollback journal, full sync, no memory mapping and deferred transactions
+BASELINE_SETTINGS = {
+    'SQLITE_JOURNAL_MODE': 'DELETE',
+    'SQLITE_PRAGMAS': {
+        'synchronous': 'FULL',
+        'mmap_size': 0,
+    },
+    'SQLITE_TRANSACTION_MODE': 'DEFERRED',
+}
+
+BENCHMARK_USER = 'benchmark_patch'
+BENCHMARK_PROJECT = 'bench_benchmark_patch'
+
+#Command: Runs bulk PATCH requests on the sentences of a scratch project from many threads at the same time
+class Command(BaseCommand):
+    help = 'Measures the throughput of concurrent sentence PATCH requests. Run it on a scratch database (DATABASE_NAME), as it writes to the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type = int, default = 8, help = 'Number of concurrent clients')
+        parser.add_argument('--requests', type = int, default = 50, help = 'Number of requests sent by each client')
+        parser.add_argument('--batch', type = int, default = 10, help = 'Number of sentences saved by each request')
+        parser.add_argument('--sentences', type = int, default = 2000, help = 'Number of sentences of the scratch project')
+        parser.add_argument('--baseline', action = 'store_true', help = 'Uses the SQLite settings from before the tuning')
+
+    def handle(self, *args, **options):
+        #Connections which are already open keep their settings, so the one of this thread is opened again
+        connection.close()
+        with override_settings(**(BASELINE_SETTINGS if options['baseline'] else {})):
+            if (connection.vendor == 'sqlite'):
+                #Journal mode is kept in the file of the scratch DB
+                with connection.cursor() as cursor:
+                    set_journal_mode(cursor, settings.SQLITE_JOURNAL_MODE)
+            user, project, sentence_ids = self.create_project(options['sentences'])
+            try:
+                latencies, errors, seconds = self.run_clients(user, project, sentence_ids, options)
+            finally:
+                project.delete()
+                user.delete()
+            connection.close()
+
+        total = len(latencies) + len(errors)
+        self.stdout.write(f'{connection.vendor} {"baseline" if options["baseline"] else "tuned"}: '
+                          f'{options["threads"]} clients x {options["requests"]} requests of {options["batch"]} sentences')
+        self.stdout.write(f'throughput: {len(latencies) / seconds:.1f} saved requests/s ({total} requests in {seconds:.2f}s)')
+        self.stdout.write(f'latency ms: p50 {percentile(latencies, 0.5) * 1000:.1f}, p95 {percentile(latencies, 0.95) * 1000:.1f}, '
+                          f'max {max(latencies, default = 0) * 1000:.1f}')
+        self.stdout.write(f'errors: {len(errors)}' + (f' (first: {errors[0]})' if errors else ''))
+
+    def create_project(self, count):
+        User.objects.filter(username = BENCHMARK_USER).delete()
+        user = User.objects.create(username = BENCHMARK_USER, is_superuser = True)
+        project = Project.objects.create(article_title = 'Benchmark', target_language = 'te', project_id = BENCHMARK_PROJECT,
+                                         created_by = user, created_on = timezone.now())
+        sentences = Sentence.objects.bulk_create([Sentence(project = project, original_sentence = f'Benchmark sentence {i}.') for i in range(count)], batch_size = 500)
+        add_progress(project.pk, sentences = count)
+        translation_memory.add(sentences)
+        return user, project, list(Sentence.objects.filter(project = project).values_list('sentence_id', flat = True))
+
+    def run_clients(self, user, project, sentence_ids, options):
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        start = threading.Barrier(options['threads'] + 1)
+
+        def client(seed):
+            factory = APIRequestFactory()
+            rng = random.Random(seed)
+            start.wait()
+            try:
+                for i in range(options['requests']):
+                    data = [{'sentence_id': sentence_id, 'translated_sentence': f'Translation {seed} {i}'} for sentence_id in rng.sample(sentence_ids, options['batch'])]
+                    request = factory.patch(f'/wiki/{project.project_id}/sentence', data, format = 'json')
+                    force_authenticate(request, user = user)
+                    began = time.perf_counter()
+                    response = sentences_view(request, project_id = project.project_id)
+                    elapsed = time.perf_counter() - began
+                    with lock:
+                        if (response.status_code == 200):
+                            latencies.append(elapsed)
+                        else:
+                            errors.append(response.data.get('error', response.status_code))
+            finally:
+                #Every thread has its own connection
+                connection.close()
+
+        threads = [threading.Thread(target = client, args = (seed,)) for seed in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        began = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        return latencies, errors, time.perf_counter() - began
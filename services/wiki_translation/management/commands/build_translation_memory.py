@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from wiki_translation.memory import translation_memory
+
+#Command: Computes the keys of the translation memory of every sentence
+class Command(BaseCommand):
+    help = ('Recomputes the translation memory keys (MemorySignature) of every sentence. '
+            'Needed once after migrating a database with sentences, and after sentences are created outside of the API and the ingestion')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type = int, default = 2000, help = 'Number of sentences indexed per transaction')
+
+    def handle(self, *args, **options):
+        count = translation_memory.rebuild(batch_size = max(options['batch_size'], 1))
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} sentences'))
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from wiki_translation.database import set_journal_mode
+
+#Command: Sets the journal mode of the SQLite DB, which is kept in the DB file
+class Command(BaseCommand):
+    help = ('Sets the journal mode of the SQLite DB (SQLITE_JOURNAL_MODE, WAL by default). It is stored in the DB file, '
+            'so it is run once when deploying, not on every connection')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--journal-mode', default = settings.SQLITE_JOURNAL_MODE, help = 'Journal mode, like WAL or DELETE')
+        parser.add_argument('--database', default = 'default', help = 'Alias of the database')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if (connection.vendor != 'sqlite'):
+            raise CommandError(f'{options["database"]} is not a SQLite database')
+        with connection.cursor() as cursor:
+            mode = set_journal_mode(cursor, options['journal_mode'])
+        self.stdout.write(self.style.SUCCESS(f'Journal mode: {mode}'))
@@ -0,0 +1,76 @@
+import re
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from wiki_translation.directory import build_directory
+from wiki_translation.memory import band_keys, ngrams, translation_memory
+from wiki_translation.models import ArticleCacheEntry, SegmentTranslation, Sentence
+from wiki_translation.roles import ANNOTATOR, MANAGER, SUPERUSER, scoped_projects
+from wiki_translation.search import is_supported as search_supported, project_query, sentence_query
+
+#Plan lines of a full table scan on SQLite and Postgres. A SQLite SCAN using an index only walks the index,
+#and a SCAN of an FTS5 table with the M index is a lookup of the MATCH terms
+FULL_SCAN = re.compile(r'\bSCAN (?!.*\bUSING (COVERING )?INDEX\b)(?!.*\bVIRTUAL TABLE INDEX \d+:M)|\bSeq Scan\b')
+
+#Subqueries which SQLite runs as co-routines. Their rows are read back with a SCAN of the subquery, which is not a table
+CO_ROUTINE = re.compile(r'\bCO-ROUTINE (\S+)')
+
+def access_paths():
+    #Returns (name, query, full scan allowed) for the queries made by the views. query is a queryset, or the sql and the params of a raw query
+    user = User(id = 1)
+    project_id = 'ta_india'
+    #Key of the project, found by project_resolver
+    project_key = 1
+    yield 'project_view superuser', scoped_projects(user, SUPERUSER), True
+    yield 'project_view Manager', scoped_projects(user, MANAGER), False
+    yield 'project_view Annotator', scoped_projects(user, ANNOTATOR), False
+    yield 'single_project_view Manager', scoped_projects(user, MANAGER).filter(pk = project_key), False
+    yield 'single_project_view Annotator', scoped_projects(user, ANNOTATOR).filter(pk = project_key), False
+    yield 'single_project_view resolve', scoped_projects(user, MANAGER).filter(project_id = project_id), False
+    yield 'sentences_view GET', Sentence.objects.filter(project_id = project_key).order_by('sentence_id'), False
+    yield 'sentences_view GET cursor', Sentence.objects.filter(project_id = project_key, sentence_id__gt = 100).order_by('sentence_id')[:100], False
+    yield 'sentences_view GET changed_since', Sentence.objects.filter(project_id = project_key, updated_on__gt = timezone.now()), False
+    yield 'sentences_view PATCH', Sentence.objects.filter(project_id = project_key, sentence_id__in = [1, 2, 3]), False
+    yield 'single_sentence_view', Sentence.objects.select_related('project').filter(sentence_id = 1), False
+    yield 'article cache lookup', ArticleCacheEntry.objects.filter(title = 'india', language = 'en'), False
+    yield 'segment store lookup', SegmentTranslation.objects.filter(source_hash__in = ['a' * 64, 'b' * 64], target_language__in = ['te', 'ta']), False
+    yield 'article cache eviction', ArticleCacheEntry.objects.order_by('-last_used', '-pk').values_list('pk', flat = True)[1000:], False
+    yield 'translation memory postings', translation_memory.postings_query(list(band_keys(ngrams('India is a country.')))[:2], 'te'), False
+    if (search_supported()):
+        yield 'search_view sentences', sentence_query('india', scoped_projects(user, MANAGER)), False
+        yield 'search_view projects', project_query('india', scoped_projects(user, ANNOTATOR)), False
+
+def has_full_scan(plan):
+    subqueries = set(CO_ROUTINE.findall(plan))
+    return any(FULL_SCAN.search(line) and line.split('SCAN ')[-1] not in subqueries for line in plan.splitlines())
+
+def explain(query):
+    if (not isinstance(query, tuple)):
+        return query.explain()
+    #Raw sql, formatted like QuerySet.explain()
+    sql, params = query
+    with connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_prefix} {sql}', params)
+        return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+#Command: Runs EXPLAIN on the queries made by the views and fails if one of them scans a whole table
+class Command(BaseCommand):
+    help = 'Runs EXPLAIN on the querysets used by the views and fails when a full table scan shows up'
+
+    def handle(self, *args, **options):
+        failed = []
+        for name, query, full_scan_allowed in access_paths():
+            plan = explain(query)
+            full_scan = has_full_scan(plan)
+            self.stdout.write(f'== {name}{" (full scan allowed)" if full_scan_allowed else ""}')
+            self.stdout.write(plan)
+            if (full_scan and not full_scan_allowed):
+                failed.append(name)
+
+        #user directory is not a queryset of the models, it is listed for completeness
+        self.stdout.write(f'== users directory (full scan allowed, {len(build_directory())} users)')
+
+        if (failed):
+            raise CommandError(f'Full table scan in: {", ".join(failed)}')
+        self.stdout.write(self.style.SUCCESS('No full table scans'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from wiki_translation.benchmark import clear_data, generate_data
+
+#Command: Fills the database with synthetic users, projects and sentences for the benchmarks
+class Command(BaseCommand):
+    help = 'Generates synthetic users, projects and sentences for the benchmarks. Run it on a scratch database (DATABASE_NAME)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type = int, default = 200, help = 'Number of projects, 10000 for the full scale')
+        parser.add_argument('--sentences', type = int, default = 50, help = 'Number of sentences per project, 100 for the full scale')
+        parser.add_argument('--managers', type = int, default = 10)
+        parser.add_argument('--annotators', type = int, default = 50)
+        parser.add_argument('--translated', type = float, default = 0.5, help = 'Fraction of the sentences which are translated')
+        parser.add_argument('--seed', type = int, default = 1)
+        parser.add_argument('--clear', action = 'store_true', help = 'Only deletes the generated data')
+
+    def handle(self, *args, **options):
+        if (options['clear']):
+            clear_data()
+            self.stdout.write(self.style.SUCCESS('Benchmark data deleted'))
+            return
+        generate_data(projects = options['projects'], sentences = options['sentences'], managers = options['managers'],
+                      annotators = options['annotators'], translated = options['translated'], seed = options['seed'], log = self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f'Generated {options["projects"]} projects with {options["projects"] * options["sentences"]} sentences'))
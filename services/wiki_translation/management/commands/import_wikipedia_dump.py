@@ -0,0 +1,52 @@
+import os
+import time
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from wiki_translation.dump import DUMP_FORMATS, chunked, dump_format, iter_articles, iter_pages, open_dump
+from wiki_translation.models import LocalArticle
+from wiki_translation.utils import normalizeTitle
+
+def save_articles(articles, language):
+    #Pages imported again replace the stored ones. Titles equal after normalizing are the same article, the last one is kept
+    imported_on = timezone.now()
+    by_title = {}
+    for title, revision_id, summary in articles:
+        key = normalizeTitle(title)[:255]
+        by_title[key] = LocalArticle(title = key, language = language, summary = summary, revision_id = revision_id, imported_on = imported_on)
+    with transaction.atomic():
+        LocalArticle.objects.bulk_create(by_title.values(), update_conflicts = True, unique_fields = ['title', 'language'],
+                                         update_fields = ['summary', 'revision_id', 'imported_on'])
+    return len(by_title)
+
+#Command: Imports the lead sections of a wikipedia dump into the local article store, so projects are ingested without wikipedia
+class Command(BaseCommand):
+    help = ('Imports the lead sections of the articles of a wikipedia dump (pages-articles XML or JSONL, optionally bz2 or gzip compressed) '
+            'into the local article store, which is read before wikipedia when projects are created')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help = 'Dump file, like tewiki-latest-pages-articles.xml.bz2')
+        parser.add_argument('--language', default = 'en', help = 'Language of the wikipedia of the dump')
+        parser.add_argument('--format', choices = DUMP_FORMATS, help = 'Format of the dump, taken from the file name by default')
+        parser.add_argument('--workers', type = int, default = os.cpu_count() or 1, help = 'Number of processes extracting the lead sections')
+        parser.add_argument('--batch-size', type = int, default = 1000, help = 'Number of articles saved per transaction')
+        parser.add_argument('--limit', type = int, help = 'Stops after this many articles')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if (not os.path.isfile(path)):
+            raise CommandError(f'Dump {path} does not exist')
+        format = options['format'] or dump_format(path)
+        language = options['language'].strip().lower()
+        started = time.perf_counter()
+        imported = 0
+        with open_dump(path) as stream:
+            articles = iter_articles(iter_pages(stream, format), workers = options['workers'])
+            if (options['limit'] is not None):
+                articles = islice(articles, options['limit'])
+            for batch in chunked(articles, max(options['batch_size'], 1)):
+                imported += save_articles(batch, language)
+                if (options['verbosity'] > 1):
+                    self.stdout.write(f'{imported} articles imported')
+        self.stdout.write(self.style.SUCCESS(f'Imported {imported} {language} articles in {time.perf_counter() - started:.1f}s'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from wiki_translation.search import is_supported, rebuild_index
+
+#Command: Reads the sentences and projects again into the full-text search index
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index of the sentences and project titles from the tables'
+
+    def handle(self, *args, **options):
+        if (not is_supported()):
+            raise CommandError(f'Full-text search is not supported on {connection.vendor}')
+        rebuild_index()
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt'))
@@ -0,0 +1,19 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from wiki_translation.ingestion import recover_stale_projects
+
+#Command: Fails or ingests again the projects whose ingestion job was lost, like when the server restarted
+class Command(BaseCommand):
+    help = ('Moves the projects left pending, fetching or tokenizing for longer than --minutes to failed, or ingests them again with --requeue. '
+            'Jobs of the thread pool backend are lost when the server stops, run it when the server starts')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes', type = int, default = getattr(settings, 'INGESTION_STALE_MINUTES', 30),
+                            help = 'Minutes since the last change of the project, after which its job is taken as lost')
+        parser.add_argument('--requeue', action = 'store_true', help = 'Ingest the projects again in this process instead of failing them')
+
+    def handle(self, *args, **options):
+        project_ids = recover_stale_projects(timedelta(minutes = max(options['minutes'], 0)), requeue = options['requeue'])
+        action = 'Ingested again' if options['requeue'] else 'Failed'
+        self.stdout.write(self.style.SUCCESS(f'{action} {len(project_ids)} stale projects'))
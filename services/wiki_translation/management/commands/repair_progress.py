@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from wiki_translation.progress import repair_progress
+
+#Command: Recomputes the progress counters of the projects from their sentences
+class Command(BaseCommand):
+    help = ('Recomputes sentence_count, translated_count and last_activity of every project from its sentences, and saves the wrong ones. '
+            'Needed after sentences are changed outside of the API, like deletes in the admin')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type = int, default = 1000, help = 'Number of projects recomputed per transaction')
+
+    def handle(self, *args, **options):
+        repaired, checked = repair_progress(batch_size = max(options['batch_size'], 1))
+        self.stdout.write(self.style.SUCCESS(f'Repaired {repaired} of {checked} projects'))
@@ -0,0 +1,173 @@
+import hashlib
+import heapq
+import struct
+from collections import Counter
+from django.db import connection, transaction
+from django.db.models.signals import post_init, post_save
+from django.dispatch import receiver
+from .models import MemorySignature, Sentence
+from .progress import is_translated
+
+#Size of the character n-grams used for matching
+NGRAM_SIZE = 3
+
+#Matches below this similarity are not returned
+MIN_SIMILARITY = 0.5
+
+#MinHash signature of the n-grams of a sentence, split into BANDS bands of BAND_SIZE hashes. Sentences sharing a band are candidates.
+#With 20 bands of 2, a segment of the lowest returned similarity (Dice 0.5) is found 9 times out of 10, and closer ones nearly always
+BANDS = 20
+BAND_SIZE = 2
+
+#Max number of candidate segments which are scored for a text, the ones sharing the most bands
+MAX_CANDIDATES = 50
+
+#Max number of segments read for one band key. A common key, like the one of a boilerplate sentence, can be shared by a large share
+#of the segments of a language, so only the first ones are read instead of all of them
+MAX_POSTINGS_PER_KEY = 200
+
+#Number of keys or sentences per query
+BATCH_SIZE = 500
+
+#Number of band keys per postings query, one limited subquery each. SQLite allows 500 terms in a compound select
+KEYS_PER_QUERY = 100
+
+#The BANDS * BAND_SIZE hashes of an n-gram are read from a single shake_128 digest, which is the same in every process, unlike hash()
+HASHES = struct.Struct(f'<{BANDS * BAND_SIZE}Q')
+
+def normalize(text):
+    return ' '.join(text.split()).casefold()
+
+def ngrams(text):
+    padded = f' {normalize(text)} '
+    return set(padded[i:i + NGRAM_SIZE] for i in range(max(len(padded) - NGRAM_SIZE + 1, 1)))
+
+def band_keys(grams):
+    hashes = [HASHES.unpack(hashlib.shake_128(gram.encode()).digest(HASHES.size)) for gram in grams]
+    #Minimum of each hash function over the n-grams
+    minimums = [min(values) for values in zip(*hashes)]
+    return set(
+        int.from_bytes(hashlib.blake2b(f'{band}:{minimums[band * BAND_SIZE:(band + 1) * BAND_SIZE]}'.encode(), digest_size = 8).digest(), 'big', signed = True)
+        for band in range(BANDS)
+    )
+
+def similarity(grams, other):
+    #Dice coefficient of the n-gram sets
+    return 2 * len(grams & other) / (len(grams) + len(other))
+
+#Translation memory of all the target languages. Every sentence has the band keys of its original sentence in MemorySignature,
+#written in the same transaction as the sentence, so every process reads the same memory and rolled back saves leave nothing.
+#Translations and languages are read from the sentences and their projects when searching, so translating or moving a sentence writes no key
+class TranslationMemory:
+
+    def add(self, sentences):
+        #For new sentences, bulk_create included, which sends no post_save. Ingestion adds the same sentences to the projects of each language,
+        #so the keys are computed once per text
+        keys = {}
+        for sentence in sentences:
+            if (sentence.original_sentence not in keys):
+                keys[sentence.original_sentence] = band_keys(ngrams(sentence.original_sentence))
+        signatures = [MemorySignature(sentence_id = sentence.sentence_id, band_key = key) for sentence in sentences for key in keys[sentence.original_sentence]]
+        MemorySignature.objects.bulk_create(signatures, batch_size = BATCH_SIZE)
+
+    def reindex(self, sentences):
+        #For sentences whose original sentence changed
+        with transaction.atomic():
+            MemorySignature.objects.filter(sentence__in = [sentence.sentence_id for sentence in sentences]).delete()
+            self.add(sentences)
+
+    def search(self, text, language, k = 3, exclude = ()):
+        return self.search_many([(text, exclude)], language, k)[0]
+
+    def postings_query(self, keys, language):
+        #Returns the sql and the params of the translated segments of the language of each key, at most MAX_POSTINGS_PER_KEY of them.
+        #Every key is a subquery with its own LIMIT, so the database stops reading a key after the first ones
+        segments = MemorySignature.objects.filter(sentence__project__target_language = language) \
+            .exclude(sentence__translated_sentence__isnull = True).exclude(sentence__translated_sentence = '') \
+            .values_list('band_key', 'sentence_id')
+        parts = []
+        params = []
+        for key in keys:
+            sql, key_params = segments.filter(band_key = key)[:MAX_POSTINGS_PER_KEY].query.sql_with_params()
+            parts.append(f'SELECT * FROM ({sql}) k{len(parts)}')
+            params.extend(key_params)
+        return ' UNION ALL '.join(parts), params
+
+    def read_postings(self, keys, language):
+        #Returns the ids of the segments of each key
+        postings = {}
+        for start in range(0, len(keys), KEYS_PER_QUERY):
+            with connection.cursor() as cursor:
+                cursor.execute(*self.postings_query(keys[start:start + KEYS_PER_QUERY], language))
+                for key, sentence_id in cursor.fetchall():
+                    postings.setdefault(key, []).append(sentence_id)
+        return postings
+
+    def search_many(self, queries, language, k = 3):
+        #queries is a list of (text, sentence ids to leave out). Returns the list of matches of each text.
+        #The keys of all the texts are looked up together, so the number of queries does not grow with each text
+        grams = [ngrams(text) for text, _ in queries]
+        keys = [band_keys(text_grams) for text_grams in grams]
+        postings = self.read_postings(list(set().union(*keys)), language)
+
+        candidates = []
+        for text_keys, (_, exclude) in zip(keys, queries):
+            shared = Counter(sentence_id for key in text_keys for sentence_id in postings.get(key, ()))
+            for sentence_id in exclude:
+                shared.pop(sentence_id, None)
+            candidates.append([sentence_id for sentence_id, _ in shared.most_common(MAX_CANDIDATES)])
+
+        segments = {}
+        all_candidates = list(set().union(*candidates))
+        for start in range(0, len(all_candidates), BATCH_SIZE):
+            rows = Sentence.objects.filter(sentence_id__in = all_candidates[start:start + BATCH_SIZE]) \
+                .values_list('sentence_id', 'original_sentence', 'translated_sentence')
+            for sentence_id, original_sentence, translated_sentence in rows:
+                #Translation may have been cleared since the keys were read
+                if (is_translated(translated_sentence)):
+                    segments[sentence_id] = (original_sentence, translated_sentence, ngrams(original_sentence))
+
+        results = []
+        for text_grams, text_candidates in zip(grams, candidates):
+            scored = ((similarity(text_grams, segments[sentence_id][2]), sentence_id) for sentence_id in text_candidates if sentence_id in segments)
+            matches = heapq.nlargest(k, (item for item in scored if item[0] >= MIN_SIMILARITY))
+            results.append([
+                {
+                    'sentence_id': sentence_id,
+                    'original_sentence': segments[sentence_id][0],
+                    'translated_sentence': segments[sentence_id][1],
+                    'similarity': round(score, 4),
+                }
+                for score, sentence_id in matches
+            ])
+        return results
+
+    def rebuild(self, batch_size = 2000):
+        #Recomputes the keys of every sentence, batch_size sentences per transaction. Returns the number of sentences
+        count = 0
+        last_id = 0
+        while True:
+            with transaction.atomic():
+                sentences = list(Sentence.objects.filter(sentence_id__gt = last_id).order_by('sentence_id').only('sentence_id', 'original_sentence')[:batch_size])
+                if (not sentences):
+                    return count
+                MemorySignature.objects.filter(sentence__gt = last_id, sentence__lte = sentences[-1].sentence_id).delete()
+                self.add(sentences)
+            last_id = sentences[-1].sentence_id
+            count += len(sentences)
+
+#Translation memory shared by the whole process
+translation_memory = TranslationMemory()
+
+@receiver(post_init, sender = Sentence)
+def sentence_loaded(sender, instance, **kwargs):
+    #Original sentence the stored keys were computed from. Deferred fields are not loaded for it
+    instance._memory_source = instance.__dict__.get('original_sentence')
+
+@receiver(post_save, sender = Sentence)
+def sentence_saved(sender, instance, created, **kwargs):
+    if (created):
+        translation_memory.add([instance])
+    elif (instance.__dict__.get('original_sentence') != instance._memory_source):
+        translation_memory.reindex([instance])
+    instance._memory_source = instance.__dict__.get('original_sentence')
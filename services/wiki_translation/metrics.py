@@ -0,0 +1,259 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+
+#Kinds of time recorded for each request, besides the total
+KINDS = ('db', 'serializer', 'http', 'tokenize')
+
+#Bucket upper bounds of the histograms, in seconds and in number of queries
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERIES_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+#Name of the view recorded for the background ingestion jobs
+INGESTION_VIEW = 'ingestion'
+
+#Collector of the request (or job) running in the current thread, None when nothing is recorded
+_current = ContextVar('wiki_translation_metrics', default = None)
+
+#Returned by timer when nothing is recorded, so a disabled timer costs a context variable lookup
+_noop = nullcontext()
+
+def is_enabled():
+    return getattr(settings, 'WIKI_METRICS', {}).get('ENABLED', False)
+
+#Timings of a single request
+class Collector:
+
+    def __init__(self, view):
+        self.view = view
+        self.seconds = dict.fromkeys(KINDS, 0.0)
+        self.queries = 0
+        self.total = 0.0
+        #Ingestion fetches run on other threads with a copy of the context, and add to the same collector
+        self.lock = threading.Lock()
+
+    def add(self, kind, seconds):
+        with self.lock:
+            self.seconds[kind] += seconds
+
+    def add_query(self, seconds):
+        with self.lock:
+            self.seconds['db'] += seconds
+            self.queries += 1
+
+    def server_timing(self, total):
+        #Durations of the Server-Timing header are in milliseconds
+        parts = [f'{kind};dur={self.seconds[kind] * 1000:.2f}' for kind in KINDS]
+        parts[0] += f';desc="{self.queries} queries"'
+        return ', '.join(parts + [f'total;dur={total * 1000:.2f}'])
+
+class Timer:
+
+    def __init__(self, collector, kind):
+        self.collector = collector
+        self.kind = kind
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.collector.add(self.kind, time.perf_counter() - self.start)
+
+def timer(kind):
+    #Adds the time spent in the block to the current request
+    collector = _current.get()
+    if (collector is None):
+        return _noop
+    return Timer(collector, kind)
+
+def query_wrapper(execute, sql, params, many, context):
+    #Installed on the DB connections, records the queries of the current request
+    collector = _current.get()
+    if (collector is None):
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        collector.add_query(time.perf_counter() - start)
+
+def instrument_connection(db_connection):
+    if (query_wrapper not in db_connection.execute_wrappers):
+        db_connection.execute_wrappers.append(query_wrapper)
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    if (is_enabled()):
+        instrument_connection(connection)
+
+#Histogram with the cumulative bucket counts of the Prometheus format
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if (value <= bound):
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+#Histograms per (metric, view, method), kept for the whole process
+class Registry:
+
+    #Metric name -> (kind of the collector, help text, buckets)
+    METRICS = {
+        'wiki_request_duration_seconds': ('total', 'Time spent in the request', SECONDS_BUCKETS),
+        'wiki_db_duration_seconds': ('db', 'Time spent in DB queries', SECONDS_BUCKETS),
+        'wiki_db_queries': ('queries', 'Number of DB queries', QUERIES_BUCKETS),
+        'wiki_serializer_duration_seconds': ('serializer', 'Time spent in serializers', SECONDS_BUCKETS),
+        'wiki_http_duration_seconds': ('http', 'Time spent in outbound HTTP requests to wikipedia', SECONDS_BUCKETS),
+        'wiki_tokenize_duration_seconds': ('tokenize', 'Time spent in sentence tokenization', SECONDS_BUCKETS),
+    }
+
+    def __init__(self):
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def record(self, collector, method, total):
+        values = dict(collector.seconds, total = total, queries = collector.queries)
+        with self.lock:
+            for name, (kind, _, buckets) in self.METRICS.items():
+                key = (name, collector.view, method)
+                if (key not in self.histograms):
+                    self.histograms[key] = Histogram(buckets)
+                self.histograms[key].observe(values[kind])
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, (_, help_text, _) in self.METRICS.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for (metric, view, method), histogram in sorted(self.histograms.items()):
+                    if (metric != name):
+                        continue
+                    labels = f'view="{view}",method="{method}"'
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                    lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+                    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self.lock:
+            self.histograms = {}
+
+#Registry shared by the whole process. Every worker process exposes its own
+registry = Registry()
+
+#Counters of other parts of the service, read when the metrics are rendered. Name -> (help text, function returning the value)
+counters = {}
+
+def register_counter(name, help_text, value):
+    counters[name] = (help_text, value)
+
+def render_counters():
+    lines = []
+    for name, (help_text, value) in sorted(counters.items()):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        lines.append(f'{name} {value()}')
+    return '\n'.join(lines) + '\n' if lines else ''
+
+@contextmanager
+def collect(view, method = ''):
+    #Records the block as one request of the view. Nested blocks are recorded as a part of the outer one
+    if (not is_enabled() or _current.get() is not None):
+        yield _current.get()
+        return
+    instrument_connection(connection)
+    collector = Collector(view)
+    token = _current.set(collector)
+    start = time.perf_counter()
+    try:
+        yield collector
+    finally:
+        collector.total = time.perf_counter() - start
+        _current.reset(token)
+        registry.record(collector, method, collector.total)
+
+def detach():
+    #Jobs started by a request run in a copy of its context. They are recorded on their own, and not as a part of the request
+    _current.set(None)
+
+def view_name(view_func):
+    #DRF function views are wrapped in a class named after the function
+    view_class = getattr(view_func, 'cls', None)
+    return getattr(view_class, '__name__', None) or getattr(view_func, '__name__', 'unknown')
+
+#Middleware: Records the timings of every request, and adds them to the response as the Server-Timing header
+#Works both under WSGI and ASGI, so async views are not moved to a thread by Django
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        #Django leaves out the middleware when metrics are disabled, so it costs nothing
+        if (not is_enabled()):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if (asyncio.iscoroutinefunction(get_response)):
+            #Same marker as django.utils.deprecation.MiddlewareMixin, Django then awaits __call__
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if (asyncio.iscoroutinefunction(self.get_response)):
+            return self.__acall__(request)
+        request._metrics_view = 'unmatched'
+        with collect(None, request.method) as collector:
+            response = self.get_response(request)
+            #View is known only after the URL is resolved
+            collector.view = request._metrics_view
+        return self.add_server_timing(response, collector)
+
+    async def __acall__(self, request):
+        request._metrics_view = 'unmatched'
+        with collect(None, request.method) as collector:
+            response = await self.get_response(request)
+            collector.view = request._metrics_view
+        return self.add_server_timing(response, collector)
+
+    def add_server_timing(self, response, collector):
+        if (getattr(settings, 'WIKI_METRICS', {}).get('SERVER_TIMING', True)):
+            response['Server-Timing'] = collector.server_timing(collector.total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_view = view_name(view_func)
+
+def is_scraper(request):
+    #Scrapers send the TOKEN as a bearer token, or come from one of the ALLOWED_IPS (the address of the proxy, behind one)
+    options = getattr(settings, 'WIKI_METRICS', {})
+    token = options.get('TOKEN')
+    if (token and constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}')):
+        return True
+    return request.META.get('REMOTE_ADDR') in options.get('ALLOWED_IPS', ('127.0.0.1', '::1'))
+
+#GET API for path "metrics", in the Prometheus text format
+def metrics_view(request):
+    if (not is_enabled()):
+        raise Http404('Metrics are disabled')
+    if (not is_scraper(request)):
+        #Metrics tell the views, load and timings of the service, they are not public
+        raise PermissionDenied('Metrics are only served to the scrapers')
+    return HttpResponse(registry.render() + render_counters(), content_type = 'text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,28 @@
+# Generated by Django 4.1.7 on 2026-10-18 17:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wiki_translation', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('fetching', 'Fetching'), ('tokenizing', 'Tokenizing'), ('ready', 'Ready'), ('failed', 'Failed')], default='ready', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='status_message',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='assigned_to',
+            field=models.BigIntegerField(null=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.1.7 on 2026-10-18 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wiki_translation', '0002_project_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('language', models.CharField(max_length=10)),
+                ('summary', models.TextField()),
+                ('sentences', models.JSONField(null=True)),
+                ('revision_id', models.BigIntegerField(null=True)),
+                ('fetched_on', models.DateTimeField()),
+                ('last_used', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'unique_together': {('title', 'language')},
+            },
+        ),
+    ]
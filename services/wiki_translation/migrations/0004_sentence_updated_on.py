@@ -0,0 +1,20 @@
+# Generated by Django 4.1.7 on 2026-10-18 18:10
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wiki_translation', '0003_article_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sentence',
+            name='updated_on',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.1.7 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wiki_translation', '0004_sentence_updated_on'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['assigned_to', 'created_on'], name='project_assigned_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['created_by', 'created_on'], name='project_creator_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sentence',
+            index=models.Index(fields=['project', 'sentence_id'], name='sentence_project_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sentence',
+            index=models.Index(fields=['project', 'updated_on'], name='sentence_project_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.1.7 on 2026-10-18 18:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wiki_translation', '0005_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sentence',
+            name='prefilled',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='SegmentTranslation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_hash', models.CharField(max_length=64)),
+                ('target_language', models.CharField(max_length=3)),
+                ('translated_sentence', models.TextField()),
+                ('updated_on', models.DateTimeField(auto_now=True)),
+                ('sentence', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='wiki_translation.sentence')),
+            ],
+            options={
+                'unique_together': {('source_hash', 'target_language')},
+            },
+        ),
+    ]
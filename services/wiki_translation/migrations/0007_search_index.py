@@ -0,0 +1,21 @@
+from django.db import migrations
+from ._search_schema_0007 import create_index, drop_index
+
+
+def create_search_index(apps, schema_editor):
+    create_index(apps, schema_editor)
+
+
+def drop_search_index(apps, schema_editor):
+    drop_index(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wiki_translation', '0006_segment_translation'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
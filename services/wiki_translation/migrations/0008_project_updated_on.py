@@ -0,0 +1,27 @@
+# Generated by Django 4.1.7 on 2026-10-18 18:40
+
+from django.db import migrations, models
+from ._search_schema_0007 import create_index
+
+
+def create_search_index(apps, schema_editor):
+    #SQLite rebuilds the project table to add or remove the column, which drops the search triggers
+    create_index(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wiki_translation', '0007_search_index'),
+    ]
+
+    operations = [
+        #Runs last when migrating backwards, after the column is removed
+        migrations.RunPython(migrations.RunPython.noop, create_search_index),
+        migrations.AddField(
+            model_name='project',
+            name='updated_on',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(create_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.1.7 on 2026-10-18 18:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wiki_translation', '0008_project_updated_on'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocalArticle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('language', models.CharField(max_length=10)),
+                ('summary', models.TextField()),
+                ('revision_id', models.BigIntegerField(null=True)),
+                ('imported_on', models.DateTimeField()),
+            ],
+            options={
+                'unique_together': {('title', 'language')},
+            },
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:20
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def add_primary_key(apps, schema_editor):
+    #Adds the integer primary key. project_id stays as a unique column, so the urls keep working
+    Project = apps.get_model('wiki_translation', 'Project')
+    table = schema_editor.quote_name(Project._meta.db_table)
+    unique_name = schema_editor.quote_name(f'{Project._meta.db_table}_project_id_uniq')
+    project_id = schema_editor.quote_name('project_id')
+    if (schema_editor.connection.vendor == 'sqlite'):
+        #SQLite rebuilds the table, the rows get their ids in the order they were inserted
+        field = models.BigAutoField(primary_key = True, serialize = False)
+        field.set_attributes_from_name('id')
+        field.model = Project
+        schema_editor.add_field(Project, field)
+        schema_editor.execute(f'CREATE UNIQUE INDEX {unique_name} ON {table} ({project_id})')
+        return
+    #Postgres allows one primary key per table, so the one of project_id is dropped first. The identity column fills the existing rows
+    with schema_editor.connection.cursor() as cursor:
+        constraints = schema_editor.connection.introspection.get_constraints(cursor, Project._meta.db_table)
+    for name, constraint in constraints.items():
+        if (constraint['primary_key']):
+            schema_editor.execute(f'ALTER TABLE {table} DROP CONSTRAINT {schema_editor.quote_name(name)}')
+    schema_editor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {unique_name} UNIQUE ({project_id})')
+    schema_editor.execute(f'ALTER TABLE {table} ADD COLUMN {schema_editor.quote_name("id")} bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY')
+
+
+class Migration(migrations.Migration):
+
+    #First of the three migrations moving Sentence.project to the integer key of Project:
+    #0010 adds the key, 0011 fills Sentence.project_key in batches, 0012 makes it the foreign key. It can not be reversed
+
+    dependencies = [
+        ('wiki_translation', '0009_local_article'),
+    ]
+
+    operations = [
+        #Rebuilt by 0012 on the new column
+        migrations.RemoveIndex(
+            model_name='sentence',
+            name='sentence_project_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='sentence',
+            name='sentence_project_updated_idx',
+        ),
+        #Foreign key to project_id is dropped before project_id stops being the primary key. The column keeps the project ids till 0012
+        migrations.AlterField(
+            model_name='sentence',
+            name='project',
+            field=models.CharField(db_column='project_id', max_length=154),
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(add_primary_key),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='project',
+                    name='id',
+                    field=models.BigAutoField(default=None, primary_key=True, serialize=False),
+                    preserve_default=False,
+                ),
+                migrations.AlterField(
+                    model_name='project',
+                    name='project_id',
+                    field=models.CharField(max_length=154, unique=True),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='project',
+            constraint=models.UniqueConstraint(models.F('target_language'), django.db.models.functions.text.Lower('article_title'), name='project_language_title_uniq'),
+        ),
+        migrations.AddField(
+            model_name='sentence',
+            name='project_key',
+            field=models.BigIntegerField(null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:20
+
+from django.db import migrations, transaction
+from django.db.models import Max, OuterRef, Subquery
+
+#Number of sentence ids updated per transaction
+BATCH_SIZE = 10000
+
+
+def copy_project_keys(apps, schema_editor):
+    #Sets the integer key of the project of each sentence. Sentences are updated in ranges of their ids, each range in its own transaction,
+    #so a large table is not locked by one long update. Sentences which already have the key are skipped, so a stopped migration can be run again
+    Project = apps.get_model('wiki_translation', 'Project')
+    Sentence = apps.get_model('wiki_translation', 'Sentence')
+    project_key = Subquery(Project.objects.filter(project_id = OuterRef('project')).values('id')[:1])
+    last_id = Sentence.objects.aggregate(last_id = Max('sentence_id'))['last_id'] or 0
+    for start in range(0, last_id + 1, BATCH_SIZE):
+        with transaction.atomic(using = schema_editor.connection.alias):
+            Sentence.objects.filter(sentence_id__gte = start, sentence_id__lt = start + BATCH_SIZE, project_key__isnull = True) \
+                .update(project_key = project_key)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('wiki_translation', '0010_project_surrogate_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_project_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+from ._search_schema_0007 import create_index
+
+
+def create_search_index(apps, schema_editor):
+    #SQLite rebuilds the sentence and project tables, which drops the search triggers. Projects have new rowids as well
+    create_index(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wiki_translation', '0011_sentence_project_key'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='sentence',
+            name='project',
+        ),
+        migrations.RenameField(
+            model_name='sentence',
+            old_name='project_key',
+            new_name='project',
+        ),
+        migrations.AlterField(
+            model_name='sentence',
+            name='project',
+            field=models.ForeignKey(db_column='project_id', on_delete=django.db.models.deletion.CASCADE, to='wiki_translation.project'),
+        ),
+        migrations.AddIndex(
+            model_name='sentence',
+            index=models.Index(fields=['project', 'sentence_id'], name='sentence_project_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sentence',
+            index=models.Index(fields=['project', 'updated_on'], name='sentence_project_updated_idx'),
+        ),
+        migrations.RunPython(create_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:15
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from ._search_schema_0007 import create_index
+
+#Number of projects counted per query
+BATCH_SIZE = 1000
+
+
+def create_search_index(apps, schema_editor):
+    #SQLite rebuilds the project table to add the columns, which drops the search triggers
+    create_index(apps, schema_editor)
+
+
+def count_progress(apps, schema_editor):
+    #Counts the sentences of the existing projects, a batch of projects at a time. updated_on is set as well,
+    #so the clients do not keep the projects they got without the counters under the same ETag
+    Project = apps.get_model('wiki_translation', 'Project')
+    Sentence = apps.get_model('wiki_translation', 'Sentence')
+    translated = Q(translated_sentence__isnull = False) & ~Q(translated_sentence = '')
+    now = timezone.now()
+    last_key = 0
+    while True:
+        projects = list(Project.objects.filter(pk__gt = last_key).order_by('pk').only('id')[:BATCH_SIZE])
+        if (not projects):
+            return
+        last_key = projects[-1].pk
+        rows = Sentence.objects.filter(project__gte = projects[0].pk, project__lte = last_key).values('project') \
+            .annotate(sentence_count = Count('sentence_id'), translated_count = Count('sentence_id', filter = translated), last_activity = Max('updated_on'))
+        progress = {row['project']: row for row in rows}
+        for project in projects:
+            row = progress.get(project.pk, {})
+            project.sentence_count = row.get('sentence_count', 0)
+            project.translated_count = row.get('translated_count', 0)
+            project.last_activity = row.get('last_activity')
+            project.updated_on = now
+        Project.objects.bulk_update(projects, ['sentence_count', 'translated_count', 'last_activity', 'updated_on'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wiki_translation', '0012_sentence_project_fk'),
+    ]
+
+    operations = [
+        #Runs last when migrating backwards, after the columns are removed
+        migrations.RunPython(migrations.RunPython.noop, create_search_index),
+        migrations.AddField(
+            model_name='project',
+            name='last_activity',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='sentence_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='translated_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_progress, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wiki_translation', '0013_project_progress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemorySignature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band_key', models.BigIntegerField(db_index=True)),
+                ('sentence', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='wiki_translation.sentence')),
+            ],
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.1.7 on 2026-10-18 20:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wiki_translation', '0014_memory_signature'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='segmenttranslation',
+            name='sentence',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='wiki_translation.sentence'),
+        ),
+    ]
@@ -0,0 +1,79 @@
+#Full text search schema created by 0007_search_index, and again by the migrations which make SQLite rebuild the sentence
+#or project table, as SQLite drops the triggers with the table. Frozen copy, never edit it: the migrations have to create
+#the same schema whatever search.py becomes. A changed schema goes in a new migration with its own copy.
+#The module name starts with an underscore, so the migration loader does not read it as a migration
+
+#FTS5 tables read the text from the model tables, and the triggers keep them in sync on every insert, update and delete, bulk ones included.
+#Marks are token characters as well, otherwise words of Indic scripts are split at the vowel signs
+SQLITE_SCHEMA = [
+    '''CREATE VIRTUAL TABLE wiki_translation_sentence_fts USING fts5(original_sentence, translated_sentence,
+        content='wiki_translation_sentence', content_rowid='sentence_id', tokenize="unicode61 remove_diacritics 2 categories 'L* N* Co M*'")''',
+    '''CREATE TRIGGER wiki_translation_sentence_fts_insert AFTER INSERT ON wiki_translation_sentence BEGIN
+        INSERT INTO wiki_translation_sentence_fts(rowid, original_sentence, translated_sentence) VALUES (new.sentence_id, new.original_sentence, new.translated_sentence);
+    END''',
+    '''CREATE TRIGGER wiki_translation_sentence_fts_delete AFTER DELETE ON wiki_translation_sentence BEGIN
+        INSERT INTO wiki_translation_sentence_fts(wiki_translation_sentence_fts, rowid, original_sentence, translated_sentence) VALUES ('delete', old.sentence_id, old.original_sentence, old.translated_sentence);
+    END''',
+    '''CREATE TRIGGER wiki_translation_sentence_fts_update AFTER UPDATE OF original_sentence, translated_sentence ON wiki_translation_sentence BEGIN
+        INSERT INTO wiki_translation_sentence_fts(wiki_translation_sentence_fts, rowid, original_sentence, translated_sentence) VALUES ('delete', old.sentence_id, old.original_sentence, old.translated_sentence);
+        INSERT INTO wiki_translation_sentence_fts(rowid, original_sentence, translated_sentence) VALUES (new.sentence_id, new.original_sentence, new.translated_sentence);
+    END''',
+    '''CREATE VIRTUAL TABLE wiki_translation_project_fts USING fts5(article_title, content='wiki_translation_project', tokenize="unicode61 remove_diacritics 2 categories 'L* N* Co M*'")''',
+    '''CREATE TRIGGER wiki_translation_project_fts_insert AFTER INSERT ON wiki_translation_project BEGIN
+        INSERT INTO wiki_translation_project_fts(rowid, article_title) VALUES (new.rowid, new.article_title);
+    END''',
+    '''CREATE TRIGGER wiki_translation_project_fts_delete AFTER DELETE ON wiki_translation_project BEGIN
+        INSERT INTO wiki_translation_project_fts(wiki_translation_project_fts, rowid, article_title) VALUES ('delete', old.rowid, old.article_title);
+    END''',
+    '''CREATE TRIGGER wiki_translation_project_fts_update AFTER UPDATE OF article_title ON wiki_translation_project BEGIN
+        INSERT INTO wiki_translation_project_fts(wiki_translation_project_fts, rowid, article_title) VALUES ('delete', old.rowid, old.article_title);
+        INSERT INTO wiki_translation_project_fts(rowid, article_title) VALUES (new.rowid, new.article_title);
+    END''',
+]
+
+SQLITE_DROP = [
+    'DROP TABLE IF EXISTS wiki_translation_sentence_fts',
+    'DROP TABLE IF EXISTS wiki_translation_project_fts',
+    'DROP TRIGGER IF EXISTS wiki_translation_sentence_fts_insert',
+    'DROP TRIGGER IF EXISTS wiki_translation_sentence_fts_delete',
+    'DROP TRIGGER IF EXISTS wiki_translation_sentence_fts_update',
+    'DROP TRIGGER IF EXISTS wiki_translation_project_fts_insert',
+    'DROP TRIGGER IF EXISTS wiki_translation_project_fts_delete',
+    'DROP TRIGGER IF EXISTS wiki_translation_project_fts_update',
+]
+
+#Reads all the rows again from the model tables
+SQLITE_REBUILD = [
+    "INSERT INTO wiki_translation_sentence_fts(wiki_translation_sentence_fts) VALUES ('rebuild')",
+    "INSERT INTO wiki_translation_project_fts(wiki_translation_project_fts) VALUES ('rebuild')",
+]
+
+#Postgres keeps expression indexes up to date by itself, and does not drop them when a column is added
+POSTGRES_SCHEMA = [
+    "CREATE INDEX sentence_search_idx ON wiki_translation_sentence USING GIN (to_tsvector('simple', coalesce(original_sentence, '') || ' ' || coalesce(translated_sentence, '')))",
+    "CREATE INDEX project_search_idx ON wiki_translation_project USING GIN (to_tsvector('simple', article_title))",
+]
+
+POSTGRES_DROP = [
+    'DROP INDEX IF EXISTS sentence_search_idx',
+    'DROP INDEX IF EXISTS project_search_idx',
+]
+
+def create_index(apps, schema_editor):
+    #Dropped first, so it also recreates the triggers dropped by a table rebuild
+    vendor = schema_editor.connection.vendor
+    if (vendor == 'sqlite'):
+        for statement in SQLITE_DROP + SQLITE_SCHEMA + SQLITE_REBUILD:
+            schema_editor.execute(statement)
+    elif (vendor == 'postgresql'):
+        for statement in POSTGRES_DROP + POSTGRES_SCHEMA:
+            schema_editor.execute(statement)
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if (vendor == 'sqlite'):
+        for statement in SQLITE_DROP:
+            schema_editor.execute(statement)
+    elif (vendor == 'postgresql'):
+        for statement in POSTGRES_DROP:
+            schema_editor.execute(statement)
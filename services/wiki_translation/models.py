@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
 
 # Create your models here.
@@ -12,8 +13,11 @@ class Project(models.Model):
     #Language with max length 3 chars
     target_language = models.CharField(max_length = 3)
 
-    #Project id is created while serializing as language_title. This is the primary key. and max length is 154
-    project_id = models.CharField(primary_key = True, max_length=154)
+    #Primary key of Project Model. Sentences reference it, so it is kept small
+    id = models.BigAutoField(primary_key = True)
+
+    #Project id is created while serializing as language_title. It is the id used in the urls, resolved to the primary key by project_resolver
+    project_id = models.CharField(max_length = 154, unique = True)
 
     #Automatically stores the creation time during serialization
     created_on = models.DateTimeField()
@@ -24,6 +28,39 @@ class Project(models.Model):
     #Stores the user id of the assignee. It call be null
     assigned_to = models.BigIntegerField(null=True)
 
+    #Status of the sentence ingestion from wikipedia. Projects created without ingestion are ready by default
+    class Status(models.TextChoices):
+        PENDING = 'pending'
+        FETCHING = 'fetching'
+        TOKENIZING = 'tokenizing'
+        READY = 'ready'
+        FAILED = 'failed'
+
+    status = models.CharField(max_length = 10, choices = Status.choices, default = Status.READY)
+
+    #Stores the cause of failure when the ingestion fails
+    status_message = models.TextField(blank = True, default = '')
+
+    #Automatically stores the time of the last change. Used as the ETag of the project, so queryset updates have to set it as well
+    updated_on = models.DateTimeField(auto_now = True)
+
+    #Progress of the translation, kept up to date by progress.py when sentences are added or translated, so the project list needs no count.
+    #translated_count counts the sentences with a non blank translation. last_activity is the time of the last change of a sentence, null without sentences
+    sentence_count = models.IntegerField(default = 0)
+    translated_count = models.IntegerField(default = 0)
+    last_activity = models.DateTimeField(null = True)
+
+    class Meta:
+        #Indexes for the project lists of Annotators and Managers
+        indexes = [
+            models.Index(fields = ['assigned_to', 'created_on'], name = 'project_assigned_created_idx'),
+            models.Index(fields = ['created_by', 'created_on'], name = 'project_creator_created_idx'),
+        ]
+        #One project for each language and title, titles differing only in case are the same article like in project_id
+        constraints = [
+            models.UniqueConstraint('target_language', Lower('article_title'), name = 'project_language_title_uniq'),
+        ]
+
     def __str__(self) -> str:
         return self.project_id
 
@@ -31,7 +68,7 @@ class Project(models.Model):
 class Sentence(models.Model):
 
     #Foreign key that links Sentences to Project Model. All Sentence Models that are in a Project is also deleted when the Project is deleted.
-    #Stored as project_id in the DB
+    #Stored as project_id in the DB, with the integer primary key of the project. Use project__project_id for filtering by the id in the urls
     project = models.ForeignKey(Project, on_delete = models.CASCADE, db_column = "project_id")
 
     #Primary key of Sentence Model.
@@ -46,3 +83,103 @@ class Sentence(models.Model):
     #Automatically stores the creation time during serialization
     created_on = models.DateTimeField(auto_now_add=True)
 
+    #Automatically stores the time of the last change. Used for syncing only the changed sentences
+    updated_on = models.DateTimeField(auto_now=True)
+
+    #True when the translation was filled from an exact match of another project during ingestion, and not yet changed by the annotator
+    prefilled = models.BooleanField(default=False)
+
+    class Meta:
+        #Indexes for listing the sentences of a project in order, and for syncing the changed ones
+        indexes = [
+            models.Index(fields = ['project', 'sentence_id'], name = 'sentence_project_id_idx'),
+            models.Index(fields = ['project', 'updated_on'], name = 'sentence_project_updated_idx'),
+        ]
+
+#Model : SegmentTranslation
+#Latest translation of each original sentence for a language, used for filling the same sentence in new projects
+class SegmentTranslation(models.Model):
+
+    #sha256 of the normalized original sentence
+    source_hash = models.CharField(max_length = 64)
+
+    #Language of the translation, same as Project.target_language
+    target_language = models.CharField(max_length = 3)
+
+    #Stores the translated sentence
+    translated_sentence = models.TextField()
+
+    #Sentence the translation is taken from. The translation is withdrawn when the sentence is deleted
+    sentence = models.ForeignKey(Sentence, null = True, on_delete = models.CASCADE)
+
+    #Automatically stores the time of the last change
+    updated_on = models.DateTimeField(auto_now = True)
+
+    class Meta:
+        unique_together = [['source_hash', 'target_language']]
+
+#Model : MemorySignature
+#Band keys of the MinHash signature of each original sentence, used by the translation memory (memory.py) for finding the similar sentences
+class MemorySignature(models.Model):
+
+    #Sentence the key is computed from. The keys are deleted with the sentence
+    sentence = models.ForeignKey(Sentence, on_delete = models.CASCADE)
+
+    #Hash of one band of the signature. Sentences sharing a key are candidates of each other
+    band_key = models.BigIntegerField(db_index = True)
+
+#Model : ArticleCacheEntry
+#Cache of the wikipedia summaries, so the same article is not fetched and tokenized again for every language
+class ArticleCacheEntry(models.Model):
+
+    #Normalized title of the wikipedia page
+    title = models.CharField(max_length = 255)
+
+    #Language of the wikipedia the summary is taken from
+    language = models.CharField(max_length = 10)
+
+    #Stores the raw summary of the page
+    summary = models.TextField()
+
+    #Stores the tokenized summary as a list of sentences. It is null till the summary is tokenized
+    sentences = models.JSONField(null = True)
+
+    #Revision id of the page when it was fetched. It is null when revisions are not checked
+    revision_id = models.BigIntegerField(null = True)
+
+    #Time when the summary was fetched, used for expiring the entry
+    fetched_on = models.DateTimeField()
+
+    #Time when the entry was last read, used for evicting the least recently used entries
+    last_used = models.DateTimeField(db_index = True)
+
+    class Meta:
+        unique_together = [['title', 'language']]
+
+    def __str__(self) -> str:
+        return f'{self.language}:{self.title}'
+
+#Model : LocalArticle
+#Lead sections imported from a wikipedia dump by the import_wikipedia_dump command, so articles can be ingested without wikipedia
+class LocalArticle(models.Model):
+
+    #Normalized title of the wikipedia page, same as ArticleCacheEntry.title
+    title = models.CharField(max_length = 255)
+
+    #Language of the wikipedia the dump is taken from
+    language = models.CharField(max_length = 10)
+
+    #Stores the plain text of the lead section, the same text as the summary fetched from wikipedia
+    summary = models.TextField()
+
+    #Revision id of the page in the dump. It is null when the dump has no revisions
+    revision_id = models.BigIntegerField(null = True)
+
+    #Time when the page was imported
+    imported_on = models.DateTimeField()
+
+    class Meta:
+        unique_together = [['title', 'language']]
+
+    def __str__(self) -> str:
+        return f'{self.language}:{self.title}'
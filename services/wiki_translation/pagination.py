@@ -0,0 +1,8 @@
+from rest_framework.pagination import CursorPagination
+
+#Keyset pagination of sentences ordered by sentence_id. The next link carries the cursor of the last sentence
+class SentenceCursorPagination(CursorPagination):
+    ordering = 'sentence_id'
+    page_size = 100
+    page_size_query_param = 'limit'
+    max_page_size = 1000
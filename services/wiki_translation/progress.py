@@ -0,0 +1,82 @@
+from django.db import transaction
+from django.db.models import Count, F, Max, Q
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import Project, Sentence
+from .project_cache import project_list_cache
+
+#Sentences with a translation, blank ones are not counted like in the export
+TRANSLATED = Q(translated_sentence__isnull = False) & ~Q(translated_sentence = '')
+
+def is_translated(translated_sentence):
+    return bool(translated_sentence)
+
+#Counters of Project. Sentences are changed with bulk operations, which send no signal, so the code changing them calls these functions
+
+def add_progress(project_key, sentences = 0, translated = 0, activity = None):
+    #Adds to the counters of the project with F() expressions, so concurrent saves are all counted.
+    #update() does not set auto_now fields, and the project list shows the counters, so updated_on is set as well
+    activity = activity or timezone.now()
+    return Project.objects.filter(pk = project_key).update(sentence_count = F('sentence_count') + sentences, translated_count = F('translated_count') + translated,
+                                                           last_activity = activity, updated_on = activity)
+
+def record_progress(project, sentences = 0, translated = 0, activity = None):
+    #For the views, which have the project loaded. Cached project lists with the project are invalidated
+    add_progress(project.pk, sentences, translated, activity)
+    project_list_cache.invalidate([project.created_by_id], [project.assigned_to])
+
+def record_sentence_change(previous_project, previous_translation, sentence):
+    #For a sentence saved by PATCH, which can move it to another project as well
+    was_translated = int(is_translated(previous_translation))
+    now_translated = int(is_translated(sentence.translated_sentence))
+    if (sentence.project_id == previous_project.pk):
+        record_progress(previous_project, translated = now_translated - was_translated, activity = sentence.updated_on)
+    else:
+        record_progress(previous_project, sentences = -1, translated = -was_translated, activity = sentence.updated_on)
+        record_progress(sentence.project, sentences = 1, translated = now_translated, activity = sentence.updated_on)
+
+@receiver(post_delete, sender = Sentence)
+def sentence_deleted(sender, instance, origin = None, **kwargs):
+    #Deleted sentences are counted out, which moves last_activity and so the ETag of the sentences of the project.
+    #Nothing is left to update when the project is deleted with its sentences
+    if (isinstance(origin, Project) or getattr(origin, 'model', None) is Project):
+        return
+    project = Project.objects.filter(pk = instance.project_id).only('id', 'created_by', 'assigned_to').first()
+    if (project is not None):
+        record_progress(project, sentences = -1, translated = -int(is_translated(instance.translated_sentence)))
+
+def count_progress(first_key, last_key):
+    #Returns {project key: (sentence_count, translated_count, last_activity)} of the projects in the range of keys which have sentences
+    rows = Sentence.objects.filter(project__gte = first_key, project__lte = last_key).values('project') \
+        .annotate(sentence_count = Count('sentence_id'), translated_count = Count('sentence_id', filter = TRANSLATED), last_activity = Max('updated_on'))
+    return {row['project']: (row['sentence_count'], row['translated_count'], row['last_activity']) for row in rows}
+
+def repair_progress(batch_size = 1000):
+    #Recomputes the counters from the sentences, for batch_size projects at a time, and saves the ones which are wrong.
+    #Returns (number of projects repaired, number of projects). Sentences saved during a batch may be counted wrong, so it is run when the sentences are not edited
+    repaired = 0
+    checked = 0
+    last_key = 0
+    while True:
+        with transaction.atomic():
+            projects = list(Project.objects.filter(pk__gt = last_key).order_by('pk')
+                            .only('id', 'created_by', 'assigned_to', 'sentence_count', 'translated_count', 'last_activity')[:batch_size])
+            if (not projects):
+                return repaired, checked
+            last_key = projects[-1].pk
+            progress = count_progress(projects[0].pk, last_key)
+            now = timezone.now()
+            changed = []
+            for project in projects:
+                counters = progress.get(project.pk, (0, 0, None))
+                if (counters != (project.sentence_count, project.translated_count, project.last_activity)):
+                    project.sentence_count, project.translated_count, project.last_activity = counters
+                    project.updated_on = now
+                    changed.append(project)
+            Project.objects.bulk_update(changed, ['sentence_count', 'translated_count', 'last_activity', 'updated_on'])
+        #bulk_update does not send post_save
+        if (changed):
+            project_list_cache.invalidate([project.created_by_id for project in changed], [project.assigned_to for project in changed])
+        repaired += len(changed)
+        checked += len(projects)
@@ -0,0 +1,196 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Project
+from .roles import SUPERUSER, MANAGER, ANNOTATOR
+from .shared_cache import is_shared
+from . import metrics
+
+#Superusers see the same list, so they share one entry
+ALL_USERS = '*'
+
+VERSION_KEY = 'wiki_translation:projects:version:{}:{}'
+LIST_KEY = 'wiki_translation:projects:{}:{}:{}'
+
+#Cache of the serialized project lists per user and role, with their ETag.
+#Each list has a version, which is changed when one of its projects changes. Lists are stored under their version,
+#so a list built while its projects were changing is never read
+class ProjectListCache:
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.lock = threading.Lock()
+
+    #Settings are read on every call, so they can be overridden without creating a new cache
+    def option(self, name, default):
+        return getattr(settings, 'PROJECT_LIST_CACHE', {}).get(name, default)
+
+    def is_enabled(self):
+        return self.option('ENABLED', True) and is_shared(self.option('CACHE', 'default'))
+
+    def get_cache(self):
+        #Any django cache backend can be used, redis included
+        return caches[self.option('CACHE', 'default')]
+
+    def owner(self, user_id, role):
+        return ALL_USERS if role == SUPERUSER else user_id
+
+    def get_version(self, cache, role, owner):
+        key = VERSION_KEY.format(role, owner)
+        version = cache.get(key)
+        if (version is None):
+            #Versions start from the clock, so an evicted version is never used again
+            cache.add(key, time.time_ns(), None)
+            version = cache.get(key)
+        return version
+
+    def lookup(self, user_id, role, bypass = False):
+        #Returns the key of the list and the cached (etag, data), which is None on a miss.
+        #Version is read before the projects are queried, so a change during the query makes the stored list stale at once
+        if (not self.is_enabled()):
+            return None, None
+        cache = self.get_cache()
+        owner = self.owner(user_id, role)
+        key = LIST_KEY.format(role, owner, self.get_version(cache, role, owner))
+        entry = None if bypass else cache.get(key)
+        self.count('bypasses' if bypass else ('hits' if entry is not None else 'misses'))
+        return key, entry
+
+    def store(self, key, etag, data):
+        if (key is not None):
+            self.get_cache().set(key, (etag, data), self.option('TIMEOUT', 5 * 60))
+
+    def invalidate(self, created_by_ids = (), assigned_to_ids = ()):
+        #Lists of the superusers, of the managers who created the projects and of the annotators they are assigned to
+        cache = self.get_cache()
+        owners = [(SUPERUSER, ALL_USERS)] + [(MANAGER, user_id) for user_id in set(created_by_ids)] \
+            + [(ANNOTATOR, user_id) for user_id in set(assigned_to_ids) if user_id is not None]
+        for role, owner in owners:
+            try:
+                cache.incr(VERSION_KEY.format(role, owner))
+            except ValueError:
+                #Missing version gets a new one on the next lookup
+                pass
+
+    def invalidate_projects(self, project_ids):
+        #For the queryset updates, which do not send signals
+        if (self.is_enabled()):
+            owners = list(Project.objects.filter(project_id__in = project_ids).values_list('created_by_id', 'assigned_to'))
+            self.invalidate([created_by_id for created_by_id, _ in owners], [assigned_to for _, assigned_to in owners])
+
+    def count(self, name):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'bypasses': self.bypasses, 'hit_rate': self.hits / lookups if lookups else 0.0}
+
+    def reset_stats(self):
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+            self.bypasses = 0
+
+#Cache shared by the whole process. Lists and versions are in the django cache, so processes sharing it see the same lists
+project_list_cache = ProjectListCache()
+
+#LRU of the integer keys of the projects by their project_id, the id used in the urls. Projects are then read by their primary key.
+#project_id of a project never changes, so a key can only be stale when its project is deleted.
+#A stale or missing key falls back to the project_id, so each process can keep its own entries
+class ProjectResolver:
+
+    def __init__(self, max_entries = None):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        #Same entries by key, for serializing the sentences
+        self.project_ids = {}
+        self.lock = threading.Lock()
+
+    def get_max_entries(self):
+        return self.max_entries if self.max_entries is not None else getattr(settings, 'PROJECT_RESOLVER', {}).get('SIZE', 10000)
+
+    def get(self, project_id):
+        with self.lock:
+            key = self.entries.get(project_id)
+            if (key is not None):
+                self.entries.move_to_end(project_id)
+            return key
+
+    def get_project_id(self, key):
+        #Returns the project_id of the project with the key, read from the DB when it is not known
+        with self.lock:
+            project_id = self.project_ids.get(key)
+        if (project_id is None):
+            project_id = Project.objects.values_list('project_id', flat = True).get(pk = key)
+            self.remember(project_id, key)
+        return project_id
+
+    def remember(self, project_id, key):
+        with self.lock:
+            self.entries[project_id] = key
+            self.entries.move_to_end(project_id)
+            self.project_ids[key] = project_id
+            while (len(self.entries) > self.get_max_entries()):
+                _, evicted = self.entries.popitem(last = False)
+                self.project_ids.pop(evicted, None)
+
+    def forget(self, project_id):
+        with self.lock:
+            key = self.entries.pop(project_id, None)
+            self.project_ids.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.project_ids.clear()
+
+    def get_project(self, projects, project_id):
+        #Returns the project of the queryset with the project_id, raises Project.DoesNotExist like get()
+        key = self.get(project_id)
+        if (key is not None):
+            project = projects.filter(pk = key).first()
+            #Checked, as keys of rolled back or restored projects can be given again
+            if (project is not None and project.project_id == project_id):
+                return project
+            #Deleted, or not available to the user. Looked up again by project_id, as a project created again has a new key
+            self.forget(project_id)
+        project = projects.get(project_id = project_id)
+        self.remember(project_id, project.pk)
+        return project
+
+    async def aget_project(self, projects, project_id):
+        key = self.get(project_id)
+        if (key is not None):
+            project = await projects.filter(pk = key).afirst()
+            if (project is not None and project.project_id == project_id):
+                return project
+            self.forget(project_id)
+        project = await projects.aget(project_id = project_id)
+        self.remember(project_id, project.pk)
+        return project
+
+#Shared by every request of the process
+project_resolver = ProjectResolver()
+
+metrics.register_counter('wiki_project_list_cache_hits_total', 'Project lists served from the cache', lambda: project_list_cache.hits)
+metrics.register_counter('wiki_project_list_cache_misses_total', 'Project lists built from the DB', lambda: project_list_cache.misses)
+metrics.register_counter('wiki_project_list_cache_bypasses_total', 'Project lists built from the DB because of the X-Cache-Bypass header',
+                         lambda: project_list_cache.bypasses)
+
+@receiver(post_save, sender = Project)
+@receiver(post_delete, sender = Project)
+def project_changed(sender, instance, **kwargs):
+    if (project_list_cache.is_enabled()):
+        project_list_cache.invalidate([instance.created_by_id], [instance.assigned_to])
+
+@receiver(post_delete, sender = Project)
+def project_deleted(sender, instance, **kwargs):
+    project_resolver.forget(instance.project_id)
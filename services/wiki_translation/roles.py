@@ -0,0 +1,138 @@
+import time
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.permissions import BasePermission
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from .models import Project
+from .shared_cache import is_shared
+
+#Roles of the users. Manager takes precedence over Annotator when a user is in both groups
+SUPERUSER = 'superuser'
+MANAGER = 'Manager'
+ANNOTATOR = 'Annotator'
+
+#Stored in the cache for users without any role, as None means a cache miss
+NO_ROLE = ''
+
+#Cached roles are valid for an hour, even if an invalidation is missed
+ROLE_CACHE_TIMEOUT = 60 * 60
+
+VERSION_KEY = 'wiki_translation:role:version'
+
+#Revocation list of the role claims in the tokens: time of the last role change, per user and for everyone
+REVOKED_KEY = 'wiki_translation:role:revoked:{}'
+REVOKED_ALL_KEY = 'wiki_translation:role:revoked:all'
+
+def role_cache_key(user_id):
+    #Version is changed when a group is renamed or deleted, which makes every cached role stale
+    version = cache.get_or_set(VERSION_KEY, 1, None)
+    return f'wiki_translation:role:{version}:{user_id}'
+
+def resolve_role(user):
+    if (user.is_superuser):
+        return SUPERUSER
+    names = set(user.groups.filter(name__in = [MANAGER, ANNOTATOR]).values_list('name', flat = True))
+    if (MANAGER in names):
+        return MANAGER
+    if (ANNOTATOR in names):
+        return ANNOTATOR
+    return NO_ROLE
+
+def get_role(user):
+    #Role is kept on the user object, so it is resolved only once per request
+    if (not hasattr(user, '_wiki_role')):
+        if (not user.is_authenticated):
+            user._wiki_role = NO_ROLE
+        elif (not is_shared()):
+            #See is_shared
+            user._wiki_role = resolve_role(user)
+        else:
+            key = role_cache_key(user.pk)
+            role = cache.get(key)
+            if (role is None):
+                role = resolve_role(user)
+                cache.set(key, role, ROLE_CACHE_TIMEOUT)
+            user._wiki_role = role
+    return user._wiki_role or None
+
+def is_manager(role):
+    return role in (SUPERUSER, MANAGER)
+
+def scoped_projects(user, role = None):
+    #Returns the projects the user can see according to the role
+    role = role or get_role(user)
+    if (role == SUPERUSER):
+        return Project.objects.all()
+    if (role == MANAGER):
+        return Project.objects.filter(created_by = user.id)
+    if (role == ANNOTATOR):
+        return Project.objects.filter(assigned_to = user.id)
+    return Project.objects.none()
+
+def has_project_access(user, project, role = None):
+    #Same rules as scoped_projects, for a project which is already loaded
+    role = role or get_role(user)
+    if (role == SUPERUSER):
+        return True
+    if (role == MANAGER):
+        return project.created_by_id == user.id
+    if (role == ANNOTATOR):
+        return project.assigned_to == user.id
+    return False
+
+#Permission: Allows only superusers and users of group Manager or Annotator
+class HasProjectRole(BasePermission):
+
+    def has_permission(self, request, view):
+        if (get_role(request.user) is None):
+            raise PermissionDenied({'error': 'Not enough permission'})
+        return True
+
+def revocation_timeout():
+    #Access tokens made by a refresh keep the claims of the login, so they can be used till the refresh token and the last access token expire
+    return int((jwt_settings.REFRESH_TOKEN_LIFETIME + jwt_settings.ACCESS_TOKEN_LIFETIME).total_seconds())
+
+def revoked_since(user_id):
+    #Returns the time of the last role change of the user, tokens issued before it have stale claims
+    values = cache.get_many([REVOKED_KEY.format(user_id), REVOKED_ALL_KEY])
+    return max(values.values(), default = 0)
+
+def invalidate_role(user_ids):
+    cache.delete_many([role_cache_key(user_id) for user_id in user_ids])
+    now = time.time()
+    cache.set_many({REVOKED_KEY.format(user_id): now for user_id in user_ids}, revocation_timeout())
+
+def invalidate_all_roles():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+    cache.set(REVOKED_ALL_KEY, time.time(), revocation_timeout())
+
+@receiver(m2m_changed, sender = User.groups.through)
+def groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if (action not in ('post_add', 'post_remove', 'pre_clear', 'post_clear')):
+        return
+    if (not reverse):
+        #user.groups was changed
+        invalidate_role([instance.pk])
+    elif (pk_set):
+        #group.user_set was changed
+        invalidate_role(pk_set)
+    else:
+        #group.user_set was cleared, members are not known anymore
+        invalidate_all_roles()
+
+@receiver(post_save, sender = User)
+@receiver(post_delete, sender = User)
+def user_saved(sender, instance, **kwargs):
+    #is_superuser, is_active or the password may have changed, or the user is gone
+    invalidate_role([instance.pk])
+
+@receiver(post_save, sender = Group)
+@receiver(post_delete, sender = Group)
+def group_changed(sender, instance, **kwargs):
+    invalidate_all_roles()
@@ -0,0 +1,121 @@
+from django.core.exceptions import EmptyResultSet
+from django.db import connection
+from django.utils.html import escape
+from .models import Project, Sentence
+
+#Highlighted terms are marked with private use characters, which are turned into <mark> tags after the text is escaped
+MARK_START = '\ue000'
+MARK_END = '\ue001'
+
+SENTENCE_TABLE = Sentence._meta.db_table
+PROJECT_TABLE = Project._meta.db_table
+SENTENCE_INDEX = f'{SENTENCE_TABLE}_fts'
+PROJECT_INDEX = f'{PROJECT_TABLE}_fts'
+
+#FTS5 tables and triggers, and the Postgres indexes, are created by the migrations with the frozen schema of migrations/_search_schema_0007.py.
+#The triggers keep the FTS5 tables in sync on every insert, update and delete, bulk ones included
+
+#Postgres keeps expression indexes up to date by itself. The queries below use the same expressions, so the indexes are used
+SENTENCE_VECTOR = "to_tsvector('simple', coalesce({0}original_sentence, '') || ' ' || coalesce({0}translated_sentence, ''))"
+PROJECT_VECTOR = "to_tsvector('simple', {0}article_title)"
+
+HEADLINE_OPTIONS = f'StartSel={MARK_START}, StopSel={MARK_END}, HighlightAll=true'
+
+def is_supported(vendor = None):
+    return (vendor or connection.vendor) in ('sqlite', 'postgresql')
+
+def rebuild_index(db_connection = None):
+    #Reads all the rows again from the model tables. Postgres indexes are never out of sync
+    db_connection = db_connection or connection
+    if (db_connection.vendor == 'sqlite'):
+        with db_connection.cursor() as cursor:
+            for index in (SENTENCE_INDEX, PROJECT_INDEX):
+                cursor.execute(f"INSERT INTO {index}({index}) VALUES ('rebuild')")
+
+def match_query(text):
+    #Every word has to be present. Words are quoted, so the search syntax of FTS5 is never interpreted
+    return ' '.join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+def highlight(text):
+    #Text is escaped before adding the tags, so the result is safe to render as html
+    if (text is None):
+        return None
+    return escape(text).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+def scope_sql(projects):
+    sql, params = projects.values('id').query.sql_with_params()
+    return f'({sql})', list(params)
+
+def sentence_query(text, projects):
+    #Returns the sql and the params of the matching sentences of the projects, best match first
+    scope, scope_params = scope_sql(projects)
+    if (connection.vendor == 'sqlite'):
+        sql = f'''SELECT s.sentence_id, p.project_id,
+                    highlight({SENTENCE_INDEX}, 0, %s, %s), highlight({SENTENCE_INDEX}, 1, %s, %s)
+                FROM {SENTENCE_INDEX} JOIN {SENTENCE_TABLE} s ON s.sentence_id = {SENTENCE_INDEX}.rowid JOIN {PROJECT_TABLE} p ON p.id = s.project_id
+                WHERE {SENTENCE_INDEX} MATCH %s AND s.project_id IN {scope}
+                ORDER BY {SENTENCE_INDEX}.rank, s.sentence_id'''
+        return sql, [MARK_START, MARK_END, MARK_START, MARK_END, match_query(text)] + scope_params
+    sql = f'''SELECT s.sentence_id, p.project_id,
+                ts_headline('simple', s.original_sentence, q, %s), ts_headline('simple', s.translated_sentence, q, %s)
+            FROM {SENTENCE_TABLE} s JOIN {PROJECT_TABLE} p ON p.id = s.project_id, plainto_tsquery('simple', %s) q
+            WHERE {SENTENCE_VECTOR.format('s.')} @@ q AND s.project_id IN {scope}
+            ORDER BY ts_rank({SENTENCE_VECTOR.format('s.')}, q) DESC, s.sentence_id'''
+    return sql, [HEADLINE_OPTIONS, HEADLINE_OPTIONS, text] + scope_params
+
+def project_query(text, projects):
+    #Returns the sql and the params of the projects with a matching title, best match first
+    scope, scope_params = scope_sql(projects)
+    if (connection.vendor == 'sqlite'):
+        sql = f'''SELECT p.project_id, p.target_language, highlight({PROJECT_INDEX}, 0, %s, %s)
+                FROM {PROJECT_INDEX} JOIN {PROJECT_TABLE} p ON p.rowid = {PROJECT_INDEX}.rowid
+                WHERE {PROJECT_INDEX} MATCH %s AND p.id IN {scope}
+                ORDER BY {PROJECT_INDEX}.rank, p.project_id'''
+        return sql, [MARK_START, MARK_END, match_query(text)] + scope_params
+    sql = f'''SELECT p.project_id, p.target_language, ts_headline('simple', p.article_title, q, %s)
+            FROM {PROJECT_TABLE} p, plainto_tsquery('simple', %s) q
+            WHERE {PROJECT_VECTOR.format('p.')} @@ q AND p.id IN {scope}
+            ORDER BY ts_rank({PROJECT_VECTOR.format('p.')}, q) DESC, p.project_id'''
+    return sql, [HEADLINE_OPTIONS, text] + scope_params
+
+def run_page(query, text, projects, page, page_size):
+    #Returns the total count and the rows of the page
+    try:
+        sql, params = query(text, projects)
+    except EmptyResultSet:
+        #No project is available for the user
+        return 0, []
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM ({sql}) matches', params)
+        count = cursor.fetchone()[0]
+        cursor.execute(f'{sql} LIMIT %s OFFSET %s', params + [page_size, (page - 1) * page_size])
+        return count, cursor.fetchall()
+
+def search_sentences(text, projects, page = 1, page_size = 20):
+    count, rows = run_page(sentence_query, text, projects, page, page_size)
+    return count, [
+        {
+            'sentence_id': sentence_id,
+            'project_id': project_id,
+            'original_sentence': highlight(original_sentence),
+            'translated_sentence': highlight(translated_sentence),
+        }
+        for sentence_id, project_id, original_sentence, translated_sentence in rows
+    ]
+
+def search_projects(text, projects, page = 1, page_size = 20):
+    count, rows = run_page(project_query, text, projects, page, page_size)
+    return count, [
+        {
+            'project_id': project_id,
+            'target_language': target_language,
+            'article_title': highlight(article_title),
+        }
+        for project_id, target_language, article_title in rows
+    ]
+
+#Search targets accepted by the in query param
+SEARCH_TARGETS = {
+    'sentences': search_sentences,
+    'projects': search_projects,
+}
@@ -0,0 +1,58 @@
+import hashlib
+import unicodedata
+from django.db.models.signals import post_init, post_save
+from django.dispatch import receiver
+from .models import SegmentTranslation, Sentence
+
+#Number of segments written per query
+BULK_BATCH_SIZE = 500
+
+def source_hash(text):
+    #Same sentence with different spacing or unicode composition gets the same hash
+    normalized = unicodedata.normalize('NFC', ' '.join(text.split()))
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+def record(sentences, target_language):
+    #Stores the translations done by the annotators. Prefilled ones are already in the store.
+    #A cleared translation is withdrawn: the entry taken from the sentence is deleted, so later ingestions do not prefill it
+    store = {}
+    cleared = []
+    for sentence in sentences:
+        if (sentence.prefilled):
+            continue
+        if (sentence.translated_sentence and sentence.translated_sentence.strip()):
+            segment_hash = source_hash(sentence.original_sentence)
+            store[segment_hash] = SegmentTranslation(source_hash = segment_hash, target_language = target_language,
+                                                     translated_sentence = sentence.translated_sentence, sentence_id = sentence.sentence_id)
+        else:
+            cleared.append(sentence.sentence_id)
+    #Latest translation of a sentence replaces the older one
+    SegmentTranslation.objects.bulk_create(store.values(), batch_size = BULK_BATCH_SIZE, update_conflicts = True,
+                                           unique_fields = ['source_hash', 'target_language'], update_fields = ['translated_sentence', 'sentence', 'updated_on'])
+    for start in range(0, len(cleared), BULK_BATCH_SIZE):
+        SegmentTranslation.objects.filter(sentence__in = cleared[start:start + BULK_BATCH_SIZE], target_language = target_language).delete()
+
+def lookup(original_sentences, target_languages):
+    #Returns {(source hash, language): translated sentence} of the known sentences, with a query per 500 sentences
+    hashes = list(set(source_hash(original_sentence) for original_sentence in original_sentences))
+    translations = {}
+    for start in range(0, len(hashes), BULK_BATCH_SIZE):
+        segments = SegmentTranslation.objects.filter(source_hash__in = hashes[start:start + BULK_BATCH_SIZE], target_language__in = set(target_languages)) \
+            .values_list('source_hash', 'target_language', 'translated_sentence')
+        for segment_hash, target_language, translated_sentence in segments:
+            translations[(segment_hash, target_language)] = translated_sentence
+    return translations
+
+@receiver(post_init, sender = Sentence)
+def sentence_loaded(sender, instance, **kwargs):
+    #Translation the store was last written from. Deferred fields are not loaded for it
+    instance._segment_translation = instance.__dict__.get('translated_sentence')
+
+@receiver(post_save, sender = Sentence)
+def sentence_saved(sender, instance, created, **kwargs):
+    #Saves which leave the translation as it is write nothing, so they do not load the project for its language.
+    #The views have the project of the sentence loaded already
+    translation = instance.__dict__.get('translated_sentence')
+    if ((translation if created else translation != instance._segment_translation)):
+        record([instance], instance.project.target_language)
+    instance._segment_translation = translation
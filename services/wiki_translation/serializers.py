@@ -1,9 +1,38 @@
 from rest_framework import serializers
 from .models import Project, Sentence
+from .project_cache import project_resolver
 from datetime import datetime
 from .validators import validate_target_language
+from . import metrics
 
-class ProjectSerializer(serializers.ModelSerializer):
+def make_project_id(article_title, target_language):
+    return f'{target_language.lower()}_{article_title.lower()}'
+
+#Serializers which record the time of validation and representation in the request metrics
+class TimedListSerializer(serializers.ListSerializer):
+
+    def is_valid(self, raise_exception=False):
+        with metrics.timer('serializer'):
+            return super().is_valid(raise_exception=raise_exception)
+
+    @property
+    def data(self):
+        with metrics.timer('serializer'):
+            return super().data
+
+#Mixin of the serializers, many=True gets TimedListSerializer through Meta.list_serializer_class
+class TimedSerializerMixin:
+
+    def is_valid(self, raise_exception=False):
+        with metrics.timer('serializer'):
+            return super().is_valid(raise_exception=raise_exception)
+
+    @property
+    def data(self):
+        with metrics.timer('serializer'):
+            return super().data
+
+class ProjectSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     
     #Setting it to read only, as we are not expecting the user to enter these
     created_on = serializers.DateTimeField(read_only=True)
@@ -11,11 +40,21 @@ class ProjectSerializer(serializers.ModelSerializer):
     #Setting it to read only, as it is combination of title and lang
     project_id = serializers.CharField(read_only=True)
 
+    #Setting it to read only, as it is changed only by the ingestion job
+    status = serializers.CharField(read_only=True)
+    status_message = serializers.CharField(read_only=True)
+
+    #Setting it to read only, as the progress is counted from the sentences
+    sentence_count = serializers.IntegerField(read_only=True)
+    translated_count = serializers.IntegerField(read_only=True)
+    last_activity = serializers.DateTimeField(read_only=True)
+
     class Meta:
         #Selecting the Model
         model = Project
         #Selecting field required for serialization
         fields = '__all__'
+        list_serializer_class = TimedListSerializer
         extra_kwargs = {
             #Adding validation
             'target_language': {'validators': [validate_target_language]}
@@ -27,7 +66,7 @@ class ProjectSerializer(serializers.ModelSerializer):
         target_language = validated_data.get('target_language')
 
         # Set the project_id based on article_title and target_language
-        project_id = f'{target_language.lower()}_{article_title.lower()}'
+        project_id = make_project_id(article_title, target_language)
 
         # Set the current time as created_on
         created_on = datetime.now()
@@ -39,10 +78,60 @@ class ProjectSerializer(serializers.ModelSerializer):
         # Call the create method of the parent serializer
         return super().create(validated_data)
 
-class SentenceSerializer(serializers.ModelSerializer):
+#Sentences reference the integer key of the project, the API uses its project_id.
+#Only the key of the sentence is read, and its project_id comes from project_resolver, so a list of sentences makes no query for its project
+class ProjectIdField(serializers.SlugRelatedField):
+
+    def __init__(self, **kwargs):
+        super().__init__(slug_field='project_id', queryset=Project.objects.all(), **kwargs)
+
+    def use_pk_only_optimization(self):
+        return True
+
+    def get_attribute(self, instance):
+        #Project loaded with the sentence is used as it is
+        if (Sentence.project.is_cached(instance)):
+            return instance.project
+        return super().get_attribute(instance)
+
+    def to_representation(self, value):
+        if (isinstance(value, Project)):
+            return value.project_id
+        return project_resolver.get_project_id(value.pk)
+
+class SentenceSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+
+    #Sentences are given and taken with the project_id of their project, the id used in the urls
+    project = ProjectIdField()
+
+    #Setting it to read only, as it is set by the ingestion
+    prefilled = serializers.BooleanField(read_only=True)
+
+    #Takes an optional list of fields, so only the needed columns are returned
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if (fields is not None):
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
     class Meta:
         #Selecting the Model
         model = Sentence
         #Selecting field required for serialization
         fields = '__all__'
+        list_serializer_class = TimedListSerializer
+
+
+class SentenceBulkUpdateSerializer(TimedSerializerMixin, serializers.Serializer):
+    #Id of the sentence which needs to be updated
+    sentence_id = serializers.IntegerField()
+    #New translation for the sentence, It can also null or blank
+    translated_sentence = serializers.CharField(allow_blank=True, allow_null=True, trim_whitespace=False)
 
+class ProjectBatchSerializer(TimedSerializerMixin, serializers.Serializer):
+    #Titles of the wikipedia articles, same max length as Project.article_title
+    article_titles = serializers.ListField(child=serializers.CharField(max_length=150), min_length=1, max_length=1000)
+    #Languages each article is created for
+    target_languages = serializers.ListField(child=serializers.CharField(max_length=3, validators=[validate_target_language]), min_length=1)
+    #Stores the user id of the assignee for all the projects. It call be null
+    assigned_to = serializers.IntegerField(required=False, allow_null=True)
@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+def is_shared(alias = DEFAULT_CACHE_ALIAS):
+    #Roles, the user directory, the revocation list and the project lists are only cached in a cache every process of the server reads,
+    #otherwise a process keeps serving what another one changed. The local memory cache is per process, so it is used only when
+    #the server runs a single process, like manage.py does (runserver, the tests, the benchmarks)
+    cache = caches[alias]
+    if (isinstance(cache, DummyCache)):
+        return False
+    return settings.WIKI_SINGLE_PROCESS or not isinstance(cache, LocMemCache)
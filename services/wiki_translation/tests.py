@@ -1,22 +1,264 @@
-from django.test import TestCase
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.contrib.auth.models import User, Group
 from django.urls import reverse
+from django.utils import timezone
+from asgiref.sync import sync_to_async
 from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.test import APITestCase
-from datetime import datetime
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from translation.asgi import application as asgi_server_application, django_application as asgi_application
+import asyncio
+import bz2
+import httpx
+import json
+import os
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 from .serializers import ProjectSerializer
-from .models import Project, Sentence
-from .views import project_view, single_project_view, sentences_view
-from .utils import getSummaryForTitles
+from .models import Project, Sentence, ArticleCacheEntry, SegmentTranslation, LocalArticle, MemorySignature
+from .views import project_view, single_project_view, sentences_view, single_sentence_view, project_status_view, getUsers, export_view, project_batch_view, sentence_suggestions_view, search_view, transliteration_view
+from .utils import ArticleCache, afetchSummary, tokenizeSummary
+from .database import set_journal_mode
+from .dump import lead_section
+from .authentication import StatelessJWTAuthentication, token_for_user, user_cache
+from .async_views import async_project_view, async_single_project_view, async_project_status_view, async_sentences_view, async_single_sentence_view
+from .etags import sentence_etag
+from .events import SentenceEvents
+from . import benchmark, changes, ingestion, metrics, tokenizer
+from .memory import translation_memory
+from .progress import add_progress, record_progress
+from .project_cache import project_list_cache, project_resolver
+from .roles import get_role
+from .transliteration import Script, phonetic_key, transliterator
 
 # Create your tests here.
 
+#Small punkt model shipped with the tests, so they run offline without downloading the real one.
+#It is an untrained PunktSentenceTokenizer which knows a few abbreviations, pickled for nltk 3.8
+FIXTURE_NLTK_DATA = os.path.join(os.path.dirname(__file__), 'test_data', 'nltk_data')
+
+def fixture_tokenizer(target):
+    #Loads the fixture model instead of the one loaded when the app was ready
+    return override_settings(NLTK_DATA_PATH=FIXTURE_NLTK_DATA)(mock.patch.object(tokenizer, '_tokenizer', None)(target))
+
 
 class UtilTest(TestCase):
 
+    def setUp(self):
+        self.fetched = []
+        self.revision = 1
+        self.cache = ArticleCache(fetcher=self.fetch, tokenizer=lambda summary: summary.split('. '), max_entries=2, ttl=60)
+
+    #Stub fetcher, so the tests does not need network
+    def fetch(self, title, language):
+        self.fetched.append((title, language))
+        return f'{title} is a country. It is in {language}'
+
     def testSummaryToPara(self):
-        summary = getSummaryForTitles("America")
-        self.assertEqual(33, len(summary))
+        summary = self.cache.get_sentences("America")
+        self.assertEqual(['America is a country', 'It is in en'], summary)
+
+    def testCacheHitForSameArticle(self):
+        self.cache.get_sentences("United States")
+        self.cache.get_sentences("united_states ")
+        self.assertEqual([("United States", 'en')], self.fetched)
+        self.assertEqual({'hits': 1, 'misses': 1}, self.cache.stats())
+        self.assertEqual(['united states'], list(ArticleCacheEntry.objects.values_list('title', flat=True)))
+
+    def testCacheExpiresAfterTTL(self):
+        self.cache.get_sentences("India")
+        ArticleCacheEntry.objects.update(fetched_on=timezone.now() - timedelta(seconds=61))
+        self.cache.get_sentences("India")
+        self.assertEqual(2, len(self.fetched))
+
+    def testCacheEvictsLeastRecentlyUsed(self):
+        self.cache.get_sentences("India")
+        self.cache.get_sentences("Nepal")
+        ArticleCacheEntry.objects.filter(title='india').update(last_used=timezone.now() + timedelta(seconds=1))
+        self.cache.get_sentences("Bhutan")
+        self.assertEqual(['bhutan', 'india'], sorted(ArticleCacheEntry.objects.values_list('title', flat=True)))
+
+    def testCacheRefetchesNewRevision(self):
+        self.cache.revision_fetcher = lambda title, language: self.revision
+        self.cache.get_sentences("India")
+        self.cache.get_sentences("India")
+        self.revision = 2
+        self.cache.get_sentences("India")
+        self.assertEqual(2, len(self.fetched))
+        self.assertEqual(2, ArticleCacheEntry.objects.get(title='india').revision_id)
+
+    async def testAsyncCacheUsesSyncFetcher(self):
+        entry = await self.cache.aget_entry("India")
+        self.assertEqual('India is a country. It is in en', entry.summary)
+        await self.cache.aget_entry("india")
+        self.assertEqual([("India", 'en')], self.fetched)
+        self.assertEqual({'hits': 1, 'misses': 1}, self.cache.stats())
+
+    async def testAsyncFetchSummary(self):
+        def handler(request):
+            self.assertEqual(request.url.params['titles'], 'India')
+            self.assertEqual(request.url.params['exintro'], '1')
+            return httpx.Response(200, json={'query': {'pages': {'14533': {'extract': ' India is a country. \n'}}}})
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        with mock.patch('wiki_translation.utils.getAsyncClient', return_value=client):
+            self.assertEqual('India is a country.', await afetchSummary('India'))
+            missing = httpx.Response(200, json={'query': {'pages': {'-1': {'missing': ''}}}})
+            client._transport = httpx.MockTransport(lambda request: missing)
+            self.assertEqual('', await afetchSummary('Not a page'))
+        await client.aclose()
+
+@fixture_tokenizer
+class TokenizerTest(TestCase):
+
+    @mock.patch('nltk.download')
+    def test_tokenize_does_not_download(self, download):
+        sentences = tokenizeSummary('Dr. Rao lives in India. It is in South Asia.')
+        self.assertEqual(['Dr. Rao lives in India.', 'It is in South Asia.'], sentences)
+        download.assert_not_called()
+
+    def test_missing_model_is_an_error(self):
+        #No untrained fallback, which would split the sentences differently
+        with tempfile.TemporaryDirectory() as path, override_settings(NLTK_DATA_PATH=path), mock.patch.object(tokenizer, '_tokenizer', None):
+            self.assertEqual([error.id for error in tokenizer.check_punkt_model(None)], ['wiki_translation.E001'])
+            with self.assertRaises(ImproperlyConfigured):
+                tokenizer.tokenize('India is a country.')
+
+    def test_tokenize_many(self):
+        sentences = tokenizer.tokenize_many(['First one. Second one.', 'Third one.'])
+        self.assertEqual([['First one.', 'Second one.'], ['Third one.']], sentences)
+        self.assertIs(tokenizer.get_tokenizer(), tokenizer.get_tokenizer())
+        self.assertIsNotNone(tokenizer.stats()['cold_tokenize_seconds'])
+
+class DatabaseTest(TestCase):
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite only')
+    def test_sqlite_connection_is_tuned(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            #1 is NORMAL
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_journal_mode_is_set_by_command_only(self):
+        #New connections leave the journal mode of the DB file as it is
+        self.assertNotIn('journal_mode', settings.SQLITE_PRAGMAS)
+        with tempfile.TemporaryDirectory() as path:
+            db = sqlite3.connect(os.path.join(path, 'db.sqlite3'))
+            try:
+                self.assertEqual(set_journal_mode(db.cursor(), 'WAL'), 'wal')
+                self.assertEqual(db.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+            finally:
+                db.close()
+
+
+class DumpImportTest(TestCase):
+
+    XML_DUMP = """<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/">
+  <siteinfo><sitename>Wikipedia</sitename></siteinfo>
+  <page>
+    <title>India</title><ns>0</ns><id>14533</id>
+    <revision><id>1150000000</id><contributor><id>7</id></contributor>
+      <text>{{Short description|Country in South Asia}}
+'''India''' ({{lang-hi|Bharat}}), officially the '''Republic of India''',&lt;ref&gt;Source&lt;/ref&gt; is a country in [[South Asia]]. It is the [[List of countries|seventh-largest country]] by area.
+[[File:Flag of India.svg|thumb|The [[flag]] of India]]
+== History ==
+Not a part of the lead.</text>
+    </revision>
+  </page>
+  <page><title>Bharat</title><ns>0</ns><id>1</id><redirect title="India" /><revision><id>2</id><text>#REDIRECT [[India]]</text></revision></page>
+  <page><title>Wikipedia:About</title><ns>4</ns><id>3</id><revision><id>4</id><text>About wikipedia.</text></revision></page>
+  <page><title>Nepal</title><ns>0</ns><id>5</id><revision><id>6</id><text>'''Nepal''' is a country in [[Asia]].</text></revision></page>
+</mediawiki>"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_dump(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with bz2.open(path, 'wt', encoding='utf-8') as dump:
+            dump.write(content)
+        return path
+
+    def fail_fetch(self, title, language):
+        raise AssertionError(f'{title} was fetched from wikipedia')
+
+    def test_lead_section(self):
+        text = lead_section("{{Infobox|name={{nested}}}}\n'''Nepal''' is in [[Asia|South Asia]].<ref name=a/> [[Category:Countries]]\n== History ==\nOld.")
+        self.assertEqual('Nepal is in South Asia.', text)
+
+    @fixture_tokenizer
+    def test_import_xml_dump(self):
+        out = StringIO()
+        call_command('import_wikipedia_dump', self.write_dump('enwiki-pages-articles.xml.bz2', self.XML_DUMP), workers=2, stdout=out)
+        self.assertIn('Imported 2 en articles', out.getvalue())
+        #Redirects and pages of other namespaces are skipped
+        self.assertEqual(['india', 'nepal'], sorted(LocalArticle.objects.values_list('title', flat=True)))
+        india = LocalArticle.objects.get(title='india', language='en')
+        self.assertEqual(1150000000, india.revision_id)
+        self.assertEqual('India, officially the Republic of India, is a country in South Asia. It is the seventh-largest country by area.', india.summary)
+        #Projects are ingested from the imported articles without wikipedia
+        cache = ArticleCache(fetcher=self.fail_fetch, revision_fetcher=self.fail_fetch)
+        self.assertEqual(['Nepal is a country in Asia.'], cache.get_sentences('Nepal'))
+        self.assertIsNone(ArticleCacheEntry.objects.get(title='nepal').revision_id)
+
+    def test_import_jsonl_dump(self):
+        lines = [{'index': {'_id': '1'}}, {'title': 'Delhi', 'namespace': 0, 'version': 10, 'opening_text': 'Delhi is a city.'},
+                 {'title': 'Talk:Delhi', 'namespace': 1, 'opening_text': 'Talk.'}, {'title': 'Agra', 'text': "'''Agra''' is a [[city]]."}]
+        path = self.write_dump('cirrus.jsonl.bz2', '\n'.join(json.dumps(line) for line in lines))
+        call_command('import_wikipedia_dump', path, language='hi', workers=1, stdout=StringIO())
+        self.assertEqual({'agra': 'Agra is a city.', 'delhi': 'Delhi is a city.'}, dict(LocalArticle.objects.values_list('title', 'summary')))
+        #Imported again, the articles are replaced
+        lines[1]['opening_text'] = 'Delhi is the capital.'
+        call_command('import_wikipedia_dump', self.write_dump('cirrus.jsonl.bz2', json.dumps(lines[1])), language='hi', stdout=StringIO())
+        self.assertEqual('Delhi is the capital.', LocalArticle.objects.get(title='delhi', language='hi').summary)
+        self.assertEqual(2, LocalArticle.objects.count())
+
+    async def test_async_cache_uses_imported_articles(self):
+        await LocalArticle.objects.acreate(title='india', language='te', summary='India is a country.', imported_on=timezone.now())
+        cache = ArticleCache(fetcher=self.fail_fetch)
+        entry = await cache.aget_entry('India', 'te')
+        self.assertEqual('India is a country.', entry.summary)
+
+
+class BenchmarkTest(TestCase):
+
+    def test_scenarios_cover_every_route(self):
+        from .urls import urlpatterns
+        self.assertEqual({str(pattern.pattern) for pattern in urlpatterns}, {route for route, _ in benchmark.SCENARIOS.values()})
+
+    @override_settings(INGESTION_BACKEND={'BACKEND': 'wiki_translation.ingestion.SyncBackend'})
+    def test_run_scenarios_and_compare(self):
+        benchmark.generate_data(projects=4, sentences=5, managers=1, annotators=2)
+        self.assertEqual(Sentence.objects.filter(project__article_title__startswith=benchmark.TITLE_PREFIX).count(), 20)
+        results = benchmark.run_scenarios(requests=1)
+        self.assertEqual({name: stats['errors'] for name, stats in results['scenarios'].items() if stats['errors']}, {})
+        self.assertFalse(Project.objects.filter(article_title__startswith=benchmark.RUN_TITLE_PREFIX).exists())
+        self.assertEqual(benchmark.compare(results, results), [])
+        baseline = json.loads(json.dumps(results))
+        baseline['scenarios']['sentence GET']['queries'] -= 1
+        self.assertEqual(len(benchmark.compare(results, baseline)), 1)
+
+
+class ExplainQueriesTest(TestCase):
+
+    def test_no_full_table_scans(self):
+        out = StringIO()
+        call_command('explain_queries', stdout=out)
+        self.assertIn('No full table scans', out.getvalue())
+        for name in ('translation memory postings', 'search_view sentences', 'search_view projects'):
+            self.assertIn(f'== {name}\n', out.getvalue())
 
 class ViewTest(APITestCase):
     
@@ -93,19 +335,68 @@ class ViewTest(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
-    def test_superuser_can_create_project(self):
+    @override_settings(INGESTION_BACKEND={'BACKEND': 'wiki_translation.ingestion.SyncBackend'})
+    @mock.patch('wiki_translation.utils.tokenizeSummary', return_value=['First sentence.', ' ', 'Second sentence.'])
+    @mock.patch('wiki_translation.utils.fetchSummary', return_value='First sentence. Second sentence.')
+    def test_superuser_can_create_project(self, fetch_summary, tokenize_summary):
         self.client.force_authenticate(user=self.superuser)
         url = reverse(project_view)
         data = {
             'article_title': 'India',
             'target_language': 'ta',
         }
-        response = self.client.post(url, data, format='json')
-        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
         self.assertEqual(Project.objects.count(), 2)
         self.assertEqual(response.data['article_title'], data['article_title'])
         self.assertEqual(response.data['target_language'], data['target_language'])
         self.assertEqual(response.data['created_by'], self.superuser.id)
+        self.assertEqual(response.data['status'], Project.Status.PENDING)
+        self.assertTrue(response.data['status_url'].endswith(reverse(project_status_view, args=['ta_india'])))
+        self.assertEqual(Project.objects.get(project_id='ta_india').status, Project.Status.READY)
+        self.assertEqual(Sentence.objects.filter(project__project_id='ta_india').count(), 2)
+        self.assertEqual(Project.objects.get(project_id='ta_india').sentence_count, 2)
+
+    @override_settings(INGESTION_BACKEND={'BACKEND': 'wiki_translation.ingestion.SyncBackend'})
+    @mock.patch('wiki_translation.utils.fetchSummary', side_effect=Exception('Wikipedia is not reachable'))
+    def test_project_ingestion_failure(self, fetch_summary):
+        self.client.force_authenticate(user=self.manager)
+        data = {
+            'article_title': 'India',
+            'target_language': 'ta',
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse(project_view), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        response = self.client.get(reverse(project_status_view, args=['ta_india']))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], Project.Status.FAILED)
+        self.assertEqual(response.data['error'], 'Wikipedia is not reachable')
+
+    #Requeued projects are ingested in the thread of the command, fetch threads would not see the rows of the test
+    @override_settings(INGESTION_FETCH_CONCURRENCY=1)
+    @mock.patch('wiki_translation.utils.tokenizeSummary', return_value=['First sentence.'])
+    @mock.patch('wiki_translation.utils.fetchSummary', return_value='First sentence.')
+    def test_recover_ingestion(self, fetch_summary, tokenize_summary):
+        #Projects whose jobs were lost with the thread pool, and one whose job is still running
+        for project_id, status_name, minutes in [('ta_india', 'PENDING', 60), ('hi_india', 'TOKENIZING', 60), ('ur_india', 'PENDING', 60), ('ta_nepal', 'FETCHING', 1)]:
+            project = Project.objects.create(article_title=project_id[3:].title(), target_language=project_id[:2], project_id=project_id, created_by=self.manager,
+                                             created_on=datetime.now(), status=getattr(Project.Status, status_name))
+            Project.objects.filter(pk=project.pk).update(updated_on=timezone.now() - timedelta(minutes=minutes))
+        output = StringIO()
+        call_command('recover_ingestion', stdout=output)
+        self.assertIn('Failed 3 stale projects', output.getvalue())
+        self.assertEqual(dict(Project.objects.exclude(pk=self.project.pk).values_list('project_id', 'status')),
+                         {'ta_india': 'failed', 'hi_india': 'failed', 'ur_india': 'failed', 'ta_nepal': 'fetching'})
+        self.assertIn('interrupted', Project.objects.get(project_id='ta_india').status_message)
+
+        Project.objects.filter(project_id='ta_india').update(status=Project.Status.PENDING, updated_on=timezone.now() - timedelta(minutes=60))
+        output = StringIO()
+        call_command('recover_ingestion', minutes=30, requeue=True, stdout=output)
+        self.assertIn('Ingested again 1 stale projects', output.getvalue())
+        self.assertEqual(Project.objects.get(project_id='ta_india').status, Project.Status.READY)
+        self.assertEqual(Sentence.objects.filter(project__project_id='ta_india').count(), 1)
 
     def test_get_project_success(self):
         url = reverse(single_project_view, args=[self.project.project_id])
@@ -191,4 +482,924 @@ class ViewTest(APITestCase):
         self.client.force_authenticate(user=self.annotator)
         url = reverse(sentences_view, args=[project.project_id])
         response = self.client.post(url, {'original_sentence': 'Test sentence', 'project': self.project.project_id})
-        self.assertEqual(response.status_code, 404)
\ No newline at end of file
+        self.assertEqual(response.status_code, 404)
+
+    def test_bulk_patch_sentences_annotator(self):
+        sentences = [Sentence.objects.create(project=self.project, original_sentence=f'Sentence {i}') for i in range(3)]
+        self.client.force_authenticate(user=self.annotator)
+        url = reverse(sentences_view, args=[self.project.project_id])
+        data = [{'sentence_id': sentence.sentence_id, 'translated_sentence': f'Translated {i}'} for i, sentence in enumerate(sentences)]
+        response = self.client.patch(url, data, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.data['updated']), [sentence.sentence_id for sentence in sentences])
+        self.assertEqual(response.data['failed'], [])
+        self.assertEqual(Sentence.objects.get(sentence_id=sentences[2].sentence_id).translated_sentence, 'Translated 2')
+
+    def test_bulk_patch_sentences_partial_failure(self):
+        sentence = Sentence.objects.create(project=self.project, original_sentence='Test sentence')
+        project = Project.objects.create(article_title='India', target_language='ta', project_id='ta_india', created_by=self.manager, created_on=datetime.now())
+        other_sentence = Sentence.objects.create(project=project, original_sentence='Other sentence')
+        self.client.force_authenticate(user=self.manager)
+        url = reverse(sentences_view, args=[self.project.project_id])
+        data = [
+            {'sentence_id': sentence.sentence_id, 'translated_sentence': 'Translated'},
+            {'sentence_id': other_sentence.sentence_id, 'translated_sentence': 'Translated'},
+            {'translated_sentence': 'Translated'},
+        ]
+        response = self.client.patch(url, data, format='json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['updated'], [sentence.sentence_id])
+        self.assertEqual(len(response.data['failed']), 2)
+        self.assertEqual(Sentence.objects.get(sentence_id=other_sentence.sentence_id).translated_sentence, None)
+
+    def test_bulk_patch_sentences_not_allowed(self):
+        project = Project.objects.create(article_title='India', target_language='ta', project_id='ta_india', created_by=self.manager, created_on=datetime.now())
+        self.client.force_authenticate(user=self.annotator)
+        url = reverse(sentences_view, args=[project.project_id])
+        response = self.client.patch(url, [], format='json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_role_is_cached_between_requests(self):
+        self.client.force_authenticate(user=self.manager)
+        url = reverse(project_view)
+        self.client.get(url)
+        self.manager = User.objects.get(pk=self.manager.pk)
+        self.client.force_authenticate(user=self.manager)
+        #Only the project list is queried, the role comes from the cache
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_X_CACHE_BYPASS='1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_role_cache_invalidated_on_group_change(self):
+        self.client.force_authenticate(user=self.annotator)
+        url = reverse(project_view)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        self.annotator.groups.remove(self.annotator_group)
+        self.annotator = User.objects.get(pk=self.annotator.pk)
+        self.client.force_authenticate(user=self.annotator)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        self.manager_group.user_set.add(self.annotator)
+        self.annotator = User.objects.get(pk=self.annotator.pk)
+        self.client.force_authenticate(user=self.annotator)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [])
+
+    def test_project_etag(self):
+        self.client.force_authenticate(user=self.manager)
+        url = reverse(single_project_view, args=['te_india'])
+        response = self.client.get(url)
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.patch(url, {'assigned_to': self.manager.id}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        #Stale ETag is rejected, and the project is not changed
+        response = self.client.patch(url, {'assigned_to': self.annotator.id}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(Project.objects.get(project_id='te_india').assigned_to, self.manager.id)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_project_list_etag_changes_with_status(self):
+        self.client.force_authenticate(user=self.annotator)
+        url = reverse(project_view)
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        ingestion.set_status(['te_india'], Project.Status.FAILED, 'Wikipedia is not reachable')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['status'], Project.Status.FAILED)
+
+    def test_project_list_cache(self):
+        self.client.force_authenticate(user=self.manager)
+        url = reverse(project_view)
+        project_list_cache.reset_stats()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        #Cached list needs no query once the role of the user is cached
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data, [self.project_serializer.data])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.client.get(url, HTTP_X_CACHE_BYPASS='1')['X-Cache'], 'BYPASS')
+        self.assertEqual(project_list_cache.stats(), {'hits': 2, 'misses': 1, 'bypasses': 1, 'hit_rate': 2 / 3})
+        self.assertIn('wiki_project_list_cache_hits_total 2', metrics.render_counters())
+        #Saved project changes the list
+        self.project.article_title = 'Bharat'
+        self.project.save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data[0]['article_title'], 'Bharat')
+        #So do the status updates, which do not send signals
+        ingestion.set_status(['te_india'], Project.Status.FAILED, 'Wikipedia is not reachable')
+        self.assertEqual(self.client.get(url).data[0]['status'], Project.Status.FAILED)
+
+    def test_project_list_cache_assignment(self):
+        other = User.objects.create_user(username='other', password='password')
+        other.groups.add(self.annotator_group)
+        url = reverse(project_view)
+        self.client.force_authenticate(user=self.annotator)
+        self.assertEqual(len(self.client.get(url).data), 1)
+        self.client.force_authenticate(user=other)
+        self.assertEqual(len(self.client.get(url).data), 0)
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.patch(reverse(single_project_view, args=['te_india']), {'assigned_to': other.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        #Lists of both the previous and the new annotator change
+        self.client.force_authenticate(user=self.annotator)
+        self.assertEqual(len(self.client.get(url).data), 0)
+        self.client.force_authenticate(user=other)
+        self.assertEqual(len(self.client.get(url).data), 1)
+        #Projects created in a batch are added to the lists
+        self.client.force_authenticate(user=self.manager)
+        self.assertEqual(len(self.client.get(url).data), 1)
+        with mock.patch('wiki_translation.views.start_batch_ingestion'):
+            response = self.client.post(reverse(project_batch_view), {'article_titles': ['Delhi'], 'target_languages': ['hi'], 'assigned_to': other.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(len(self.client.get(url).data), 2)
+        self.client.force_authenticate(user=other)
+        self.assertEqual(len(self.client.get(url).data), 2)
+        self.client.force_authenticate(user=self.superuser)
+        self.assertEqual(len(self.client.get(url).data), 2)
+
+    @override_settings(PROJECT_LIST_CACHE={'ENABLED': False})
+    def test_project_list_cache_disabled(self):
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.get(reverse(project_view))
+        self.assertEqual(response.data, [self.project_serializer.data])
+        self.assertNotIn('X-Cache', response)
+
+    def test_project_progress(self):
+        self.client.force_authenticate(user=self.manager)
+        list_url = reverse(project_view)
+        url = reverse(sentences_view, args=['te_india'])
+        self.client.get(list_url)
+        response = self.client.post(url, {'original_sentence': 'India is a country.', 'project': 'te_india'})
+        self.client.post(url, {'original_sentence': 'It is in Asia.', 'translated_sentence': 'Asia', 'project': 'te_india'})
+        #Cached project list is invalidated, the counters need no query over the sentences
+        data = self.client.get(list_url).data[0]
+        self.assertEqual((data['sentence_count'], data['translated_count']), (2, 1))
+        sentence_id = response.data['sentence_id']
+        self.client.force_authenticate(user=self.annotator)
+        self.client.patch(reverse(single_sentence_view, args=[sentence_id]), {'translated_sentence': 'Bharat'}, format='json')
+        self.assertEqual(Project.objects.values_list('sentence_count', 'translated_count').get(pk=self.project.pk), (2, 2))
+        #Cleared translations are counted out
+        self.client.patch(url, [{'sentence_id': sentence_id, 'translated_sentence': ''}], format='json')
+        project = Project.objects.get(pk=self.project.pk)
+        self.assertEqual((project.sentence_count, project.translated_count), (2, 1))
+        self.assertEqual(project.last_activity, Sentence.objects.get(sentence_id=sentence_id).updated_on)
+        self.assertEqual(self.client.get(list_url).data[0]['translated_count'], 1)
+        #Repair recomputes the counters changed outside of the API
+        Sentence.objects.filter(sentence_id=sentence_id).delete()
+        Project.objects.create(article_title='Nepal', target_language='te', project_id='te_nepal', created_by=self.manager, created_on=datetime.now())
+        output = StringIO()
+        call_command('repair_progress', batch_size=1, stdout=output)
+        self.assertIn('Repaired 1 of 2 projects', output.getvalue())
+        project = Project.objects.get(pk=self.project.pk)
+        self.assertEqual((project.sentence_count, project.translated_count), (1, 1))
+        self.assertEqual(self.client.get(list_url).data[0]['sentence_count'], 1)
+
+    def test_project_resolver(self):
+        Sentence.objects.bulk_create([Sentence(project=self.project, original_sentence=f'Sentence {i}.') for i in range(3)])
+        self.client.force_authenticate(user=self.annotator)
+        url = reverse(sentences_view, args=['te_india'])
+        project_resolver.clear()
+        self.client.get(url)
+        self.assertEqual(project_resolver.get('te_india'), self.project.pk)
+        #Project is read by its key, and the sentences are given with its project_id without reading the project again
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual([sentence['project'] for sentence in response.data], ['te_india'] * 3)
+        #Sentences are still created with the project_id
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.post(url, {'original_sentence': 'New sentence.', 'project': 'te_india'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Sentence.objects.get(sentence_id=response.data['sentence_id']).project_id, self.project.pk)
+        #Project created again with the same project_id has a new key
+        self.project.delete()
+        self.assertIsNone(project_resolver.get('te_india'))
+        project = Project.objects.create(article_title='India', target_language='te', project_id='te_india', created_by=self.manager, created_on=datetime.now())
+        self.assertNotEqual(project.pk, self.project.pk)
+        self.assertEqual(self.client.get(reverse(single_project_view, args=['te_india'])).data['id'], project.pk)
+        #Stale keys, like the ones of other processes, fall back to the project_id
+        project_resolver.remember('te_india', project.pk + 1)
+        self.assertEqual(self.client.get(reverse(single_project_view, args=['te_india'])).data['id'], project.pk)
+        self.assertEqual(project_resolver.get('te_india'), project.pk)
+        #Titles differing only in case are the same project
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Project.objects.create(article_title='INDIA', target_language='te', project_id='te_india2', created_by=self.manager, created_on=datetime.now())
+
+    def test_sentences_etag(self):
+        sentences = Sentence.objects.bulk_create([Sentence(project=self.project, original_sentence=f'Sentence {i}.') for i in range(3)])
+        add_progress(self.project.pk, sentences=3)
+        self.client.force_authenticate(user=self.annotator)
+        url = reverse(sentences_view, args=['te_india'])
+        etag = self.client.get(url)['ETag']
+        #Only the project is queried, the ETag comes from its counters
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        #Other query params give another body, with an ETag of its own
+        page_etag = self.client.get(url, {'limit': 2, 'fields': 'sentence_id'})['ETag']
+        self.assertNotEqual(page_etag, etag)
+        self.assertEqual(self.client.get(url, {'limit': 2}, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(url, {'fields': 'sentence_id', 'limit': 2}, HTTP_IF_NONE_MATCH=page_etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        #If-Match accepts the ETag of any GET of the list
+        response = self.client.patch(url, [{'sentence_id': sentences[2].sentence_id, 'translated_sentence': 'Translated'}], format='json', HTTP_IF_MATCH=page_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        response = self.client.patch(url, [{'sentence_id': sentences[0].sentence_id, 'translated_sentence': 'Translated'}], format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['ETag'], self.client.get(url)['ETag'])
+        response = self.client.patch(url, [{'sentence_id': sentences[1].sentence_id, 'translated_sentence': 'Translated'}], format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        #Deleted sentence changes the ETag as well
+        etag = self.client.get(url)['ETag']
+        Sentence.objects.filter(pk=sentences[2].pk).delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+        self.project.refresh_from_db()
+        self.assertEqual((self.project.sentence_count, self.project.translated_count), (2, 1))
+
+    def test_sentence_etag(self):
+        sentence = Sentence.objects.create(project=self.project, original_sentence='First sentence.')
+        self.client.force_authenticate(user=self.annotator)
+        url = reverse(single_sentence_view, args=[sentence.sentence_id])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.patch(url, {'translated_sentence': 'Translated'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.patch(url, {'translated_sentence': 'Other'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(Sentence.objects.get(pk=sentence.pk).translated_sentence, 'Translated')
+
+    def login(self, username):
+        response = self.client.post('/wiki/login/', {'username': username, 'password': 'password'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + response.data['access'])
+        return response.data
+
+    def test_login_token_has_role_claims(self):
+        tokens = self.login('manager')
+        access = AccessToken(tokens['access'])
+        self.assertEqual(access['role'], 'Manager')
+        self.assertEqual(access['username'], 'manager')
+        #Access tokens made by a refresh keep the claims
+        self.assertEqual(RefreshToken(tokens['refresh']).access_token['role'], 'Manager')
+
+    def test_token_authentication_without_user_query(self):
+        user_cache.clear()
+        self.login('manager')
+        url = reverse(project_view)
+        #Only the project list is queried, the user and the role come from the token
+        for _ in range(2):
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_X_CACHE_BYPASS='1')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data, [self.project_serializer.data])
+
+    def test_token_role_change_checked_against_db(self):
+        self.login('annotator')
+        url = reverse(project_view)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        self.annotator.groups.remove(self.annotator_group)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        self.annotator.is_active = False
+        self.annotator.save()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cached_user_is_not_shared_by_requests(self):
+        user_cache.clear()
+        tokens = self.login('manager')
+        authentication = StatelessJWTAuthentication()
+        validated = authentication.get_validated_token(tokens['access'])
+        first = authentication.get_user(validated)
+        first._wiki_role = 'Annotator'
+        second = authentication.get_user(validated)
+        self.assertIsNot(first, second)
+        self.assertEqual((second.pk, second.username, second.is_active, get_role(second)), (self.manager.pk, 'manager', True, 'Manager'))
+        #Deactivation revokes the claims of the token and the cached user in every process sharing the cache
+        self.manager.is_active = False
+        self.manager.save()
+        with self.assertRaises(AuthenticationFailed):
+            authentication.get_user(validated)
+
+    @override_settings(WIKI_AUTH={'USER_CACHE_TTL': 0})
+    def test_token_claims_expire(self):
+        user_cache.clear()
+        self.login('manager')
+        url = reverse(project_view)
+        #User is loaded once, then the checked user is used till the TTL passes
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(WIKI_SINGLE_PROCESS=False)
+    def test_per_process_cache_is_not_used(self):
+        #User, role and lists are read from the DB, see is_shared
+        user_cache.clear()
+        self.login('manager')
+        url = reverse(project_view)
+        for _ in range(2):
+            #User, role and project list
+            with self.assertNumQueries(3):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('X-Cache', response)
+        response = self.client.get(reverse(getUsers))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('Last-Modified', response)
+        self.assertEqual(self.client.get(reverse(getUsers), HTTP_IF_NONE_MATCH=response['ETag']).status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def async_get(self, user, url, **params):
+        token = await sync_to_async(token_for_user)(user)
+        return await self.async_client.get(url, params, AUTHORIZATION=f'Bearer {token.access_token}')
+
+    async def test_async_views_match_sync_views(self):
+        sentence = await Sentence.objects.acreate(project=self.project, original_sentence='First sentence.')
+        response = await self.async_get(self.manager, reverse(async_project_view))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), [self.project_serializer.data])
+        response = await self.async_get(self.manager, reverse(async_single_project_view, args=['te_india']))
+        self.assertEqual(response.json(), self.project_serializer.data)
+        response = await self.async_get(self.annotator, reverse(async_project_status_view, args=['te_india']))
+        self.assertEqual(response.json(), {'project_id': 'te_india', 'status': Project.Status.READY, 'error': ''})
+        response = await self.async_get(self.annotator, reverse(async_sentences_view, args=['te_india']), fields='sentence_id,original_sentence')
+        self.assertEqual(response.json(), [{'sentence_id': sentence.sentence_id, 'original_sentence': 'First sentence.'}])
+        response = await self.async_get(self.annotator, reverse(async_sentences_view, args=['te_india']), limit=1)
+        self.assertEqual([item['sentence_id'] for item in response.json()['results']], [sentence.sentence_id])
+        response = await self.async_get(self.annotator, reverse(async_single_sentence_view, args=[sentence.sentence_id]))
+        self.assertEqual(response.json()['original_sentence'], 'First sentence.')
+
+    async def test_async_views_permissions(self):
+        response = await self.async_client.get(reverse(async_project_view))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        regular_user = await sync_to_async(User.objects.create_user)(username='regular', password='password')
+        response = await self.async_get(regular_user, reverse(async_project_view))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = await self.async_get(self.superuser, reverse(async_single_project_view, args=['te_nepal']))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @mock.patch('wiki_translation.utils.tokenizeSummary', return_value=['First sentence.', 'Second sentence.'])
+    @mock.patch('wiki_translation.utils.afetchSummary', new_callable=mock.AsyncMock, return_value='First sentence. Second sentence.')
+    async def test_async_create_project(self, fetch_summary, tokenize_summary):
+        token = await sync_to_async(token_for_user)(self.manager)
+        response = await self.async_client.post(reverse(async_project_view), {'article_title': 'Nepal', 'target_language': 'hi'},
+                                                content_type='application/json', AUTHORIZATION=f'Bearer {token.access_token}')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.json()['created_by'], self.manager.id)
+        self.assertTrue(response['Location'].endswith(reverse(async_project_status_view, args=['hi_nepal'])))
+        #Ingestion runs on the event loop after the response
+        await asyncio.gather(*ingestion.running_jobs)
+        fetch_summary.assert_awaited_once_with('Nepal', 'en')
+        self.assertEqual((await Project.objects.aget(project_id='hi_nepal')).status, Project.Status.READY)
+        self.assertEqual(await Sentence.objects.filter(project__project_id='hi_nepal').acount(), 2)
+
+    async def open_event_stream(self, user, project_id, messages, disconnect, ticket=None):
+        #Calls the ASGI app like a server, the messages it sends are collected. Without a ticket, the access token is sent in the header
+        token = await sync_to_async(token_for_user)(user)
+        headers = [] if ticket else [(b'authorization', f'Bearer {token.access_token}'.encode())]
+        scope = {'type': 'http', 'method': 'GET', 'path': f'/wiki/{project_id}/sentence/events', 'root_path': '', 'headers': headers,
+                 'query_string': f'ticket={ticket}'.encode() if ticket else b''}
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+        async def send(message):
+            messages.append(message)
+        stream = asyncio.ensure_future(SentenceEvents(asgi_application)(scope, receive, send))
+        while (not messages and not stream.done()):
+            await asyncio.sleep(0.01)
+        return stream
+
+    async def next_event(self, messages, count):
+        for i in range(100):
+            if (len(messages) > count):
+                return messages[count]['body'].decode()
+            await asyncio.sleep(0.01)
+        self.fail('No event was sent')
+
+    def patch_sentences(self, user, project_id, data):
+        self.client.force_authenticate(user=user)
+        #Deltas are published once the save is committed
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.patch(reverse(sentences_view, args=[project_id]), data, format='json')
+
+    async def test_sentence_event_stream(self):
+        sentence = await Sentence.objects.acreate(project=self.project, original_sentence='First sentence.')
+        messages = []
+        disconnect = asyncio.Event()
+        stream = await self.open_event_stream(self.annotator, 'te_india', messages, disconnect)
+        self.assertEqual(messages[0]['status'], status.HTTP_200_OK)
+        self.assertIn((b'Content-Type', b'text/event-stream; charset=utf-8'), messages[0]['headers'])
+        self.assertEqual(await self.next_event(messages, 1), 'retry: 3000\n\n')
+        self.assertEqual(changes.get_pubsub().count(self.project.pk), 1)
+
+        response = await sync_to_async(self.patch_sentences)(self.manager, 'te_india', [{'sentence_id': sentence.sentence_id, 'translated_sentence': 'మొదటి వాక్యం.'}])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        event = await self.next_event(messages, 2)
+        self.assertTrue(event.startswith('event: sentences\ndata: '))
+        sentence = await Sentence.objects.aget(sentence_id=sentence.sentence_id)
+        self.assertEqual(json.loads(event.split('data: ')[1]), [{'sentence_id': sentence.sentence_id, 'translated_sentence': 'మొదటి వాక్యం.', 'version': sentence_etag(sentence)}])
+
+        #Client is unsubscribed when it goes away
+        disconnect.set()
+        await stream
+        self.assertEqual(changes.get_pubsub().count(self.project.pk), 0)
+
+    async def test_sentence_event_stream_permissions(self):
+        regular_user = await sync_to_async(User.objects.create_user)(username='regular', password='password')
+        for user, project_id, status_code in [(regular_user, 'te_india', status.HTTP_403_FORBIDDEN), (self.annotator, 'te_nepal', status.HTTP_404_NOT_FOUND)]:
+            messages = []
+            stream = await self.open_event_stream(user, project_id, messages, asyncio.Event())
+            await stream
+            self.assertEqual(messages[0]['status'], status_code)
+
+    async def test_sentence_event_stream_ticket(self):
+        token = await sync_to_async(token_for_user)(self.annotator)
+        response = await self.async_client.post(f'/wiki/te_india/sentence/events/ticket', AUTHORIZATION=f'Bearer {token.access_token}')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        ticket = response.json()['ticket']
+        self.assertNotIn(str(token.access_token), ticket)
+        response = await self.async_client.post(f'/wiki/te_nepal/sentence/events/ticket', AUTHORIZATION=f'Bearer {token.access_token}')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        messages = []
+        disconnect = asyncio.Event()
+        stream = await self.open_event_stream(self.annotator, 'te_india', messages, disconnect, ticket=ticket)
+        self.assertEqual(messages[0]['status'], status.HTTP_200_OK)
+        disconnect.set()
+        await stream
+        #Tickets are for one project, and expire
+        for project_id, ticket_seconds in [('te_nepal', 30), ('te_india', -1)]:
+            messages = []
+            with override_settings(CHANGE_FEED={**settings.CHANGE_FEED, 'TICKET_SECONDS': ticket_seconds}):
+                await (await self.open_event_stream(self.annotator, project_id, messages, asyncio.Event(), ticket=ticket))
+            self.assertEqual(messages[0]['status'], status.HTTP_401_UNAUTHORIZED if ticket_seconds < 0 else status.HTTP_404_NOT_FOUND)
+        #Access tokens are not accepted in the url
+        messages = []
+        scope_token = f'token={token.access_token}'
+        await (await self.open_event_stream(self.annotator, 'te_india', messages, asyncio.Event(), ticket='x&' + scope_token))
+        self.assertEqual(messages[0]['status'], status.HTTP_401_UNAUTHORIZED)
+
+    async def test_change_feed_slow_client(self):
+        pubsub = changes.InProcessPubSub(queue_size=2)
+        subscription = pubsub.subscribe(1)
+        #Saves publish from the threads of the sync views
+        await sync_to_async(lambda: [pubsub.publish(1, 'removed', [sentence_id]) for sentence_id in range(3)], thread_sensitive=False)()
+        await asyncio.sleep(0.01)
+        #Third event did not fit, the queued ones are dropped and the client is told to reload
+        self.assertEqual(await subscription.get(), (changes.RESET, {}))
+        pubsub.publish(1, 'removed', [3])
+        self.assertEqual(await subscription.get(), ('removed', [3]))
+        pubsub.unsubscribe(subscription)
+        self.assertEqual(pubsub.count(1), 0)
+
+    def test_get_users_single_query(self):
+        for i in range(5):
+            user = User.objects.create_user(username=f'annotator{i}', password='password')
+            user.groups.add(self.annotator_group)
+        self.client.force_authenticate(user=self.manager)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse(getUsers))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['current_user'], self.manager.id)
+        self.assertEqual(response.data['users'][self.superuser.id], {'name': 'admin', 'isAdminOrManager': 1})
+        self.assertEqual(response.data['users'][self.manager.id], {'name': 'manager', 'isAdminOrManager': 1})
+        self.assertEqual(response.data['users'][self.annotator.id], {'name': 'annotator', 'isAdminOrManager': 0})
+        #Second call is served from the cache
+        with self.assertNumQueries(0):
+            self.client.get(reverse(getUsers))
+
+    def test_get_users_filter_and_page(self):
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.get(reverse(getUsers), {'role': 'manager', 'page': 2, 'page_size': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(response.data['users'], {self.manager.id: {'name': 'manager', 'isAdminOrManager': 1}})
+        response = self.client.get(reverse(getUsers), {'role': 'admin'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        for params in ({'page': 1, 'page_size': -5}, {'page': 1, 'page_size': 0}, {'page': -1}):
+            self.assertEqual(self.client.get(reverse(getUsers), params).status_code, status.HTTP_400_BAD_REQUEST)
+        #Page size is capped
+        with mock.patch('wiki_translation.views.MAX_USERS_PAGE_SIZE', 1):
+            response = self.client.get(reverse(getUsers), {'page': 1, 'page_size': 100})
+        self.assertEqual(len(response.data['users']), 1)
+
+    def test_get_users_not_modified(self):
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.get(reverse(getUsers))
+        etag = response['ETag']
+        response = self.client.get(reverse(getUsers), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.annotator.groups.add(self.manager_group)
+        response = self.client.get(reverse(getUsers), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['users'][self.annotator.id]['isAdminOrManager'], 1)
+
+    def test_get_sentences_cursor_pagination(self):
+        sentences = [Sentence.objects.create(project=self.project, original_sentence=f'Sentence {i}') for i in range(5)]
+        self.client.force_authenticate(user=self.annotator)
+        url = reverse(sentences_view, args=[self.project.project_id])
+        response = self.client.get(url, {'limit': 2, 'fields': 'sentence_id,translated_sentence'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [{'sentence_id': sentence.sentence_id, 'translated_sentence': None} for sentence in sentences[:2]])
+        seen = [sentence['sentence_id'] for sentence in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen += [sentence['sentence_id'] for sentence in response.data['results']]
+        self.assertEqual(seen, [sentence.sentence_id for sentence in sentences])
+
+    def test_get_sentences_changed_since(self):
+        old = Sentence.objects.create(project=self.project, original_sentence='Old sentence')
+        changed = Sentence.objects.create(project=self.project, original_sentence='Changed sentence')
+        Sentence.objects.filter(sentence_id=old.sentence_id).update(updated_on=timezone.now() - timedelta(hours=1))
+        self.client.force_authenticate(user=self.manager)
+        url = reverse(sentences_view, args=[self.project.project_id])
+        changed_since = (timezone.now() - timedelta(minutes=1)).isoformat()
+        response = self.client.get(url, {'changed_since': changed_since})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([sentence['sentence_id'] for sentence in response.data], [changed.sentence_id])
+        response = self.client.get(url, {'fields': 'sentence_id,password'})
+        self.assertEqual(response.status_code, 400)
+        for value in ('yesterday', '2020-13-45T00:00'):
+            response = self.client.get(url, {'changed_since': value})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data, {'error': 'changed_since should be an ISO 8601 date time'})
+
+    def export(self, **params):
+        response = self.client.get(reverse(export_view), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_translations(self):
+        Sentence.objects.create(project=self.project, original_sentence='India is a country.', translated_sentence='Translated\tone')
+        Sentence.objects.create(project=self.project, original_sentence='Not translated.', translated_sentence='')
+        project = Project.objects.create(article_title='India', target_language='ta', project_id='ta_india', created_by=self.superuser, created_on=datetime.now())
+        Sentence.objects.create(project=project, original_sentence='Other project.', translated_sentence='Other')
+        self.client.force_authenticate(user=self.manager)
+        self.assertEqual(self.export(type='tsv').splitlines(), [
+            'project_id\ttarget_language\toriginal_sentence\ttranslated_sentence',
+            'te_india\tte\tIndia is a country.\tTranslated\\tone',
+        ])
+        self.assertEqual(json.loads(self.export(type='jsonl')), {
+            'project_id': 'te_india', 'target_language': 'te', 'original_sentence': 'India is a country.', 'translated_sentence': 'Translated\tone'
+        })
+        tmx = self.export(type='tmx', include_untranslated='1')
+        self.assertIn('<tuv xml:lang="te"><seg>Translated\tone</seg></tuv>', tmx)
+        self.assertIn('<seg>Not translated.</seg>', tmx)
+        self.assertNotIn('Other project.', tmx)
+
+    def test_export_by_language(self):
+        project = Project.objects.create(article_title='India', target_language='ta', project_id='ta_india', created_by=self.superuser, created_on=datetime.now())
+        Sentence.objects.create(project=self.project, original_sentence='Telugu one.', translated_sentence='te')
+        Sentence.objects.create(project=project, original_sentence='Tamil one.', translated_sentence='ta')
+        self.client.force_authenticate(user=self.superuser)
+        self.assertEqual(len(self.export(type='jsonl').splitlines()), 2)
+        self.assertEqual([json.loads(line)['project_id'] for line in self.export(type='jsonl', language='ta').splitlines()], ['ta_india'])
+        self.assertEqual(len(self.export(type='jsonl', project='ta_india,te_india').splitlines()), 2)
+        response = self.client.get(reverse(export_view), {'type': 'csv'})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(INGESTION_BACKEND={'BACKEND': 'wiki_translation.ingestion.SyncBackend'}, INGESTION_FETCH_CONCURRENCY=1)
+    @mock.patch('wiki_translation.utils.tokenizeSummary', return_value=['First sentence.', 'Second sentence.'])
+    @mock.patch('wiki_translation.utils.fetchSummary', return_value='First sentence. Second sentence.')
+    def test_batch_create_projects(self, fetch_summary, tokenize_summary):
+        self.client.force_authenticate(user=self.manager)
+        data = {'article_titles': ['India', 'Nepal', 'india'], 'target_languages': ['te', 'ta', 'hi']}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse(project_batch_view), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        results = {result['project_id']: result['status'] for result in response.data['results']}
+        self.assertEqual(len(results), 6)
+        self.assertEqual(results['te_india'], 'exists')
+        self.assertEqual(results['ta_nepal'], Project.Status.PENDING)
+        #Each title is fetched once for all the languages
+        self.assertEqual(fetch_summary.call_count, 2)
+        self.assertEqual(Project.objects.filter(status=Project.Status.READY, created_by=self.manager).exclude(project_id='te_india').count(), 5)
+        self.assertEqual(Sentence.objects.filter(project__project_id='hi_nepal').count(), 2)
+        self.assertEqual(Sentence.objects.filter(project__project_id='te_india').count(), 0)
+
+    def test_batch_create_projects_validation(self):
+        self.client.force_authenticate(user=self.annotator)
+        data = {'article_titles': ['India'], 'target_languages': ['te']}
+        response = self.client.post(reverse(project_batch_view), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(user=self.manager)
+        data = {'article_titles': ['India'], 'target_languages': ['en']}
+        response = self.client.post(reverse(project_batch_view), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_translation_memory_suggestions(self):
+        project = Project.objects.create(article_title='Nepal', target_language='te', project_id='te_nepal', created_by=self.manager, created_on=datetime.now(), assigned_to=self.annotator.id)
+        Sentence.objects.create(project=self.project, original_sentence='India is a country in South Asia.', translated_sentence='India translated')
+        Sentence.objects.create(project=self.project, original_sentence='It has many rivers.', translated_sentence='Rivers translated')
+        sentence = Sentence.objects.create(project=project, original_sentence='Nepal is a country in South Asia.')
+        self.client.force_authenticate(user=self.annotator)
+        url = reverse(sentence_suggestions_view, args=[project.project_id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        matches = response.data[sentence.sentence_id]
+        self.assertEqual([match['translated_sentence'] for match in matches], ['India translated'])
+        self.assertGreater(matches[0]['similarity'], 0.7)
+
+        #Index is updated when a sentence is translated
+        new = Sentence.objects.create(project=self.project, original_sentence='Nepal is a country in South Asia!')
+        self.client.patch(reverse(sentences_view, args=[self.project.project_id]), [{'sentence_id': new.sentence_id, 'translated_sentence': 'Nepal translated'}], format='json')
+        response = self.client.get(url, {'ids': sentence.sentence_id, 'k': 1})
+        self.assertEqual([match['translated_sentence'] for match in response.data[sentence.sentence_id]], ['Nepal translated'])
+
+        self.assertEqual(self.client.get(url, {'limit': -1}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {'k': 0}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    @mock.patch('wiki_translation.memory.MAX_POSTINGS_PER_KEY', 2)
+    def test_translation_memory_caps_common_keys(self):
+        text = 'Bhutan is a country in South Asia.'
+        Sentence.objects.bulk_create([Sentence(project=self.project, original_sentence=text, translated_sentence=f'Bhutan {i}') for i in range(5)])
+        translation_memory.add(Sentence.objects.filter(original_sentence=text))
+        keys = list(MemorySignature.objects.values_list('band_key', flat=True).distinct())
+        postings = translation_memory.read_postings(keys, 'te')
+        self.assertEqual(sorted(postings), sorted(keys))
+        self.assertTrue(all(len(sentence_ids) == 2 for sentence_ids in postings.values()))
+        #Segments past the cap of every key are never read
+        self.assertEqual(len(translation_memory.search(text, 'te', k=5)), 2)
+
+    def test_translation_memory_consistency(self):
+        hindi = Project.objects.create(article_title='Nepal', target_language='hi', project_id='hi_nepal', created_by=self.manager, created_on=datetime.now())
+        sentence = Sentence.objects.create(project=self.project, original_sentence='India is a country in South Asia.', translated_sentence='India translated')
+        other = Sentence.objects.create(project=hindi, original_sentence='Nepal is a country in South Asia!', translated_sentence='Nepal translated')
+        text = 'Nepal is a country in South Asia.'
+        #Segments of the other target languages are never returned
+        self.assertEqual([match['sentence_id'] for match in translation_memory.search(text, 'te')], [sentence.sentence_id])
+        self.assertEqual([match['sentence_id'] for match in translation_memory.search(text, 'hi')], [other.sentence_id])
+        other.delete()
+
+        #Keys are written in the transaction of the save, a rolled back save leaves none
+        with self.assertRaises(ValueError), transaction.atomic():
+            Sentence.objects.create(project=self.project, original_sentence='Nepal is a country in South Asia!', translated_sentence='Rolled back')
+            raise ValueError()
+        self.assertEqual(len(translation_memory.search(text, 'te')), 1)
+
+        #Moved sentence is found in the language of its new project only
+        self.client.force_authenticate(user=self.superuser)
+        self.client.patch(reverse(single_sentence_view, args=[sentence.sentence_id]), {'project': 'hi_nepal'}, format='json')
+        self.assertEqual(translation_memory.search(text, 'te'), [])
+        self.assertEqual([match['sentence_id'] for match in translation_memory.search(text, 'hi')], [sentence.sentence_id])
+
+        #Keys follow a changed original sentence, and can be rebuilt from the sentences
+        self.client.patch(reverse(single_sentence_view, args=[sentence.sentence_id]), {'original_sentence': 'Rivers flow to the sea.'}, format='json')
+        self.assertEqual(translation_memory.search(text, 'hi'), [])
+        self.assertEqual(len(translation_memory.search('Rivers flow into the sea.', 'hi')), 1)
+        MemorySignature.objects.all().delete()
+        out = StringIO()
+        call_command('build_translation_memory', stdout=out)
+        self.assertIn('Indexed 1 sentences', out.getvalue())
+        self.assertEqual(len(translation_memory.search('Rivers flow into the sea.', 'hi')), 1)
+
+    @override_settings(INGESTION_BACKEND={'BACKEND': 'wiki_translation.ingestion.SyncBackend'})
+    @mock.patch('wiki_translation.utils.tokenizeSummary', return_value=['India is a country.', 'It is in  South Asia.', 'New sentence.'])
+    @mock.patch('wiki_translation.utils.fetchSummary', return_value='')
+    def test_ingestion_prefills_known_translations(self, fetch_summary, tokenize_summary):
+        first = Sentence.objects.create(project=self.project, original_sentence='India is a country.')
+        second = Sentence.objects.create(project=self.project, original_sentence='It is in South Asia.')
+        self.client.force_authenticate(user=self.annotator)
+        self.client.patch(reverse(sentences_view, args=[self.project.project_id]), [{'sentence_id': first.sentence_id, 'translated_sentence': 'First translated'}], format='json')
+        self.client.patch(reverse(single_sentence_view, args=[second.sentence_id]), {'translated_sentence': 'Second translated'}, format='json')
+        self.assertEqual(SegmentTranslation.objects.filter(target_language='te').count(), 2)
+
+        self.client.force_authenticate(user=self.manager)
+        #Callbacks are run when the inner block exits, while publish is still patched
+        with mock.patch.object(changes.InProcessPubSub, 'publish') as publish, self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse(project_view), {'article_title': 'Asia', 'target_language': 'te'}, format='json')
+            self.client.post(reverse(project_view), {'article_title': 'Asia', 'target_language': 'ta'}, format='json')
+        #Clients of the projects get the added sentences once they are committed
+        self.assertEqual([call.args for call in publish.call_args_list],
+                         [(project.pk, changes.RESET, {}) for project in Project.objects.filter(project_id__in=['te_asia', 'ta_asia']).order_by('id')])
+        sentences = Sentence.objects.filter(project__project_id='te_asia').order_by('sentence_id')
+        self.assertEqual([(sentence.translated_sentence, sentence.prefilled) for sentence in sentences],
+                         [('First translated', True), ('Second translated', True), ('', False)])
+        self.assertFalse(Sentence.objects.filter(project__project_id='ta_asia', prefilled=True).exists())
+        #Prefilled sentences added by bulk_create are in the translation memory as well
+        self.assertIn(sentences[0].sentence_id, [match['sentence_id'] for match in translation_memory.search('India is a country.', 'te', k=5)])
+
+        #Prefilled translation stays out of the store till the annotator changes it
+        self.client.force_authenticate(user=self.superuser)
+        response = self.client.patch(reverse(single_sentence_view, args=[sentences[0].sentence_id]), {'translated_sentence': 'Better translation'}, format='json')
+        self.assertFalse(response.data['prefilled'])
+        self.assertEqual(SegmentTranslation.objects.get(sentence=sentences[0]).translated_sentence, 'Better translation')
+
+    def test_segment_store_withdraws_translations(self):
+        first = Sentence.objects.create(project=self.project, original_sentence='India is a country.', translated_sentence='First translated')
+        second = Sentence.objects.create(project=self.project, original_sentence='It is in South Asia.', translated_sentence='Second translated')
+        self.assertEqual(SegmentTranslation.objects.count(), 2)
+        #Saves which leave the translation as it is do not load the project
+        second = Sentence.objects.get(pk=second.pk)
+        with self.assertNumQueries(1):
+            second.save()
+        #Cleared and blanked translations are withdrawn
+        self.client.force_authenticate(user=self.annotator)
+        self.client.patch(reverse(sentences_view, args=[self.project.project_id]), [{'sentence_id': first.sentence_id, 'translated_sentence': ' '}], format='json')
+        self.assertFalse(SegmentTranslation.objects.filter(sentence=first).exists())
+        #Deleted sentences take their translation with them
+        second.delete()
+        self.assertEqual(SegmentTranslation.objects.count(), 0)
+
+    def search(self, **params):
+        return self.client.get(reverse(search_view), params)
+
+    def test_search_sentences(self):
+        Sentence.objects.create(project=self.project, original_sentence='India is a <big> country.', translated_sentence='భారతదేశం ఒక దేశం')
+        Sentence.objects.create(project=self.project, original_sentence='Nepal is a country.')
+        self.client.force_authenticate(user=self.annotator)
+        response = self.search(q='india COUNTRY')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['original_sentence'], '<mark>India</mark> is a &lt;big&gt; <mark>country</mark>.')
+        #Words of Indic scripts are not split at the vowel signs
+        response = self.search(q='భారతదేశం')
+        self.assertEqual(response.data['results'][0]['translated_sentence'], '<mark>భారతదేశం</mark> ఒక దేశం')
+        #Search syntax in the query is matched as plain text
+        self.assertEqual(self.search(q='country" OR "x').data['count'], 0)
+
+    def test_search_index_follows_updates(self):
+        sentence = Sentence.objects.create(project=self.project, original_sentence='India is a country.')
+        self.client.force_authenticate(user=self.annotator)
+        self.client.patch(reverse(sentences_view, args=[self.project.project_id]), [{'sentence_id': sentence.sentence_id, 'translated_sentence': 'Bharat'}], format='json')
+        self.assertEqual(self.search(q='bharat').data['count'], 1)
+        Sentence.objects.filter(sentence_id=sentence.sentence_id).update(translated_sentence='Hindustan')
+        self.assertEqual(self.search(q='bharat').data['count'], 0)
+        self.assertEqual(self.search(q='hindustan').data['count'], 1)
+        sentence.delete()
+        self.assertEqual(self.search(q='india').data['count'], 0)
+
+    def test_search_scoped_by_role(self):
+        project = Project.objects.create(article_title='India', target_language='ta', project_id='ta_india', created_by=self.superuser, created_on=datetime.now())
+        Sentence.objects.create(project=self.project, original_sentence='India one.')
+        Sentence.objects.create(project=project, original_sentence='India two.')
+        self.client.force_authenticate(user=self.manager)
+        self.assertEqual(self.search(q='india').data['count'], 1)
+        self.assertEqual([result['project_id'] for result in self.search(q='india', **{'in': 'projects'}).data['results']], ['te_india'])
+        self.client.force_authenticate(user=self.superuser)
+        response = self.search(q='india', page_size=1, page=2)
+        self.assertEqual((response.data['count'], len(response.data['results'])), (2, 1))
+        self.assertEqual(self.search(q='india', language='ta').data['results'][0]['project_id'], 'ta_india')
+        self.assertEqual(self.search(q='india', **{'in': 'projects'}).data['results'][0]['article_title'], '<mark>India</mark>')
+        self.assertEqual(self.search().status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.search(q='india', page=0).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def transliterate(self, prefix, lang='te', **params):
+        return self.client.get(reverse(transliteration_view), dict(params, prefix=prefix, lang=lang))
+
+    def test_transliteration_suggestions(self):
+        transliterator.clear()
+        self.addCleanup(transliterator.clear)
+        first = Sentence.objects.create(project=self.project, original_sentence='India is a country.', translated_sentence='భారతదేశం ఒక దేశం')
+        Sentence.objects.create(project=self.project, original_sentence='India is big.', translated_sentence='భారతదేశం పెద్దది')
+        second = Sentence.objects.create(project=self.project, original_sentence='Bharati is a name.', translated_sentence='భారతి')
+        self.client.force_authenticate(user=self.annotator)
+        response = self.transliterate('bha')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        #Most used words first. Without a word matching the whole prefix, the rule based transliteration comes last
+        self.assertEqual(response.data['candidates'], [{'text': 'భారతదేశం', 'count': 2}, {'text': 'భారతి', 'count': 1}, {'text': 'భ', 'count': 0}])
+        #Word matching the whole prefix comes first, whatever the spelling
+        self.assertEqual(self.transliterate('BHAARATHI', k=1).data['candidates'], [{'text': 'భారతి', 'count': 1}])
+        self.assertEqual(self.transliterate('ramu').data['candidates'], [{'text': 'రము', 'count': 0}])
+
+        #Saved translations update the index, the replaced words are counted out
+        self.client.patch(reverse(sentences_view, args=[self.project.project_id]), [{'sentence_id': second.sentence_id, 'translated_sentence': 'రాము'}], format='json')
+        self.assertEqual(self.transliterate('ramu').data['candidates'], [{'text': 'రాము', 'count': 1}])
+        self.assertEqual([candidate['text'] for candidate in self.transliterate('bha').data['candidates']], ['భారతదేశం', 'భ'])
+        self.client.patch(reverse(single_sentence_view, args=[first.sentence_id]), {'translated_sentence': 'భారత్ ఒక దేశం'}, format='json')
+        self.assertEqual(self.transliterate('bharat').data['candidates'][0], {'text': 'భారత్', 'count': 1})
+
+        self.assertEqual(self.transliterate('bha', lang='en').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.transliterate('రా').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.transliterate('bha', k=0).status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(INGESTION_BACKEND={'BACKEND': 'wiki_translation.ingestion.SyncBackend'})
+    @mock.patch('wiki_translation.utils.tokenizeSummary', return_value=['Ramu is a name.'])
+    @mock.patch('wiki_translation.utils.fetchSummary', return_value='')
+    def test_transliteration_prefilled_translations(self, fetch_summary, tokenize_summary):
+        transliterator.clear()
+        self.addCleanup(transliterator.clear)
+        Sentence.objects.create(project=self.project, original_sentence='Ramu is a name.', translated_sentence='రాము')
+        self.client.force_authenticate(user=self.annotator)
+        self.assertEqual(self.transliterate('ramu').data['candidates'], [{'text': 'రాము', 'count': 1}])
+        #Translations prefilled by the ingestion are counted in, without a rebuild
+        self.client.force_authenticate(user=self.manager)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse(project_view), {'article_title': 'Names', 'target_language': 'te'}, format='json')
+        self.assertTrue(Sentence.objects.get(project__project_id='te_names').prefilled)
+        self.assertEqual(self.transliterate('ramu').data['candidates'], [{'text': 'రాము', 'count': 2}])
+
+    def test_transliteration_index_refresh(self):
+        transliterator.clear()
+        self.addCleanup(transliterator.clear)
+        sentence = Sentence.objects.create(project=self.project, original_sentence='Ramu is a name.', translated_sentence='రాము')
+        record_progress(self.project, sentences=1, translated=1, activity=sentence.updated_on)
+        hindi = Project.objects.create(article_title='Nepal', target_language='hi', project_id='hi_nepal', created_by=self.manager, created_on=datetime.now())
+        self.client.force_authenticate(user=self.manager)
+        self.assertEqual(self.transliterate('ramu').data['candidates'], [{'text': 'రాము', 'count': 1}])
+        self.assertEqual(self.transliterate('ramu', lang='hi').data['candidates'], [{'text': 'रमु', 'count': 0}])
+
+        #Moved sentence is counted out of the language of its previous project
+        self.client.patch(reverse(single_sentence_view, args=[sentence.sentence_id]), {'project': 'hi_nepal', 'translated_sentence': 'रामू'}, format='json')
+        self.assertEqual(self.transliterate('ramu').data['candidates'], [{'text': 'రము', 'count': 0}])
+        self.assertEqual(self.transliterate('ramu', lang='hi').data['candidates'], [{'text': 'रामू', 'count': 1}])
+
+        #Translation saved by another process is read when the index is refreshed
+        other = Sentence.objects.create(project=hindi, original_sentence='Ramu is a name.', translated_sentence='रामू')
+        record_progress(hindi, sentences=1, translated=1, activity=other.updated_on)
+        self.assertEqual(self.transliterate('ramu', lang='hi').data['candidates'], [{'text': 'रामू', 'count': 1}])
+        build_lock = transliterator.build_locks['hi']
+        build_lock.acquire()
+        transliterator.refresh('hi', build_lock)
+        self.assertFalse(build_lock.locked())
+        self.assertEqual(self.transliterate('ramu', lang='hi').data['candidates'], [{'text': 'रामू', 'count': 2}])
+
+    def test_transliteration_lexicon(self):
+        with tempfile.TemporaryDirectory() as lexicon_dir:
+            with open(os.path.join(lexicon_dir, 'hi.tsv'), 'w', encoding='utf-8') as lexicon:
+                lexicon.write('नमस्ते\tnamaste\t5\nनमक\tnamak\t2\n')
+            transliterator.clear()
+            self.addCleanup(transliterator.clear)
+            self.client.force_authenticate(user=self.annotator)
+            with override_settings(TRANSLITERATION={'LEXICON_DIR': lexicon_dir}):
+                self.assertEqual([candidate['text'] for candidate in self.transliterate('nam', lang='hi').data['candidates']], ['नमस्ते', 'नमक', 'नम'])
+
+    def test_transliteration_scripts(self):
+        #Romanized words and typed spellings meet on the same phonetic key
+        self.assertEqual(phonetic_key(Script('hi').romanize('राम'), 'hi'), phonetic_key('raam', 'hi'))
+        self.assertEqual(phonetic_key(Script('ta').romanize('தமிழ்'), 'ta'), phonetic_key('thamizh', 'ta'))
+        self.assertEqual(phonetic_key(Script('ur').romanize('پاکستان'), 'ur'), phonetic_key('pakistan', 'ur'))
+        self.assertEqual(phonetic_key(Script('si').romanize('ලංකා'), 'si'), phonetic_key('lanka', 'si'))
+        self.assertEqual(Script('hi').transliterate('bharat'), 'भरत')
+        self.assertEqual(Script('ta').transliterate('tamil'), 'தமில்')
+        self.assertEqual(Script('hi').words('भारत, एक देश। 2023'), ['भारत', 'एक', 'देश'])
+
+    @override_settings(WIKI_METRICS={'ENABLED': True}, INGESTION_BACKEND={'BACKEND': 'wiki_translation.ingestion.SyncBackend'})
+    @fixture_tokenizer
+    @mock.patch('wiki_translation.utils.Wikipedia')
+    def test_request_metrics(self, wikipedia):
+        wikipedia.return_value.page.return_value.summary = 'Asia is a continent. It is large.'
+        metrics.registry.clear()
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.get(reverse(project_view))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[0-9.]+;desc="[1-9][0-9]* queries", serializer;dur=[0-9.]+, http;dur=0.00, tokenize;dur=0.00, total;dur=')
+        #Ingestion runs after the request, and is recorded as a view of its own
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse(project_view), {'article_title': 'Asia', 'target_language': 'te'}, format='json')
+        self.assertEqual(Sentence.objects.filter(project__project_id='te_asia').count(), 2)
+
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('wiki_request_duration_seconds_count{view="project_view",method="GET"} 1', body)
+        self.assertIn('wiki_request_duration_seconds_count{view="project_view",method="POST"} 1', body)
+        self.assertIn('wiki_db_queries_bucket{view="project_view",method="GET",le="+Inf"} 1', body)
+        self.assertIn('wiki_http_duration_seconds_count{view="ingestion",method=""} 1', body)
+        self.assertNotIn('wiki_tokenize_duration_seconds_sum{view="ingestion",method=""} 0.0\n', body)
+
+    @override_settings(WIKI_METRICS={'ENABLED': True, 'TOKEN': 'scraper-token', 'ALLOWED_IPS': ['10.0.0.5']})
+    def test_request_metrics_access(self):
+        #Logged users are not scrapers
+        self.client.force_authenticate(user=self.superuser)
+        self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer other-token').status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scraper-token').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.5').status_code, status.HTTP_200_OK)
+
+    def test_request_metrics_disabled(self):
+        self.client.force_authenticate(user=self.manager)
+        self.assertNotIn('Server-Timing', self.client.get(reverse(project_view)))
+        self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_404_NOT_FOUND)
+
+
+#Requests through translation.asgi like an ASGI server. The views run on threads of their own, which only see committed rows
+class ASGITest(TransactionTestCase):
+
+    def setUp(self):
+        self.manager = User.objects.create_user(username='manager', password='password')
+        self.manager.groups.add(Group.objects.create(name='Manager'))
+        self.project = Project.objects.create(article_title='India', target_language='te', project_id='te_india', created_by=self.manager, created_on=timezone.now())
+
+    async def asgi_get(self, user, path, query = ''):
+        token = await sync_to_async(token_for_user)(user)
+        scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http', 'path': path, 'root_path': '',
+                 'query_string': query.encode(), 'headers': [(b'authorization', f'Bearer {token.access_token}'.encode()), (b'host', b'testserver')],
+                 'server': ('testserver', 80), 'client': ('127.0.0.1', 1234)}
+        messages = []
+        requests = iter([{'type': 'http.request', 'body': b'', 'more_body': False}])
+        async def receive():
+            return next(requests, {'type': 'http.disconnect'})
+        async def send(message):
+            messages.append(message)
+        await asgi_server_application(scope, receive, send)
+        return messages[0]['status'], b''.join(message.get('body', b'') for message in messages[1:]).decode()
+
+    async def test_export_streams_under_asgi(self):
+        await Sentence.objects.abulk_create([Sentence(project=self.project, original_sentence=f'Sentence {i}.', translated_sentence=f'Translated {i}') for i in range(2500)])
+        status_code, body = await self.asgi_get(self.manager, reverse(export_view), 'type=tsv')
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        lines = body.splitlines()
+        #Rows of more than one chunk of the DB iterator
+        self.assertEqual(len(lines), 2501)
+        self.assertEqual(lines[1], 'te_india\tte\tSentence 0.\tTranslated 0')
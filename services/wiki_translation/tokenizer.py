@@ -0,0 +1,77 @@
+import logging
+import threading
+import time
+import nltk
+from django.conf import settings
+from django.core import checks
+from django.core.exceptions import ImproperlyConfigured
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+#Punkt model shipped by nltk.download('punkt'), relative to the nltk data directory
+PUNKT_RESOURCE = 'tokenizers/punkt/english.pickle'
+
+#Tokenizer shared by the whole process. It is loaded once, when the app is ready or on the first tokenize
+_tokenizer = None
+_lock = threading.Lock()
+
+#Timings used to check that only the first tokenize after the load is slow
+_stats = {
+    'load_seconds': None,
+    'cold_tokenize_seconds': None,
+    'warm_tokenize_count': 0,
+    'warm_tokenize_seconds': 0.0,
+}
+
+def load_punkt(path):
+    #Never download the model here, it only looks in the configured local directory.
+    #An untrained tokenizer would split the abbreviations and initials differently, so a missing model is an error
+    try:
+        return nltk.data.load(f'file:{path}/{PUNKT_RESOURCE}')
+    except (LookupError, OSError) as e:
+        raise ImproperlyConfigured(f'Punkt model not found in {path}, download it with: python -m nltk.downloader -d {path} punkt') from e
+
+def load(path = None):
+    global _tokenizer
+    with _lock:
+        if (_tokenizer is None):
+            start = time.perf_counter()
+            _tokenizer = load_punkt(path or settings.NLTK_DATA_PATH)
+            _stats['load_seconds'] = time.perf_counter() - start
+    return _tokenizer
+
+@checks.register(deploy = True)
+def check_punkt_model(app_configs, **kwargs):
+    #Run by check --deploy, so a deployment without the model is caught before serving. The other commands and the tests
+    #run without it, and tokenizing raises ImproperlyConfigured till it is downloaded
+    try:
+        load()
+    except ImproperlyConfigured as e:
+        return [checks.Error(str(e), hint = 'NLTK_DATA_PATH in settings.py is the directory of the model', id = 'wiki_translation.E001')]
+    return []
+
+def get_tokenizer():
+    #Loads the model if it was not loaded when the app was ready, and raises ImproperlyConfigured while it is missing
+    return _tokenizer or load()
+
+def tokenize_many(texts):
+    tokenizer = get_tokenizer()
+    with metrics.timer('tokenize'):
+        start = time.perf_counter()
+        sentences = [tokenizer.tokenize(text) for text in texts]
+        elapsed = time.perf_counter() - start
+    with _lock:
+        if (_stats['cold_tokenize_seconds'] is None):
+            _stats['cold_tokenize_seconds'] = elapsed
+        else:
+            _stats['warm_tokenize_count'] += 1
+            _stats['warm_tokenize_seconds'] += elapsed
+    return sentences
+
+def tokenize(text):
+    return tokenize_many([text])[0]
+
+def stats():
+    with _lock:
+        return dict(_stats)
@@ -0,0 +1,504 @@
+import logging
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, bisect_right
+from collections import Counter, OrderedDict
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Max, Sum
+from .models import Project, Sentence
+
+logger = logging.getLogger(__name__)
+
+#Transliteration suggestions: Latin-script prefix -> words of the target language, ranked by how often they are used.
+#Words come from the translated sentences and from an optional seed lexicon. Both sides are reduced to a phonetic key,
+#so the spellings people type for the same word ("raam", "ram", "rAm") find the same words
+
+#Max number of candidates returned for a prefix
+MAX_CANDIDATES = 10
+
+#Number of rows fetched from the DB at a time while building an index
+BUILD_CHUNK_SIZE = 2000
+
+#Rankings of the prefixes up to this many letters of the phonetic key are kept up to date, the longer ones are cached in an LRU
+TOP_PREFIX_SIZE = 2
+
+def option(name, default):
+    return getattr(settings, 'TRANSLITERATION', {}).get(name, default)
+
+#Languages which drop the inherent vowel at the end of a word, so "ram" is written as राम
+SCHWA_DELETION = {'hi', 'mr', 'ne', 'pa', 'gu', 'bn'}
+
+#Languages which write a short e and o, so "e" and "o" are short and "ee" and "oo" long
+SHORT_VOWELS = {'ta', 'te', 'kn', 'ml'}
+
+#Start of the unicode block of each Brahmic script. The blocks share the layout of Devanagari, so one table serves all of them
+BRAHMIC_BLOCKS = {'hi': 0x900, 'mr': 0x900, 'ne': 0x900, 'bn': 0x980, 'pa': 0xA00, 'gu': 0xA80, 'or': 0xB00, 'ta': 0xB80, 'te': 0xC00,
+                  'kn': 0xC80, 'ml': 0xD00}
+
+#Offsets in the Devanagari layout -> Latin
+BRAHMIC_VOWELS = {0x05: 'a', 0x06: 'aa', 0x07: 'i', 0x08: 'ii', 0x09: 'u', 0x0A: 'uu', 0x0B: 'ri', 0x0C: 'li', 0x0D: 'e', 0x0E: 'e', 0x0F: 'e',
+                  0x10: 'ai', 0x11: 'o', 0x12: 'o', 0x13: 'o', 0x14: 'au'}
+BRAHMIC_CONSONANTS = {0x15: 'k', 0x16: 'kh', 0x17: 'g', 0x18: 'gh', 0x19: 'ng', 0x1A: 'ch', 0x1B: 'chh', 0x1C: 'j', 0x1D: 'jh', 0x1E: 'ny',
+                      0x1F: 't', 0x20: 'th', 0x21: 'd', 0x22: 'dh', 0x23: 'n', 0x24: 't', 0x25: 'th', 0x26: 'd', 0x27: 'dh', 0x28: 'n', 0x29: 'n',
+                      0x2A: 'p', 0x2B: 'ph', 0x2C: 'b', 0x2D: 'bh', 0x2E: 'm', 0x2F: 'y', 0x30: 'r', 0x31: 'r', 0x32: 'l', 0x33: 'l', 0x34: 'zh',
+                      0x35: 'v', 0x36: 'sh', 0x37: 'sh', 0x38: 's', 0x39: 'h', 0x58: 'q', 0x59: 'kh', 0x5A: 'gh', 0x5B: 'z', 0x5C: 'r', 0x5D: 'rh',
+                      0x5E: 'f', 0x5F: 'y'}
+#Letters at offsets which are signs in the other scripts, like the Odia wa where Gurmukhi has the addak
+BRAHMIC_EXTRA_CONSONANTS = {'or': {0x71: 'v'}}
+BRAHMIC_SIGNS = {0x3E: 'aa', 0x3F: 'i', 0x40: 'ii', 0x41: 'u', 0x42: 'uu', 0x43: 'ri', 0x44: 'ri', 0x45: 'e', 0x46: 'e', 0x47: 'e', 0x48: 'ai',
+                 0x49: 'o', 0x4A: 'o', 0x4B: 'o', 0x4C: 'au', 0x57: 'au'}
+BRAHMIC_VIRAMA = 0x4D
+#Anusvara, candrabindu, visarga and the Gurmukhi tippi
+BRAHMIC_MODIFIERS = {0x01: 'n', 0x02: 'n', 0x03: 'h', 0x70: 'n'}
+#Letters without an inherent vowel: Bengali khanda ta and the Malayalam chillus
+BRAHMIC_FINALS = {0x4E: 't', 0x7A: 'n', 0x7B: 'n', 0x7C: 'r', 0x7D: 'l', 0x7E: 'l', 0x7F: 'k'}
+
+#Latin -> offsets in the Devanagari layout, for the rule based transliteration of what is typed. A tuple is a conjunct
+BRAHMIC_LATIN_CONSONANTS = {'k': 0x15, 'kh': 0x16, 'g': 0x17, 'gh': 0x18, 'c': 0x1A, 'ch': 0x1A, 'chh': 0x1B, 'j': 0x1C, 'jh': 0x1D, 't': 0x24,
+                            'th': 0x25, 'd': 0x26, 'dh': 0x27, 'n': 0x28, 'p': 0x2A, 'ph': 0x2B, 'f': 0x5E, 'b': 0x2C, 'bh': 0x2D, 'm': 0x2E,
+                            'y': 0x2F, 'r': 0x30, 'l': 0x32, 'zh': 0x34, 'v': 0x35, 'w': 0x35, 'sh': 0x36, 's': 0x38, 'h': 0x39, 'q': 0x58,
+                            'z': 0x5B, 'x': (0x15, 0x38)}
+#Latin -> (independent vowel, vowel sign). The inherent a has no sign
+BRAHMIC_LATIN_VOWELS = {'a': (0x05, None), 'aa': (0x06, 0x3E), 'i': (0x07, 0x3F), 'ii': (0x08, 0x40), 'ee': (0x08, 0x40), 'u': (0x09, 0x41),
+                        'uu': (0x0A, 0x42), 'oo': (0x0A, 0x42), 'e': (0x0F, 0x47), 'ai': (0x10, 0x48), 'o': (0x13, 0x4B), 'au': (0x14, 0x4C)}
+BRAHMIC_SHORT_VOWELS = {'e': (0x0E, 0x46), 'o': (0x12, 0x4A)}
+
+#Scripts without a letter use the nearest one, like க for g in Tamil
+BRAHMIC_FALLBACKS = {0x16: 0x15, 0x17: 0x15, 0x18: 0x17, 0x1B: 0x1A, 0x1C: 0x1A, 0x1D: 0x1C, 0x20: 0x1F, 0x21: 0x1F, 0x22: 0x21, 0x25: 0x24,
+                     0x26: 0x24, 0x27: 0x26, 0x2B: 0x2A, 0x2C: 0x2A, 0x2D: 0x2C, 0x34: 0x33, 0x33: 0x32, 0x35: 0x2C, 0x36: 0x37, 0x37: 0x38,
+                     0x58: 0x15, 0x5B: 0x1C, 0x5E: 0x2B, 0x0E: 0x0F, 0x12: 0x13, 0x46: 0x47, 0x4A: 0x4B}
+
+SINHALA_VOWELS = {0xD85: 'a', 0xD86: 'aa', 0xD87: 'ae', 0xD88: 'ae', 0xD89: 'i', 0xD8A: 'ii', 0xD8B: 'u', 0xD8C: 'uu', 0xD8D: 'ri', 0xD91: 'e',
+                  0xD92: 'e', 0xD93: 'ai', 0xD94: 'o', 0xD95: 'o', 0xD96: 'au'}
+SINHALA_CONSONANTS = {0xD9A: 'k', 0xD9B: 'kh', 0xD9C: 'g', 0xD9D: 'gh', 0xD9E: 'ng', 0xDA0: 'ch', 0xDA1: 'chh', 0xDA2: 'j', 0xDA3: 'jh',
+                      0xDA4: 'ny', 0xDA7: 't', 0xDA8: 'th', 0xDA9: 'd', 0xDAA: 'dh', 0xDAB: 'n', 0xDAD: 't', 0xDAE: 'th', 0xDAF: 'd', 0xDB0: 'dh',
+                      0xDB1: 'n', 0xDB4: 'p', 0xDB5: 'ph', 0xDB6: 'b', 0xDB7: 'bh', 0xDB8: 'm', 0xDBA: 'y', 0xDBB: 'r', 0xDBD: 'l', 0xDC0: 'v',
+                      0xDC1: 'sh', 0xDC2: 'sh', 0xDC3: 's', 0xDC4: 'h', 0xDC5: 'l', 0xDC6: 'f', 0xD9F: 'ng', 0xDA5: 'gny', 0xDA6: 'nj', 0xDAC: 'nd',
+                      0xDB3: 'nd', 0xDB9: 'mb'}
+SINHALA_SIGNS = {0xDCF: 'aa', 0xDD0: 'ae', 0xDD1: 'ae', 0xDD2: 'i', 0xDD3: 'ii', 0xDD4: 'u', 0xDD6: 'uu', 0xDD8: 'ri', 0xDD9: 'e', 0xDDA: 'e',
+                 0xDDB: 'ai', 0xDDC: 'o', 0xDDD: 'o', 0xDDE: 'au'}
+SINHALA_LATIN_CONSONANTS = {'k': 0xD9A, 'kh': 0xD9B, 'g': 0xD9C, 'gh': 0xD9D, 'c': 0xDA0, 'ch': 0xDA0, 'chh': 0xDA1, 'j': 0xDA2, 'jh': 0xDA3,
+                            't': 0xDAD, 'th': 0xDAE, 'd': 0xDAF, 'dh': 0xDB0, 'n': 0xDB1, 'p': 0xDB4, 'ph': 0xDB5, 'f': 0xDC6, 'b': 0xDB6,
+                            'bh': 0xDB7, 'm': 0xDB8, 'y': 0xDBA, 'r': 0xDBB, 'l': 0xDBD, 'v': 0xDC0, 'w': 0xDC0, 'sh': 0xDC1, 's': 0xDC3,
+                            'h': 0xDC4, 'q': 0xD9A, 'z': 0xDA2, 'x': (0xD9A, 0xDC3)}
+SINHALA_LATIN_VOWELS = {'a': (0xD85, None), 'aa': (0xD86, 0xDCF), 'ae': (0xD87, 0xDD0), 'i': (0xD89, 0xDD2), 'ii': (0xD8A, 0xDD3),
+                        'ee': (0xD8A, 0xDD3), 'u': (0xD8B, 0xDD4), 'uu': (0xD8C, 0xDD6), 'oo': (0xD8C, 0xDD6), 'e': (0xD91, 0xDD9),
+                        'ai': (0xD93, 0xDDB), 'o': (0xD94, 0xDDC), 'au': (0xD96, 0xDDE)}
+
+#Urdu is written without the short vowels, so its words are matched on their consonants
+URDU_LETTERS = {'ا': 'a', 'آ': 'a', 'ب': 'b', 'پ': 'p', 'ت': 't', 'ٹ': 't', 'ث': 's', 'ج': 'j', 'چ': 'ch', 'ح': 'h', 'خ': 'kh', 'د': 'd',
+                'ڈ': 'd', 'ذ': 'z', 'ر': 'r', 'ڑ': 'r', 'ز': 'z', 'ژ': 'zh', 'س': 's', 'ش': 'sh', 'ص': 's', 'ض': 'z', 'ط': 't', 'ظ': 'z',
+                'ع': 'a', 'غ': 'gh', 'ف': 'f', 'ق': 'q', 'ک': 'k', 'ك': 'k', 'گ': 'g', 'ل': 'l', 'م': 'm', 'ن': 'n', 'ں': 'n', 'و': 'o',
+                'ؤ': 'o', 'ہ': 'h', 'ھ': 'h', 'ه': 'h', 'ۃ': 'h', 'ة': 'h', 'ی': 'i', 'ي': 'i', 'ئ': 'i', 'ے': 'e', 'ۓ': 'e', 'ء': ''}
+URDU_LATIN_CONSONANTS = {'b': 'ب', 'bh': 'بھ', 'p': 'پ', 'ph': 'پھ', 't': 'ت', 'th': 'تھ', 'j': 'ج', 'jh': 'جھ', 'c': 'چ', 'ch': 'چ',
+                         'chh': 'چھ', 'h': 'ہ', 'kh': 'خ', 'd': 'د', 'dh': 'دھ', 'z': 'ز', 'r': 'ر', 's': 'س', 'sh': 'ش', 'gh': 'غ', 'f': 'ف',
+                         'q': 'ق', 'k': 'ک', 'g': 'گ', 'l': 'ل', 'm': 'م', 'n': 'ن', 'v': 'و', 'w': 'و', 'y': 'ی', 'x': 'کس'}
+#Latin -> (at the start of the word, in the middle, at the end)
+URDU_LATIN_VOWELS = {'a': ('ا', '', 'ا'), 'aa': ('آ', 'ا', 'ا'), 'i': ('ا', 'ی', 'ی'), 'ii': ('ای', 'ی', 'ی'), 'ee': ('ای', 'ی', 'ی'),
+                     'u': ('ا', 'و', 'و'), 'uu': ('او', 'و', 'و'), 'oo': ('او', 'و', 'و'), 'o': ('او', 'و', 'و'), 'e': ('ای', 'ی', 'ے'),
+                     'ai': ('اے', 'ی', 'ے'), 'au': ('او', 'و', 'و')}
+
+#Latin spellings of the same sound, reduced in this order
+KEY_RULES = [
+    (re.compile(r'c(?=[^h])'), 'k'),
+    (re.compile(r'(ee|ii)'), 'i'),
+    (re.compile(r'(oo|uu)'), 'u'),
+    (re.compile(r'x'), 'ks'),
+    (re.compile(r'q'), 'k'),
+    (re.compile(r'f'), 'p'),
+    (re.compile(r'w'), 'v'),
+    (re.compile(r'z'), 'j'),
+    #Aspirated and retroflex consonants are typed with and without the h
+    (re.compile(r'(?<=[bcdgjklmnprstv])h+'), ''),
+    #Double letters are long vowels or geminated consonants
+    (re.compile(r'(.)\1+'), r'\1'),
+]
+URDU_VOWELS = re.compile(r'(?<=.)[aeiou]')
+
+def phonetic_key(latin, language):
+    #Phonetic key of a Latin spelling. What is typed and the romanized words are compared on this key
+    key = ''.join(character for character in latin.lower() if 'a' <= character <= 'z')
+    for pattern, replacement in KEY_RULES:
+        key = pattern.sub(replacement, key)
+    if (language == 'ur'):
+        key = URDU_VOWELS.sub('', key)
+    return key
+
+def is_assigned(code):
+    return unicodedata.name(chr(code), None) is not None
+
+def abugida_romanize(word, to_code, vowels, consonants, signs, virama, modifiers, finals, schwa_deletion):
+    #Consonants carry an inherent a, unless a vowel sign or the virama follows them
+    latin = []
+    pending = False
+    for character in word:
+        code = to_code(ord(character))
+        if (code in consonants):
+            if (pending):
+                latin.append('a')
+            latin.append(consonants[code])
+            pending = True
+            continue
+        if (code in signs):
+            latin.append(signs[code])
+        elif (code in vowels or code in modifiers or code in finals):
+            if (pending):
+                latin.append('a')
+            latin.append(vowels.get(code) or modifiers.get(code) or finals.get(code))
+        elif (code != virama):
+            #Nukta, joiners and the marks which do not change the sound much
+            continue
+        pending = False
+    if (pending and not schwa_deletion):
+        latin.append('a')
+    return ''.join(latin)
+
+def abugida_transliterate(latin, consonant_codes, vowel_codes, virama, final_virama):
+    #Greedy longest match of the Latin letters. Consonants in a row are joined with the virama into a conjunct
+    codes = []
+    pending = False
+    position = 0
+    while (position < len(latin)):
+        for size in (3, 2, 1):
+            part = latin[position:position + size]
+            if (part in consonant_codes):
+                conjunct = consonant_codes[part] if isinstance(consonant_codes[part], tuple) else (consonant_codes[part],)
+                for code in conjunct:
+                    if (pending):
+                        codes.append(virama)
+                    codes.append(code)
+                    pending = True
+                break
+            if (part in vowel_codes):
+                independent, sign = vowel_codes[part]
+                if (not pending):
+                    codes.append(independent)
+                elif (sign is not None):
+                    codes.append(sign)
+                pending = False
+                break
+        else:
+            #Not a letter of the scheme
+            size = 1
+        position += size
+    if (pending and final_virama):
+        codes.append(virama)
+    return codes
+
+#Script of a target language: splits text into words, romanizes words and transliterates Latin
+class Script:
+
+    def __init__(self, language):
+        self.language = language
+        #Letters and marks of the script, with the zero width (non) joiners. Digits and dandas end a word
+        if (language == 'ur'):
+            self.word_pattern = re.compile('[\u0621-\u0652\u0670-\u06d3]+')
+        elif (language == 'si'):
+            self.word_pattern = re.compile('[\u0d80-\u0de5\u0df2-\u0df3\u200c\u200d]+')
+        else:
+            start = BRAHMIC_BLOCKS[language]
+            self.word_pattern = re.compile(f'[{chr(start)}-{chr(start + 0x63)}{chr(start + 0x70)}-{chr(start + 0x7F)}\u200c\u200d]+')
+            self.consonants = dict(BRAHMIC_CONSONANTS, **BRAHMIC_EXTRA_CONSONANTS.get(language, {}))
+
+    def words(self, text):
+        return self.word_pattern.findall(unicodedata.normalize('NFC', text)) if text else []
+
+    def romanize(self, word):
+        if (self.language == 'ur'):
+            return ''.join(URDU_LETTERS.get(character, '') for character in word)
+        schwa_deletion = self.language in SCHWA_DELETION
+        if (self.language == 'si'):
+            return abugida_romanize(word, lambda code: code, SINHALA_VOWELS, SINHALA_CONSONANTS, SINHALA_SIGNS, 0xDCA, {0xD82: 'n', 0xD83: 'h'},
+                                    {}, schwa_deletion)
+        start = BRAHMIC_BLOCKS[self.language]
+        return abugida_romanize(word, lambda code: code - start, BRAHMIC_VOWELS, self.consonants, BRAHMIC_SIGNS, BRAHMIC_VIRAMA,
+                                BRAHMIC_MODIFIERS, BRAHMIC_FINALS, schwa_deletion)
+
+    def brahmic_code(self, offset):
+        #Letter of the script for the offset, or the nearest letter the script has
+        start = BRAHMIC_BLOCKS[self.language]
+        while (offset is not None and not is_assigned(start + offset)):
+            offset = BRAHMIC_FALLBACKS.get(offset)
+        return start + offset if offset is not None else None
+
+    def transliterate(self, latin):
+        #Rule based transliteration of the Latin letters, offered when the index has no exact match
+        latin = ''.join(character for character in latin.lower() if 'a' <= character <= 'z')
+        if (self.language == 'ur'):
+            return self.transliterate_urdu(latin)
+        final_virama = self.language not in SCHWA_DELETION
+        if (self.language == 'si'):
+            codes = abugida_transliterate(latin, SINHALA_LATIN_CONSONANTS, SINHALA_LATIN_VOWELS, 0xDCA, final_virama)
+            return ''.join(chr(code) for code in codes)
+        vowels = dict(BRAHMIC_LATIN_VOWELS, **(BRAHMIC_SHORT_VOWELS if self.language in SHORT_VOWELS else {}))
+        codes = abugida_transliterate(latin, BRAHMIC_LATIN_CONSONANTS, vowels, BRAHMIC_VIRAMA, final_virama)
+        return unicodedata.normalize('NFC', ''.join(chr(code) for code in map(self.brahmic_code, codes) if code is not None))
+
+    def transliterate_urdu(self, latin):
+        letters = []
+        position = 0
+        while (position < len(latin)):
+            for size in (3, 2, 1):
+                part = latin[position:position + size]
+                if (part in URDU_LATIN_CONSONANTS):
+                    letters.append(URDU_LATIN_CONSONANTS[part])
+                    break
+                if (part in URDU_LATIN_VOWELS):
+                    start, middle, end = URDU_LATIN_VOWELS[part]
+                    letters.append(start if position == 0 else (end if position + size == len(latin) else middle))
+                    break
+            else:
+                size = 1
+            position += size
+        return ''.join(letters)
+
+#Prefix index of the words of one language. Keys are kept in a sorted array, so the words of a prefix are a contiguous range found by bisect.
+#Ranges of the shortest prefixes are too long to rank on every lookup, so their ranking is kept up to date in tops
+class LanguageIndex:
+
+    def __init__(self, language):
+        self.script = Script(language)
+        self.language = language
+        #Sorted phonetic keys, and the word of each key at the same position
+        self.keys = []
+        self.words = []
+        #(key, word) -> number of uses in the translations plus the count of the lexicon
+        self.weights = {}
+        #word -> phonetic key of its romanization
+        self.word_keys = {}
+        #Prefixes up to TOP_PREFIX_SIZE letters -> ranked [(word, weight, exact)]. None when it has to be ranked again
+        self.tops = {}
+        #Hot longer prefixes -> ranked [(word, weight, exact)]
+        self.lru = OrderedDict()
+
+    def word_key(self, word):
+        key = self.word_keys.get(word)
+        if (key is None):
+            key = self.word_keys[word] = phonetic_key(self.script.romanize(word), self.language)
+        return key
+
+    def build(self, counts, lexicon = ()):
+        #counts: word -> uses in the translations, lexicon: (word, latin, count)
+        weights = Counter()
+        for word, count in counts.items():
+            weights[(self.word_key(word), word)] += count
+        for word, latin, count in lexicon:
+            key = phonetic_key(latin, self.language)
+            if (key):
+                weights[(key, unicodedata.normalize('NFC', word))] += count
+        entries = sorted(entry for entry in weights if entry[0])
+        self.keys = [key for key, _ in entries]
+        self.words = [word for _, word in entries]
+        self.weights = dict(weights)
+        self.lru.clear()
+        self.tops = {}
+        for key in set(key[:size] for key in self.keys for size in range(1, TOP_PREFIX_SIZE + 1)):
+            self.tops[key] = self.ranked(key)
+
+    def add(self, word, delta):
+        #Changes the weight of a word. New words are inserted at their place, so the arrays stay sorted without a rebuild
+        key = self.word_key(word)
+        if (not key):
+            return
+        entry = (key, word)
+        if (entry not in self.weights):
+            self.weights[entry] = 0
+            position = bisect_right(self.keys, key)
+            self.keys.insert(position, key)
+            self.words.insert(position, word)
+        self.weights[entry] += delta
+        for size in range(1, len(key) + 1):
+            prefix = key[:size]
+            if (size <= TOP_PREFIX_SIZE):
+                self.tops[prefix] = self.update_top(self.tops.get(prefix, []), prefix, entry)
+            else:
+                #Only the cached prefixes of the key can change
+                self.lru.pop(prefix, None)
+
+    def update_top(self, top, prefix, entry):
+        #Ranking of a short prefix after the weight of the entry changed. A word which drops may have been passed by words
+        #below the top, so the prefix is ranked again on its next lookup
+        if (top is None):
+            return None
+        key, word = entry
+        weight = self.weights[entry]
+        rank = (key == prefix, weight)
+        others = [candidate for candidate in top if candidate[0] != word]
+        if (len(others) < len(top) and rank < next((candidate[2], candidate[1]) for candidate in top if candidate[0] == word)):
+            return None
+        if (weight <= 0):
+            return top
+        ranked = sorted(others + [(word, weight, key == prefix)], key = lambda candidate: (candidate[2], candidate[1]), reverse = True)
+        return ranked[:MAX_CANDIDATES]
+
+    def ranked(self, key):
+        #Words of the keys starting with the prefix. Exact keys come first, then the most used words
+        start = bisect_left(self.keys, key)
+        end = bisect_left(self.keys, key + '{')
+        best = {}
+        for position in range(start, end):
+            entry = (self.keys[position], self.words[position])
+            weight = self.weights[entry]
+            if (weight <= 0):
+                continue
+            rank = (entry[0] == key, weight)
+            if (rank > best.get(entry[1], (False, 0))):
+                best[entry[1]] = rank
+        ranked = sorted(best.items(), key = lambda item: item[1], reverse = True)[:MAX_CANDIDATES]
+        return [(word, weight, exact) for word, (exact, weight) in ranked]
+
+    def lookup(self, prefix, k):
+        key = phonetic_key(prefix, self.language)
+        if (not key):
+            return []
+        if (len(key) <= TOP_PREFIX_SIZE):
+            candidates = self.tops.get(key, [])
+            if (candidates is None):
+                candidates = self.tops[key] = self.ranked(key)
+            return candidates[:k]
+        candidates = self.lru.get(key)
+        if (candidates is None):
+            candidates = self.ranked(key)
+            self.lru[key] = candidates
+            while (len(self.lru) > option('LRU_SIZE', 10000)):
+                self.lru.popitem(last = False)
+        else:
+            self.lru.move_to_end(key)
+        return candidates[:k]
+
+def read_lexicon(language):
+    #Seed lexicon of the language: LEXICON_DIR/<language>.tsv with "word<TAB>latin<TAB>count" lines, the format of the Dakshina dataset
+    lexicon_dir = option('LEXICON_DIR', None)
+    if (lexicon_dir is None):
+        return []
+    try:
+        with open(f'{lexicon_dir}/{language}.tsv', encoding = 'utf-8') as lexicon:
+            entries = []
+            for line in lexicon:
+                parts = line.rstrip('\n').split('\t')
+                if (len(parts) >= 2 and parts[0] and parts[1]):
+                    entries.append((parts[0], parts[1], int(parts[2]) if len(parts) > 2 and parts[2].isdigit() else 1))
+            return entries
+    except FileNotFoundError:
+        return []
+
+def translations_version(language):
+    #Changes with every translation saved in any process, as the progress counters of the projects are updated with it
+    return Project.objects.filter(target_language = language) \
+        .aggregate(count = Count('id'), sentences = Sum('sentence_count'), translated = Sum('translated_count'), activity = Max('last_activity'))
+
+#Indexes of all the target languages. They are built from the DB on first use and updated when translations are saved in this process.
+#Translations saved by the other processes are read by rebuilding the index in the background, when the version of the language changed
+#since the index was built. Indexes are built outside the lock, so lookups and updates of the other languages never wait for a build
+class Transliterator:
+
+    def __init__(self):
+        self.indexes = {}
+        #Version of the translations each index was built from, and the time it was last compared with the DB
+        self.versions = {}
+        self.checked = {}
+        #One lock per language, so a language is built once when it is requested by several threads
+        self.build_locks = {}
+        self.lock = threading.RLock()
+
+    def build(self, language, version = None):
+        #Reads all the translations of the language. The version is read first, so a translation saved meanwhile is read on the next refresh
+        version = version or translations_version(language)
+        index = LanguageIndex(language)
+        counts = Counter()
+        translations = Sentence.objects.filter(project__target_language = language) \
+            .exclude(translated_sentence__isnull = True).exclude(translated_sentence = '') \
+            .values_list('translated_sentence', flat = True).iterator(chunk_size = BUILD_CHUNK_SIZE)
+        for translation in translations:
+            counts.update(index.script.words(translation))
+        index.build(counts, read_lexicon(language))
+        with self.lock:
+            self.indexes[language] = index
+            self.versions[language] = version
+            self.checked[language] = time.monotonic()
+        return index
+
+    def get_index(self, language):
+        with self.lock:
+            index = self.indexes.get(language)
+            checked = self.checked.get(language)
+            build_lock = self.build_locks.setdefault(language, threading.Lock())
+        if (index is None):
+            with build_lock:
+                with self.lock:
+                    index = self.indexes.get(language)
+                if (index is None):
+                    index = self.build(language)
+        elif (time.monotonic() - checked >= option('REFRESH_SECONDS', 300) and build_lock.acquire(blocking = False)):
+            #The index in use keeps serving the lookups till the new one is built
+            threading.Thread(target = self.refresh, args = (language, build_lock), daemon = True).start()
+        return index
+
+    def refresh(self, language, build_lock):
+        try:
+            version = translations_version(language)
+            if (version != self.versions.get(language)):
+                self.build(language, version)
+            else:
+                with self.lock:
+                    self.checked[language] = time.monotonic()
+        except Exception:
+            logger.exception('Failed to refresh the transliteration index of %s', language)
+        finally:
+            build_lock.release()
+            #The thread has a DB connection of its own
+            connection.close()
+
+    def warm(self, languages):
+        #Builds the indexes in the background at startup, so the first requests of the languages do not wait for them
+        if (not languages):
+            return
+        def build_all():
+            try:
+                for language in languages:
+                    self.get_index(language)
+            except Exception:
+                logger.exception('Failed to build the transliteration indexes')
+            finally:
+                connection.close()
+        threading.Thread(target = build_all, daemon = True).start()
+
+    def update(self, language, previous, current):
+        #previous and current are the translations before and after a save. Words of the replaced ones are counted out
+        with self.lock:
+            #Index which is not built yet gets the change from the DB when it is built
+            index = self.indexes.get(language)
+            if (index is None):
+                return
+            delta = Counter()
+            for text in current:
+                delta.update(index.script.words(text))
+            for text in previous:
+                delta.subtract(index.script.words(text))
+            for word, change in delta.items():
+                if (change):
+                    index.add(word, change)
+
+    def suggest(self, prefix, language, k = MAX_CANDIDATES):
+        #Returns [{text, count}] for the prefix. The rule based transliteration is added last when no word matches the whole prefix
+        index = self.get_index(language)
+        with self.lock:
+            candidates = index.lookup(prefix, k)
+        suggestions = [{'text': word, 'count': weight} for word, weight, _ in candidates]
+        if (not any(exact for _, _, exact in candidates)):
+            transliteration = index.script.transliterate(prefix)
+            if (transliteration and all(suggestion['text'] != transliteration for suggestion in suggestions)):
+                suggestions = suggestions[:k - 1] + [{'text': transliteration, 'count': 0}]
+        return suggestions
+
+    def clear(self):
+        with self.lock:
+            self.indexes = {}
+            self.versions = {}
+            self.checked = {}
+
+#Transliterator shared by the whole process
+transliterator = Transliterator()
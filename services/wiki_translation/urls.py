@@ -1,13 +1,27 @@
 from django.urls import path
-from .views import project_view, sentences_view, single_sentence_view, login_api, getUsers, token_refresh_api, single_project_view
+from .async_views import async_project_view, async_single_project_view, async_project_status_view, async_sentences_view, async_single_sentence_view
+from .views import project_view, sentences_view, single_sentence_view, login_api, getUsers, token_refresh_api, single_project_view, project_status_view, export_view, project_batch_view, sentence_suggestions_view, sentence_events_ticket_view, search_view, transliteration_view
 
 #Controller: Routes to view with match patterns
 urlpatterns = [
     path('', project_view),
+    path('batch/', project_batch_view),
     path('login/', login_api),
     path('login/refresh/', token_refresh_api),
     path('<str:project_id>/sentence', sentences_view),
+    path('<str:project_id>/sentence/suggestions', sentence_suggestions_view),
+    path('<str:project_id>/sentence/events/ticket', sentence_events_ticket_view),
     path('sentence/<int:sentence_id>', single_sentence_view),
     path('users/', getUsers),
-    path('project/<str:project_id>', single_project_view)
+    path('export/', export_view),
+    path('search/', search_view),
+    path('transliterate/', transliteration_view),
+    path('project/<str:project_id>', single_project_view),
+    path('project/<str:project_id>/status', project_status_view),
+    #Async views of the read endpoints and of the project creation, for ASGI servers
+    path('async/', async_project_view),
+    path('async/<str:project_id>/sentence', async_sentences_view),
+    path('async/sentence/<int:sentence_id>', async_single_sentence_view),
+    path('async/project/<str:project_id>', async_single_project_view),
+    path('async/project/<str:project_id>/status', async_project_status_view),
 ]
\ No newline at end of file
@@ -1,12 +1,232 @@
+import asyncio
+import threading
+import weakref
+from datetime import timedelta
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
 from wikipediaapi import Wikipedia
-import nltk
-
-def getSummaryForTitles(title):
-    #Download missing files. Only for the first use
-    nltk.download('punkt')
+from .models import ArticleCacheEntry, LocalArticle
+from . import metrics, tokenizer
 
+def fetchSummary(title, language = 'en'):
     #Get the summary of a wikipedia page from title
-    summary = Wikipedia().page(title=title).summary
+    with metrics.timer('http'):
+        return Wikipedia(language).page(title=title).summary
+
+def fetchRevision(title, language = 'en'):
+    #Get the latest revision id of a wikipedia page from title
+    with metrics.timer('http'):
+        return Wikipedia(language).page(title=title).lastrevid
+
+#Same API, user agent and timeout as wikipediaapi, for the async fetches
+WIKIPEDIA_API_URL = 'https://{}.wikipedia.org/w/api.php'
+WIKIPEDIA_HEADERS = {'User-Agent': 'Wikipedia-API (https://github.com/martin-majlis/Wikipedia-API)'}
+WIKIPEDIA_TIMEOUT = 10.0
+
+#An async client can only be used on the event loop it was created on
+_async_clients = weakref.WeakKeyDictionary()
+
+def getAsyncClient():
+    #Connections to wikipedia are kept open and shared by all the requests of the event loop
+    loop = asyncio.get_running_loop()
+    if (loop not in _async_clients):
+        _async_clients[loop] = httpx.AsyncClient(headers = WIKIPEDIA_HEADERS, timeout = WIKIPEDIA_TIMEOUT)
+    return _async_clients[loop]
 
+async def queryPage(title, language, params):
+    #Returns the page of the title from the query API, None when the page does not exist
+    with metrics.timer('http'):
+        response = await getAsyncClient().get(WIKIPEDIA_API_URL.format(language.strip().lower()),
+                                              params = dict(params, action = 'query', titles = title, format = 'json', redirects = 1))
+        response.raise_for_status()
+    for page_id, page in response.json()['query']['pages'].items():
+        return None if page_id == '-1' else page
+    return None
+
+async def afetchSummary(title, language = 'en'):
+    #Async fetchSummary. Only the intro is requested, which is the summary of wikipediaapi
+    page = await queryPage(title, language, {'prop': 'extracts', 'explaintext': 1, 'exsectionformat': 'wiki', 'exintro': 1})
+    return page.get('extract', '').strip() if page is not None else ''
+
+async def afetchRevision(title, language = 'en'):
+    #Async fetchRevision
+    page = await queryPage(title, language, {'prop': 'info'})
+    return page.get('lastrevid') if page is not None else None
+
+def tokenizeSummary(summary):
     #Split the summary into sentences are return the list
-    return nltk.sent_tokenize(summary) 
+    return tokenizer.tokenize(summary)
+
+def normalizeTitle(title):
+    #Wikipedia treats spaces and underscores the same, and we do not care about the case
+    return ' '.join(title.replace('_', ' ').split()).casefold()
+
+#Cache of wikipedia summaries and their sentences, stored in the DB so it survives restarts
+#Missing articles are taken from the articles imported from a dump (LocalArticle) before they are fetched from wikipedia
+#fetcher, tokenizer and revision_fetcher can be replaced, so it can be used without network
+#aget_entry uses async_fetcher and async_revision_fetcher, or runs the sync ones on a worker thread when only they are replaced
+class ArticleCache:
+
+    def __init__(self, fetcher = None, tokenizer = None, revision_fetcher = None, max_entries = None, ttl = None, async_fetcher = None, async_revision_fetcher = None):
+        self.fetcher = fetcher
+        self.tokenizer = tokenizer
+        self.revision_fetcher = revision_fetcher
+        self.async_fetcher = async_fetcher
+        self.async_revision_fetcher = async_revision_fetcher
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    #Settings are read on every call, so they can be overridden without creating a new cache
+    def option(self, name, default):
+        return getattr(settings, 'WIKI_ARTICLE_CACHE', {}).get(name, default)
+
+    def get_fetcher(self):
+        return self.fetcher or fetchSummary
+
+    def get_tokenizer(self):
+        return self.tokenizer or tokenizeSummary
+
+    def get_revision_fetcher(self):
+        if (self.revision_fetcher is not None):
+            return self.revision_fetcher
+        return fetchRevision if self.option('CHECK_REVISION', False) else None
+
+    def get_async_fetcher(self):
+        if (self.async_fetcher is not None):
+            return self.async_fetcher
+        return sync_to_async(self.fetcher, thread_sensitive = False) if self.fetcher is not None else afetchSummary
+
+    def get_async_revision_fetcher(self):
+        if (self.async_revision_fetcher is not None):
+            return self.async_revision_fetcher
+        if (self.revision_fetcher is not None):
+            return sync_to_async(self.revision_fetcher, thread_sensitive = False)
+        return afetchRevision if self.option('CHECK_REVISION', False) else None
+
+    def uses_local_articles(self):
+        return self.option('LOCAL_ARTICLES', True)
+
+    def get_max_entries(self):
+        return self.max_entries if self.max_entries is not None else self.option('MAX_ENTRIES', 1000)
+
+    def get_ttl(self):
+        return self.ttl if self.ttl is not None else self.option('TTL', 24 * 60 * 60)
+
+    def count(self, hit):
+        with self.lock:
+            if (hit):
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def reset_stats(self):
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+
+    def is_expired(self, entry):
+        return entry.fetched_on + timedelta(seconds = self.get_ttl()) <= timezone.now()
+
+    def is_fresh(self, entry, title, language, revision_fetcher):
+        if (self.is_expired(entry)):
+            return False
+        if (revision_fetcher is not None and entry.revision_id is not None):
+            return revision_fetcher(title, language) == entry.revision_id
+        return True
+
+    async def ais_fresh(self, entry, title, language, revision_fetcher):
+        if (self.is_expired(entry)):
+            return False
+        if (revision_fetcher is not None and entry.revision_id is not None):
+            return await revision_fetcher(title, language) == entry.revision_id
+        return True
+
+    #Returns the cache entry of the article, fetching the summary only when it is missing or stale
+    def get_entry(self, title, language = 'en'):
+        key = normalizeTitle(title)
+        revision_fetcher = self.get_revision_fetcher()
+        now = timezone.now()
+        entry = ArticleCacheEntry.objects.filter(title = key, language = language).first()
+        if (entry is not None and self.is_fresh(entry, title, language, revision_fetcher)):
+            self.count(hit = True)
+            ArticleCacheEntry.objects.filter(pk = entry.pk).update(last_used = now)
+            return entry
+
+        self.count(hit = False)
+        local = LocalArticle.objects.filter(title = key, language = language).first() if self.uses_local_articles() else None
+        if (local is not None):
+            #Imported articles are as fresh as their dump, so their revision is not checked against wikipedia
+            summary, revision_id = local.summary, None
+        else:
+            summary = self.get_fetcher()(title, language)
+            revision_id = revision_fetcher(title, language) if revision_fetcher is not None else None
+        entry, _ = ArticleCacheEntry.objects.update_or_create(title = key, language = language, defaults = {
+            'summary': summary,
+            'sentences': None,
+            'revision_id': revision_id,
+            'fetched_on': now,
+            'last_used': now,
+        })
+        self.evict()
+        return entry
+
+    #Async get_entry. Fetches wait on the event loop, so a worker thread is not held while wikipedia answers
+    async def aget_entry(self, title, language = 'en'):
+        key = normalizeTitle(title)
+        revision_fetcher = self.get_async_revision_fetcher()
+        now = timezone.now()
+        entry = await ArticleCacheEntry.objects.filter(title = key, language = language).afirst()
+        if (entry is not None and await self.ais_fresh(entry, title, language, revision_fetcher)):
+            self.count(hit = True)
+            await ArticleCacheEntry.objects.filter(pk = entry.pk).aupdate(last_used = now)
+            return entry
+
+        self.count(hit = False)
+        local = await LocalArticle.objects.filter(title = key, language = language).afirst() if self.uses_local_articles() else None
+        if (local is not None):
+            summary, revision_id = local.summary, None
+        else:
+            summary = await self.get_async_fetcher()(title, language)
+            revision_id = await revision_fetcher(title, language) if revision_fetcher is not None else None
+        entry, _ = await ArticleCacheEntry.objects.aupdate_or_create(title = key, language = language, defaults = {
+            'summary': summary,
+            'sentences': None,
+            'revision_id': revision_id,
+            'fetched_on': now,
+            'last_used': now,
+        })
+        await sync_to_async(self.evict)()
+        return entry
+
+    #Returns the sentences of the entry, tokenizing the summary only once
+    def get_entry_sentences(self, entry):
+        if (entry.sentences is None):
+            entry.sentences = self.get_tokenizer()(entry.summary)
+            entry.save(update_fields = ['sentences'])
+        return entry.sentences
+
+    def get_sentences(self, title, language = 'en'):
+        return self.get_entry_sentences(self.get_entry(title, language))
+
+    #Deletes the least recently used entries above max entries
+    def evict(self):
+        stale = ArticleCacheEntry.objects.order_by('-last_used', '-pk').values_list('pk', flat = True)[self.get_max_entries():]
+        ArticleCacheEntry.objects.filter(pk__in = list(stale)).delete()
+
+    def clear(self):
+        ArticleCacheEntry.objects.all().delete()
+
+#Cache shared by the whole process
+article_cache = ArticleCache()
+
+def getSummaryForTitles(title, language = 'en'):
+    return article_cache.get_sentences(title, language)
@@ -1,57 +1,98 @@
+import hashlib
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
-from django.contrib.auth.models import User
-from django.db import IntegrityError
+from django.db import transaction
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, quote_etag
 from .models import Project, Sentence
-from .serializers import ProjectSerializer, SentenceSerializer
-from .utils import getSummaryForTitles
+from .pagination import SentenceCursorPagination
+from .serializers import ProjectSerializer, SentenceSerializer, SentenceBulkUpdateSerializer, ProjectBatchSerializer, make_project_id
+from .export import EXPORT_TYPES, export_rows
+from .ingestion import start_ingestion, start_batch_ingestion
+from .memory import translation_memory
+from .progress import is_translated, record_progress, record_sentence_change
+from .project_cache import project_list_cache, project_resolver
+from .transliteration import MAX_CANDIDATES as MAX_TRANSLITERATIONS, transliterator
+from .validators import validate_target_language
+from . import segments
+from .authentication import token_for_user
+from .changes import issue_ticket, option as change_feed_option, publish_sentence_change, publish_sentences
+from .etags import add_etag, check_conditions, check_sentences_version, project_etag, projects_etag, sentence_etag, sentences_etag
+from .directory import ROLE_FILTERS, get_directory
+from .search import SEARCH_TARGETS, is_supported as search_supported
+from .roles import HasProjectRole, get_role, has_project_access, is_manager, scoped_projects
 
 # Create your views here.
 
+#Default and max page size of the user directory
+USERS_PAGE_SIZE = 100
+MAX_USERS_PAGE_SIZE = 1000
+
+#Max number of translation memory matches returned for a sentence
+MAX_SUGGESTIONS = 10
+
+#Default and max page size of the search results
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+
+#Default number of transliteration candidates, and the max length of the typed word
+TRANSLITERATIONS = 5
+MAX_TRANSLITERATION_PREFIX = 50
+
 #GET and POST REST API for path ""
 @api_view(['GET', 'POST'])
-@permission_classes([IsAuthenticated]) #Help us check is the user is authenticated, else returns 401 UNAUTHORIZED
+@permission_classes([IsAuthenticated, HasProjectRole]) #Help us check is the user is authenticated, else returns 401 UNAUTHORIZED
 def project_view(request):
     user = request.user
+    #Role is resolved once by HasProjectRole, users without a role get 403
+    role = get_role(user)
     if (request.method == 'GET'):
-        #If user is a super user, get all the object
-        if (user.is_superuser):
-            projects = Project.objects.all()
-        #If user is of group Manager, then get the objects created by the user
-        elif (user.groups.filter(name='Manager').exists()):
-            projects = Project.objects.filter(created_by = user.id)
-        #If user is of group Annotator, then get the objects that are assigned to the user
-        elif (user.groups.filter(name='Annotator').exists()):
-            projects = Project.objects.filter(assigned_to = user.id)
-        #Else return 403
+        #Serialized list is cached per user and role. X-Cache-Bypass header builds it from the DB and refreshes the cached one
+        bypass = request.headers.get('X-Cache-Bypass', '') not in ('', '0')
+        key, cached = project_list_cache.lookup(user.id, role, bypass)
+        if (cached is not None):
+            etag, data = cached
         else:
-            return Response({'error': 'Not enough permission'}, status = status.HTTP_403_FORBIDDEN)
-        serializer = ProjectSerializer(projects, many=True)
-        #return the projects with return code 200
-        return Response(serializer.data)
+            #super user gets all the projects, Manager gets the projects created by the user and Annotator gets the projects assigned to the user
+            projects = list(scoped_projects(user, role))
+            etag = projects_etag(projects)
+            data = ProjectSerializer(projects, many=True).data
+            project_list_cache.store(key, etag, data)
+        #Returns 304 when the client already has the same list
+        not_modified = check_conditions(request, etag)
+        if (not_modified is None):
+            #return the projects with return code 200
+            response = add_etag(Response(data), etag)
+        else:
+            response = not_modified
+        if (key is not None):
+            response['X-Cache'] = 'BYPASS' if bypass else ('HIT' if cached is not None else 'MISS')
+        return response
     elif (request.method == 'POST'):
         #Only add new project when the user is superuser or of group manager
-        if (user.is_superuser or user.groups.filter(name='Manager').exists()):
+        if (is_manager(role)):
             try:
                 #Set the created_by field before saving with current user
                 request.data["created_by"] = user.id
                 serializer = ProjectSerializer(data=request.data)
                 if (serializer.is_valid()):
-                    try:
-                        project = serializer.save()
-                        #After saving the project, add all sentences that project should have
-                        add_sentence_for_project(project)
-                    except Exception as e:
-                        #Delete the create project
-                        Project.delete(project)
-                        #Return with error message to show the cause of failure
-                        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-                    #Return the saved project and return with return code 201
-                    return Response(serializer.data, status = status.HTTP_201_CREATED)
+                    project = serializer.save(status = Project.Status.PENDING)
+                    #Sentences are added in the background. Client can poll the status url till the project is ready
+                    start_ingestion(project)
+                    status_url = request.build_absolute_uri(reverse(project_status_view, args=[project.project_id]))
+                    data = dict(serializer.data, status_url = status_url)
+                    #Return the saved project and return with return code 202
+                    return Response(data, status = status.HTTP_202_ACCEPTED, headers = {'Location': status_url})
                 #In case of invalid object, get Bad Request 400
                 return Response(serializer.errors, status = status.HTTP_400_BAD_REQUEST)
             except Exception as e:
@@ -61,81 +102,187 @@ def project_view(request):
             return Response({'error': 'Not enough permission'}, status = status.HTTP_403_FORBIDDEN)
 
 
+#POST REST API for path "batch/"
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, HasProjectRole])  #Help us check is the user is authenticated, else returns 401 UNAUTHORIZED
+def project_batch_view(request):
+    user = request.user
+    #Only add new projects when the user is superuser or of group manager
+    if (not is_manager(get_role(user))):
+        return Response({'error': 'Not enough permission'}, status = status.HTTP_403_FORBIDDEN)
+    serializer = ProjectBatchSerializer(data = request.data)
+    if (not serializer.is_valid()):
+        #In case of invalid object, get Bad Request 400
+        return Response(serializer.errors, status = status.HTTP_400_BAD_REQUEST)
+
+    #One project for each title and language. Titles differing only in case are the same project
+    items = {}
+    for article_title in serializer.validated_data['article_titles']:
+        for target_language in serializer.validated_data['target_languages']:
+            items.setdefault(make_project_id(article_title, target_language), (article_title, target_language))
+
+    try:
+        with transaction.atomic():
+            existing = set(Project.objects.filter(project_id__in = items.keys()).values_list('project_id', flat = True))
+            created_on = timezone.now()
+            projects = [
+                Project(project_id = project_id, article_title = article_title, target_language = target_language, created_on = created_on,
+                        created_by = user, assigned_to = serializer.validated_data.get('assigned_to'), status = Project.Status.PENDING)
+                for project_id, (article_title, target_language) in items.items() if project_id not in existing
+            ]
+            Project.objects.bulk_create(projects)
+            #bulk_create does not send post_save
+            project_list_cache.invalidate([user.id], [serializer.validated_data.get('assigned_to')])
+            #Each article is fetched and tokenized once for all its languages, in the background
+            start_batch_ingestion(projects)
+    except Exception as e:
+        #Return with error message to show the cause of failure
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    results = []
+    for project_id, (article_title, target_language) in items.items():
+        result = {'project_id': project_id, 'article_title': article_title, 'target_language': target_language}
+        if (project_id in existing):
+            result['status'] = 'exists'
+        else:
+            result['status'] = Project.Status.PENDING
+            result['status_url'] = request.build_absolute_uri(reverse(project_status_view, args=[project_id]))
+        results.append(result)
+    #Return the result of each project, with return code 202 when projects are created
+    return Response({'results': results}, status = status.HTTP_202_ACCEPTED if projects else status.HTTP_200_OK)
+
 #GET and PATCH REST API for path "project/<str:project_id>"
 @api_view(['GET', 'PATCH'])
-@permission_classes([IsAuthenticated])  #Help us check is the user is authenticated, else returns 401 UNAUTHORIZED
+@permission_classes([IsAuthenticated, HasProjectRole])  #Help us check is the user is authenticated, else returns 401 UNAUTHORIZED
 def single_project_view(request, project_id):
     user = request.user
+    role = get_role(user)
     try:
-        #If user is a super user, get the object
-        if (user.is_superuser):
-            project = Project.objects.get(project_id = project_id)
-        #If user is of group Manager, then get the objects only if it is created by the user
-        elif (user.groups.filter(name='Manager').exists()):
-            project = Project.objects.get(project_id = project_id, created_by = user.id)
-        #If user is of group Annotator, then get the objects only if it is assigned to the user
-        elif (user.groups.filter(name='Annotator').exists()):
-            project = Project.objects.get(project_id = project_id, assigned_to = user.id)
-        #Else return 403
-        else:
-            return Response({'error': 'Not enough permission'}, status = status.HTTP_403_FORBIDDEN)
+        #Get the project only if it is available for the user
+        project = project_resolver.get_project(scoped_projects(user, role), project_id)
     except Project.DoesNotExist as e:
         #Returns 404 as the Project is not present or it is not available for the user
         return Response({'error': str(e)},status = status.HTTP_404_NOT_FOUND)
     
     if (request.method == 'GET'):
+        #Returns 304 when the client already has the same project
+        etag = project_etag(project)
+        not_modified = check_conditions(request, etag)
+        if (not_modified is not None):
+            return not_modified
         serializer = ProjectSerializer(project)
         #return the project with return code 200
-        return Response(serializer.data)
+        return add_etag(Response(serializer.data), etag)
     if (request.method == 'PATCH'):
-        if ((not user.is_superuser) and (not user.groups.filter(name='Manager').exists())):
+        if (not is_manager(role)):
             #If user is of group Annotator, user cannot update the project
             return Response({'error': 'Not enough permission'}, status = status.HTTP_403_FORBIDDEN)
+        #Returns 412 when If-Match is given and the project was changed since the client got it
+        precondition_failed = check_conditions(request, project_etag(project))
+        if (precondition_failed is not None):
+            return precondition_failed
         try:
+            #post_save only knows the new assignee, the list of the previous one changes too
+            assigned_to = project.assigned_to
             serializer = ProjectSerializer(project, data = request.data, partial=True)
             if (serializer.is_valid()):
                 serializer.save()
+                if (assigned_to != serializer.instance.assigned_to):
+                    project_list_cache.invalidate(assigned_to_ids = [assigned_to])
                 #Returns the update project with return code 200
-                return Response(serializer.data)
+                return add_etag(Response(serializer.data), project_etag(serializer.instance))
             #In case of invalid object, get Bad Request 400
             return Response(serializer.data, status = status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             #Return with error message to show the cause of failure with return code 500
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
-#GET and POST REST API for path "<str:project_id>/sentence"
-@api_view(['GET', 'POST'])
-@permission_classes([IsAuthenticated])  #Help us check is the user is authenticated, else returns 401 UNAUTHORIZED
+#GET REST API for path "project/<str:project_id>/status"
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, HasProjectRole])  #Help us check is the user is authenticated, else returns 401 UNAUTHORIZED
+def project_status_view(request, project_id):
+    user = request.user
+    role = get_role(user)
+    try:
+        #Get the project only if it is available for the user
+        project = project_resolver.get_project(scoped_projects(user, role).only('project_id', 'status', 'status_message'), project_id)
+    except Project.DoesNotExist as e:
+        #Returns 404 as the Project is not present or it is not available for the user
+        return Response({'error': str(e)},status = status.HTTP_404_NOT_FOUND)
+
+    #return the ingestion status with return code 200
+    return Response({'project_id': project.project_id, 'status': project.status, 'error': project.status_message})
+
+def filter_sentences(sentences, query_params):
+    #Applies the optional query params of the sentence list. Returns the sentences, the requested fields and an error message
+
+    #Optional fields param, to get only the needed columns. Ex: fields=sentence_id,translated_sentence
+    fields = None
+    if (query_params.get('fields')):
+        fields = query_params['fields'].split(',')
+        invalid_fields = set(fields) - set(field.name for field in Sentence._meta.fields)
+        if (invalid_fields):
+            return sentences, fields, f'Invalid fields: {", ".join(sorted(invalid_fields))}'
+        sentences = sentences.only(*fields)
+
+    #Optional changed_since param, to get only the sentences changed after the given time
+    if (query_params.get('changed_since')):
+        try:
+            changed_since = parse_datetime(query_params['changed_since'])
+        except ValueError:
+            #Well formatted, but not a valid date time
+            changed_since = None
+        if (changed_since is None):
+            return sentences, fields, 'changed_since should be an ISO 8601 date time'
+        if (timezone.is_naive(changed_since)):
+            changed_since = timezone.make_aware(changed_since)
+        sentences = sentences.filter(updated_on__gt = changed_since)
+    return sentences, fields, None
+
+#GET, POST and PATCH REST API for path "<str:project_id>/sentence"
+@api_view(['GET', 'POST', 'PATCH'])
+@permission_classes([IsAuthenticated, HasProjectRole])  #Help us check is the user is authenticated, else returns 401 UNAUTHORIZED
 def sentences_view(request, project_id):
     user = request.user
+    role = get_role(user)
     try:
-        #If user is a super user, get the object
-        if (user.is_superuser):
-            project = Project.objects.get(project_id = project_id)
-        #If user is of group Manager, then get the objects only if it is created by the user
-        elif (user.groups.filter(name='Manager').exists()):
-            project = Project.objects.get(project_id = project_id, created_by = user.id)
-        #If user is of group Annotator, then get the objects only if it is assigned to the user
-        elif (user.groups.filter(name='Annotator').exists()):
-            project = Project.objects.get(project_id = project_id, assigned_to = user.id)
-        #Else return 403
-        else:
-            return Response({'error': 'Not enough permission'}, status = status.HTTP_403_FORBIDDEN)
+        #Get the project only if it is available for the user. The ETag of its sentences is computed from its counters
+        project = project_resolver.get_project(scoped_projects(user, role), project_id)
     except Project.DoesNotExist as e:
         #Returns 404 as the Project is not present or it is not available for the user
         return Response({'error': str(e)},status = status.HTTP_404_NOT_FOUND)
     
     if (request.method == 'GET'):
+        #Returns 304 when the client already has the same sentences
+        etag = sentences_etag(project, request.query_params)
+        not_modified = check_conditions(request, etag)
+        if (not_modified is not None):
+            return not_modified
+
         #Get the sentence. Here we are not checking for authorization as we have already done it on Project
-        sentences = Sentence.objects.filter(project=project)
-        serializer = SentenceSerializer(sentences, many=True)
+        sentences, fields, error = filter_sentences(Sentence.objects.filter(project=project).order_by('sentence_id'), request.query_params)
+        if (error):
+            return Response({'error': error}, status = status.HTTP_400_BAD_REQUEST)
+
+        #Pagination is used only when cursor or limit is given, otherwise all the sentences are returned
+        if ('cursor' in request.query_params or 'limit' in request.query_params):
+            paginator = SentenceCursorPagination()
+            page = paginator.paginate_queryset(sentences, request)
+            serializer = SentenceSerializer(page, many=True, fields=fields)
+            #return the page of sentences and the link for the next page with return code 200
+            return add_etag(paginator.get_paginated_response(serializer.data), etag)
+
+        serializer = SentenceSerializer(sentences, many=True, fields=fields)
         #return the sentences with return code 200
-        return Response(serializer.data)
+        return add_etag(Response(serializer.data), etag)
     elif (request.method == 'POST'):
         try:
             serializer = SentenceSerializer(data = request.data)
             if (serializer.is_valid()):
-                serializer.save()
+                with transaction.atomic():
+                    sentence = serializer.save()
+                    record_progress(sentence.project, sentences = 1, translated = int(is_translated(sentence.translated_sentence)), activity = sentence.updated_on)
+                    publish_sentences(sentence.project_id, [sentence])
                 #Return the saved sentence and return with return code 201
                 return Response(serializer.data, status = status.HTTP_201_CREATED)
             #In case of invalid object, get Bad Request 400
@@ -143,56 +290,191 @@ def sentences_view(request, project_id):
         except Exception as e:
                 #Return with error message to show the cause of failure with return code 500
                 return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    elif (request.method == 'PATCH'):
+        #Returns 412 when If-Match is given and a sentence of the project was changed since the client got them
+        precondition_failed = check_sentences_version(request, project)
+        if (precondition_failed is not None):
+            return precondition_failed
+        #Permission is already checked on Project, so the whole batch is saved against it
+        response = bulk_update_sentences(project, request.data)
+        return add_etag(response, sentences_etag(project)) if response.status_code == status.HTTP_200_OK else response
     
 
+#POST REST API for path "<str:project_id>/sentence/events/ticket"
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, HasProjectRole])  #Help us check is the user is authenticated, else returns 401 UNAUTHORIZED
+def sentence_events_ticket_view(request, project_id):
+    try:
+        #Same permission checks as GET /wiki/<str:project_id>/sentence
+        project = project_resolver.get_project(scoped_projects(request.user).only('id', 'project_id'), project_id)
+    except Project.DoesNotExist as e:
+        return Response({'error': str(e)}, status = status.HTTP_404_NOT_FOUND)
+    #return the ticket of the event stream of the project with return code 201
+    return Response({'ticket': issue_ticket(project.pk, request.user.id), 'expires_in': change_feed_option('TICKET_SECONDS', 30)}, status = status.HTTP_201_CREATED)
+
+#GET REST API for path "<str:project_id>/sentence/suggestions"
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, HasProjectRole])  #Help us check is the user is authenticated, else returns 401 UNAUTHORIZED
+def sentence_suggestions_view(request, project_id):
+    try:
+        #Get the project only if it is available for the user
+        project = project_resolver.get_project(scoped_projects(request.user), project_id)
+    except Project.DoesNotExist as e:
+        #Returns 404 as the Project is not present or it is not available for the user
+        return Response({'error': str(e)},status = status.HTTP_404_NOT_FOUND)
+    try:
+        k = min(int(request.query_params.get('k', 3)), MAX_SUGGESTIONS)
+        limit = min(int(request.query_params.get('limit', 100)), 1000)
+        sentence_ids = [int(sentence_id) for sentence_id in request.query_params.get('ids', '').split(',') if sentence_id]
+    except ValueError:
+        return Response({'error': 'k, limit and ids should be numbers'}, status = status.HTTP_400_BAD_REQUEST)
+    if (k < 1 or limit < 1):
+        return Response({'error': 'k and limit should be positive'}, status = status.HTTP_400_BAD_REQUEST)
+
+    #Suggestions for the given sentences, otherwise for the sentences which are not translated yet
+    sentences = Sentence.objects.filter(project = project).order_by('sentence_id').only('sentence_id', 'original_sentence')
+    if (sentence_ids):
+        sentences = sentences.filter(sentence_id__in = sentence_ids)
+    else:
+        sentences = sentences.filter(Q(translated_sentence__isnull = True) | Q(translated_sentence = ''))
+    sentences = list(sentences[:limit])
+    #Matches of all the sentences are looked up together, a sentence is not a match of itself
+    matches = translation_memory.search_many([(sentence.original_sentence, [sentence.sentence_id]) for sentence in sentences], project.target_language, k = k)
+    suggestions = {sentence.sentence_id: sentence_matches for sentence, sentence_matches in zip(sentences, matches)}
+    #return the matches of each sentence with return code 200
+    return Response(suggestions)
+
 #GET and PATCH REST API for path "sentence/<int:sentence_id>"
 @api_view(['GET', 'PATCH'])
-@permission_classes([IsAuthenticated])  #Help us check is the user is authenticated, else returns 401 UNAUTHORIZED
+@permission_classes([IsAuthenticated, HasProjectRole])  #Help us check is the user is authenticated, else returns 401 UNAUTHORIZED
 def single_sentence_view(request, sentence_id):
     
     try:
-        #Get the sentence with sentence id
-        sentence = Sentence.objects.get(sentence_id = sentence_id)
+        #Get the sentence with sentence id, along with its project for the permission check
+        sentence = Sentence.objects.select_related('project').get(sentence_id = sentence_id)
     except Sentence.DoesNotExist as e:
         #Returns 404 as the Sentence is not present
         return Response({'error': str(e)}, status = status.HTTP_404_NOT_FOUND)
     
-    user = request.user
-    project_id = sentence.project
-    try:
-        #If user is a super user, get the object
-        if (user.is_superuser):
-            project = Project.objects.get(project_id = project_id)
-        #If user is of group Manager, then get the objects only if it is created by the user
-        elif (user.groups.filter(name='Manager').exists()):
-            project = Project.objects.get(project_id = project_id, created_by = user.id)
-        #If user is of group Annotator, then get the objects only if it is assigned to the user
-        elif (user.groups.filter(name='Annotator').exists()):
-            project = Project.objects.get(project_id = project_id, assigned_to = user.id)
-        #Else return 403
-        else:
-            return Response({'error': 'Not enough permission'}, status = status.HTTP_403_FORBIDDEN)
-    except Project.DoesNotExist:
+    if (not has_project_access(request.user, sentence.project)):
         #Returns 403 as the Project is not available for the user
         return Response({'error': 'Not enough permission'}, status = status.HTTP_403_FORBIDDEN)
     
     if (request.method == 'GET'):
+        #Returns 304 when the client already has the same sentence
+        etag = sentence_etag(sentence)
+        not_modified = check_conditions(request, etag)
+        if (not_modified is not None):
+            return not_modified
         serializer = SentenceSerializer(sentence)
         #return the sentence with return code 200
-        return Response(serializer.data)
+        return add_etag(Response(serializer.data), etag)
     if (request.method == 'PATCH'):
+        #Returns 412 when If-Match is given and the sentence was changed since the client got it
+        precondition_failed = check_conditions(request, sentence_etag(sentence))
+        if (precondition_failed is not None):
+            return precondition_failed
         try:
+            previous = sentence.translated_sentence
+            previous_project = sentence.project
             serializer = SentenceSerializer(sentence, data = request.data, partial=True)
             if (serializer.is_valid()):
-                serializer.save()
+                with transaction.atomic():
+                    #Translation is now done by the annotator, and not the prefilled one
+                    serializer.save(prefilled = sentence.prefilled and 'translated_sentence' not in request.data)
+                    record_sentence_change(previous_project, previous, serializer.instance)
+                    publish_sentence_change(previous_project.pk, serializer.instance)
+                #Words of the new translation are suggested by the transliteration, the replaced ones are counted out.
+                #A sentence moved to a project of another language is counted out of the language it had before the save
+                language = serializer.instance.project.target_language
+                if (language == previous_project.target_language):
+                    transliterator.update(language, [previous or ''], [serializer.instance.translated_sentence or ''])
+                else:
+                    transliterator.update(previous_project.target_language, [previous or ''], [])
+                    transliterator.update(language, [], [serializer.instance.translated_sentence or ''])
                 #Return the saved sentence and return with return code 200
-                return Response(serializer.data)
+                return add_etag(Response(serializer.data), sentence_etag(serializer.instance))
             #In case of invalid object, get Bad Request 400
             return Response(serializer.data, status = status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             #Return with error message to show the cause of failure with return code 500
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+#GET REST API for path "export/"
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, HasProjectRole])  #Help us check is the user is authenticated, else returns 401 UNAUTHORIZED
+def export_view(request):
+    export_type = request.query_params.get('type', 'tsv')
+    if (export_type not in EXPORT_TYPES):
+        return Response({'error': f'type should be one of {", ".join(EXPORT_TYPES)}'}, status = status.HTTP_400_BAD_REQUEST)
+
+    #Only the projects available for the user are exported. They can be narrowed by project ids and target language
+    projects = scoped_projects(request.user)
+    project_ids = [project_id for value in request.query_params.getlist('project') for project_id in value.split(',') if project_id]
+    if (project_ids):
+        projects = projects.filter(project_id__in = project_ids)
+    if (request.query_params.get('language')):
+        projects = projects.filter(target_language = request.query_params['language'])
+
+    formatter, content_type, extension = EXPORT_TYPES[export_type]
+    rows = export_rows(projects.values('id'), include_untranslated = request.query_params.get('include_untranslated') == '1')
+    #Rows are streamed from a DB iterator, so the memory used does not depend on the size of the corpus
+    response = StreamingHttpResponse(formatter(rows), content_type = content_type)
+    response['Content-Disposition'] = f'attachment; filename="translations.{extension}"'
+    return response
+
+#GET REST API for path "search/"
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, HasProjectRole])  #Help us check is the user is authenticated, else returns 401 UNAUTHORIZED
+def search_view(request):
+    text = request.query_params.get('q', '').strip()
+    target = request.query_params.get('in', 'sentences')
+    if (not text):
+        return Response({'error': 'q is required'}, status = status.HTTP_400_BAD_REQUEST)
+    if (target not in SEARCH_TARGETS):
+        return Response({'error': f'in should be one of {", ".join(SEARCH_TARGETS)}'}, status = status.HTTP_400_BAD_REQUEST)
+    try:
+        page = int(request.query_params.get('page', 1))
+        page_size = min(int(request.query_params.get('page_size', SEARCH_PAGE_SIZE)), MAX_SEARCH_PAGE_SIZE)
+    except ValueError:
+        return Response({'error': 'page and page_size should be numbers'}, status = status.HTTP_400_BAD_REQUEST)
+    if (page < 1 or page_size < 1):
+        return Response({'error': 'page and page_size should be positive'}, status = status.HTTP_400_BAD_REQUEST)
+    if (not search_supported()):
+        return Response({'error': 'Search is not supported on this database'}, status = status.HTTP_501_NOT_IMPLEMENTED)
+
+    #Only the projects available for the user are searched. They can be narrowed by project ids and target language
+    projects = scoped_projects(request.user)
+    project_ids = [project_id for value in request.query_params.getlist('project') for project_id in value.split(',') if project_id]
+    if (project_ids):
+        projects = projects.filter(project_id__in = project_ids)
+    if (request.query_params.get('language')):
+        projects = projects.filter(target_language = request.query_params['language'])
+
+    count, results = SEARCH_TARGETS[target](text, projects, page, page_size)
+    #return the page of matches, best match first, with return code 200
+    return Response({'count': count, 'page': page, 'page_size': page_size, 'results': results})
+
+#GET REST API for path "transliterate/"
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, HasProjectRole])  #Help us check is the user is authenticated, else returns 401 UNAUTHORIZED
+def transliteration_view(request):
+    prefix = request.query_params.get('prefix', '').strip()
+    language = request.query_params.get('lang', '')
+    if (not prefix or len(prefix) > MAX_TRANSLITERATION_PREFIX or not prefix.isascii() or not prefix.isalpha()):
+        return Response({'error': f'prefix is required, and should be up to {MAX_TRANSLITERATION_PREFIX} Latin letters'}, status = status.HTTP_400_BAD_REQUEST)
+    try:
+        validate_target_language(language)
+        k = min(int(request.query_params.get('k', TRANSLITERATIONS)), MAX_TRANSLITERATIONS)
+    except ValidationError as e:
+        return Response({'error': e.messages[0]}, status = status.HTTP_400_BAD_REQUEST)
+    except ValueError:
+        return Response({'error': 'k should be a number'}, status = status.HTTP_400_BAD_REQUEST)
+    if (k < 1):
+        return Response({'error': 'k should be positive'}, status = status.HTTP_400_BAD_REQUEST)
+    #return the candidates, best first, with return code 200
+    return Response({'prefix': prefix, 'lang': language, 'candidates': transliterator.suggest(prefix, language, k)})
+
 #POST REST API for path "login/"
 @api_view(['POST'])
 def login_api(request):
@@ -204,7 +486,8 @@ def login_api(request):
     user = authenticate(request, username=username, password=password)
     #If user is valid, generates the access token and returns with return code 200
     if user is not None:
-        refresh = RefreshToken.for_user(user)
+        #Role is added to the tokens, so the following requests are authenticated without loading the user
+        refresh = token_for_user(user)
         data = {
             'refresh': str(refresh),
             'access': str(refresh.access_token),
@@ -235,33 +518,107 @@ def token_refresh_api(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])  #Help us check is the user is authenticated, else returns 401 UNAUTHORIZED
 def getUsers(request):
+    role = request.query_params.get('role')
+    if (role is not None and role not in ROLE_FILTERS):
+        return Response({'error': f'role should be one of {", ".join(ROLE_FILTERS)}'}, status = status.HTTP_400_BAD_REQUEST)
+    try:
+        page = int(request.query_params.get('page', 0))
+        page_size = min(int(request.query_params.get('page_size', USERS_PAGE_SIZE)), MAX_USERS_PAGE_SIZE)
+    except ValueError:
+        return Response({'error': 'page and page_size should be numbers'}, status = status.HTTP_400_BAD_REQUEST)
+    if (page < 0 or page_size < 1):
+        return Response({'error': 'page should not be negative and page_size should be positive'}, status = status.HTTP_400_BAD_REQUEST)
 
-    #Get all the user from DB
-    users = User.objects.all()
+    #Get all the user from the cached directory, which is rebuilt only when a user or group changes
+    directory, state = get_directory()
+
+    #Response depends on the directory, the current user and the query params
+    etag = quote_etag(hashlib.md5(f'{state["version"]}:{request.user.id}:{request.GET.urlencode()}'.encode()).hexdigest())
+    not_modified = get_conditional_response(request, etag = etag, last_modified = state['modified'] and int(state['modified'].timestamp()))
+    if (not_modified is not None):
+        return not_modified
+
+    if (role is not None):
+        directory = [entry for entry in directory if entry[2] == ROLE_FILTERS[role]]
+    count = len(directory)
+    #Paging is used only when the page is given, otherwise all the users are returned
+    if (page > 0):
+        directory = directory[(page - 1) * page_size : page * page_size]
 
-    all_user_data = {}
-    for user in users:
-        all_user_data[user.id] = {
-            "name": user.username,
-            #isAdminOrManager is need to disable the button in the frontend(react)
-            "isAdminOrManager": 1 if user.is_superuser or user.groups.filter(name='Manager').exists() else (0 if user.groups.filter(name='Annotator').exists() else 2)
-        }
-    
     user_data = {
         'current_user' : request.user.id, #Set the current user id
-        'users' : all_user_data
+        #isAdminOrManager is need to disable the button in the frontend(react)
+        'users' : {user_id: {'name': name, 'isAdminOrManager': is_admin_or_manager} for user_id, name, is_admin_or_manager in directory}
     }
+    if (page > 0):
+        user_data['count'] = count
+        user_data['page'] = page
+    response = Response(user_data)
+    response['ETag'] = etag
+    if (state['modified'] is not None):
+        response['Last-Modified'] = http_date(state['modified'].timestamp())
+    #Browser has to revalidate with the ETag before using its copy
+    response['Cache-Control'] = 'private, no-cache'
     #Return the user data with return code 200
-    return Response(user_data)
-    
-    
+    return response
 
-def add_sentence_for_project(project : Project):
-    summary_list = getSummaryForTitles(project.article_title)
-    for summary in summary_list:
-        if (len(summary.strip()) > 0):
-            sentence = Sentence(project = project, original_sentence = summary.strip(), translated_sentence = '')
-            try:
-                sentence.save()
-            except IntegrityError as e:
-                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+def bulk_update_sentences(project : Project, items):
+    #Consumes a list of {sentence_id, translated_sentence}
+    if (not isinstance(items, list)):
+        return Response({'error': 'Expected a list of sentences'}, status = status.HTTP_400_BAD_REQUEST)
+
+    failed = []
+    translations = {}
+    for item in items:
+        serializer = SentenceBulkUpdateSerializer(data = item)
+        if (serializer.is_valid()):
+            #If the same sentence is sent twice, the last translation wins
+            translations[serializer.validated_data['sentence_id']] = serializer.validated_data['translated_sentence']
+        else:
+            failed.append({'sentence_id': item.get('sentence_id') if isinstance(item, dict) else None, 'error': serializer.errors})
+
+    try:
+        with transaction.atomic():
+            #Get all the sentences in one query. Sentences of other projects are not returned
+            sentences = list(Sentence.objects.filter(project = project, sentence_id__in = translations.keys()))
+            previous = [sentence.translated_sentence or '' for sentence in sentences]
+            #bulk_update does not set auto_now fields, so updated_on is set here
+            updated_on = timezone.now()
+            for sentence in sentences:
+                sentence.translated_sentence = translations.pop(sentence.sentence_id)
+                sentence.updated_on = updated_on
+                #Translation is now done by the annotator
+                sentence.prefilled = False
+            Sentence.objects.bulk_update(sentences, ['translated_sentence', 'updated_on', 'prefilled'])
+            #bulk_update does not send post_save, so the segment store and the progress of the project are updated here
+            segments.record(sentences, project.target_language)
+            if (sentences):
+                translated = sum(is_translated(sentence.translated_sentence) for sentence in sentences) - sum(is_translated(text) for text in previous)
+                record_progress(project, translated = translated, activity = updated_on)
+                publish_sentences(project.pk, sentences)
+            if (sentences):
+                #Saved sentences are now the latest changed ones, so the ETag of the sentences is known without a query
+                project.last_activity = updated_on
+    except Exception as e:
+        #Return with error message to show the cause of failure with return code 500
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    #bulk_update does not send post_save, so the transliteration index is updated here. The translation memory reads the translations from the sentences
+    transliterator.update(project.target_language, previous, [sentence.translated_sentence or '' for sentence in sentences])
+
+    #Whatever is left was not found in the project
+    for sentence_id in translations:
+        failed.append({'sentence_id': sentence_id, 'error': 'Sentence not found in project'})
+
+    data = {
+        'updated': [sentence.sentence_id for sentence in sentences],
+        'failed': failed
+    }
+    if (len(failed) == 0):
+        return Response(data)
+    #Nothing is saved, get Bad Request 400
+    if (len(sentences) == 0):
+        return Response(data, status = status.HTTP_400_BAD_REQUEST)
+    #Some of the sentences are saved, get Multi Status 207
+    return Response(data, status = status.HTTP_207_MULTI_STATUS)
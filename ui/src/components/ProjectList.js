@@ -14,7 +14,8 @@ import { Link } from "react-router-dom";
 
 export const ProjectList = (props) => {
 
-    //stores projects in an array. Each project contains project_id, created_on, article_title, target_language, assigned_to, created_by
+    //stores projects in an array. Each project contains project_id, created_on, article_title, target_language, assigned_to, created_by, status, status_message,
+    //sentence_count, translated_count and last_activity
     const [projects, setProjects] = useState([]);
     //stores title. Used while creating new project
     const [title, setTitle] = useState("");
@@ -189,7 +190,7 @@ export const ProjectList = (props) => {
         {/* Shows error message if the model is not open */}
         {!open && <p>{errorMessage}</p>}
 
-        {/* If there are project, it is shown in table with 3 columns: Project ID, Created By, Assigned To
+        {/* If there are project, it is shown in table with 5 columns: Project ID, Status, Progress, Created By, Assigned To
         else No project available is shown */}
 
         {projects.length == 0 ? <p>No projects available</p> : 
@@ -199,6 +200,8 @@ export const ProjectList = (props) => {
                         <TableRow>
                             {/* Table Topics */}
                             <TableCell>Project ID</TableCell>
+                            <TableCell align="right">Status</TableCell>
+                            <TableCell align="right">Progress</TableCell>
                             <TableCell align="right">Created By</TableCell>
                             <TableCell align="right">Assigned To</TableCell>
                         </TableRow>
@@ -213,6 +216,9 @@ export const ProjectList = (props) => {
                                 <TableCell component="th" scope="row">
                                     <Link to={"/project/" + project['project_id']}>{project['project_id']}</Link>
                                 </TableCell>
+                                <TableCell align="right">{project['status']}</TableCell>
+                                {/* Counters come with the project, so the sentences are not fetched for the progress */}
+                                <TableCell align="right">{project['translated_count']} / {project['sentence_count']}</TableCell>
                                 <TableCell align="right"> {users[project['created_by']] && users[project['created_by']]['name']} </TableCell>
                                 <TableCell align="right">
                                     <NativeSelect
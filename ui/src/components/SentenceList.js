@@ -1,9 +1,9 @@
-import React, {useState, useEffect} from "react";
+import React, {useState, useEffect, useRef} from "react";
 import { Link } from "react-router-dom";
-import { ReactTransliterate } from "react-transliterate";
 import { useParams } from "react-router-dom";
 import ArrowBackIcon from '@mui/icons-material/ArrowBack';
 import Button from '@mui/material/Button';
+import { TransliterationInput } from "./TransliterationInput";
 
 
 export const SentenceList = (props) => {
@@ -12,23 +12,25 @@ export const SentenceList = (props) => {
     const projectId = useParams()['projectId'];
     //Stores the list of sentence object, where each object has the following field: sentence_id, project, original_sentence, translated_sentence, created_on
     const [sentences, setSentences] = useState([]);
-    //Array used for storing the index of sentences which has changed translated_sentences
-    const [changedSentences, setChangedSentences] = useState([]);
     //State use for re rendering during the change of sentence
     const [translated, setTranslated] = useState(-1);
     // Stores error message
     const [errorMessage, setErrorMessage] = useState("");
+    //Translations changed here and not saved yet, by sentence id. Live updates and reloads do not overwrite them
+    const editedTexts = useRef(new Map());
+    //Incremented on every load of the sentences. Pages of an older load are dropped, so two loads never append the same sentences
+    const loadGeneration = useRef(0);
 
-    //Reset changedSentence and translated states
+    //Reset translated state, once all the changes are saved
     const resetState = () => {
-        setChangedSentences([]);
         setTranslated(-1);
+        editedTexts.current.clear();
     }
     
 
-    useEffect(() => {
-        //AJAX call for getting the sentences for a project
-        fetch("http://localhost:8000/wiki/" + projectId + "/sentence", {
+    //AJAX call for getting one page of the sentences for a project
+    const loadPage = (url, generation) => {
+        fetch(url, {
             method: "GET",
             headers: {
                 "Authorization": `Bearer ${localStorage.getItem("wiki-trans-token")}`
@@ -40,28 +42,44 @@ export const SentenceList = (props) => {
             }
             return response.json()
         }).then(data => {
+            if (generation !== loadGeneration.current) {
+                //The sentences are being loaded again
+                return;
+            }
             if (data['error']) {
                 //Incase we get a error response, we throw it here and store in errorMessage state
                 throw Error(data['error']);
             }
-            //Otherwise change the state sentence
-            setSentences(data);
+            //Otherwise add the page to the sentence state, with the unsaved changes, and load the next page if there is one
+            const page = data['results'].map(sentence => editedTexts.current.has(sentence['sentence_id'])
+                ? {...sentence, translated_sentence: editedTexts.current.get(sentence['sentence_id'])} : sentence);
+            setSentences(previous => previous.concat(page));
+            if (data['next']) {
+                loadPage(data['next'], generation);
+            }
         }).catch((error) => setErrorMessage(error.message))
-    }, []);
+    }
 
-    //Function for patching the sentences
-    const saveChanges = () => {
-        //Iterate through changed sentence index
-        changedSentences.forEach((id) => {
-            fetch("http://localhost:8000/wiki/sentence/" + sentences[id]['sentence_id'], {
-                method: "PATCH",
+    //Gets all the sentences of the project again
+    const loadSentences = () => {
+        loadGeneration.current += 1;
+        setSentences([]);
+        loadPage("http://localhost:8000/wiki/" + projectId + "/sentence?limit=200", loadGeneration.current);
+    }
+
+    useEffect(() => {
+        //Live updates of the sentences saved by the other users. EventSource can not send headers, so a short-lived ticket for this project
+        //is asked for with the token, and sent in the url. The access token itself is never put in the url.
+        //The sentences are loaded once the stream is open, and again when it opens after a lost connection, so no change is missed
+        let events = null;
+        let stopped = false;
+
+        const connect = () => {
+            fetch("http://localhost:8000/wiki/" + projectId + "/sentence/events/ticket", {
+                method: "POST",
                 headers: {
-                    "Content-Type": "application/json",
                     "Authorization": `Bearer ${localStorage.getItem("wiki-trans-token")}`
-                },
-                body: JSON.stringify({
-                    translated_sentence: sentences[id]['translated_sentence'],
-                })
+                }
             }).then(response => {
                 if (response.status == 401) {
                     //If the user is not authenticated, it routes to login page.
@@ -70,20 +88,116 @@ export const SentenceList = (props) => {
                 return response.json()
             }).then(data => {
                 if (data['error']) {
-                    //Incase we get a error response, we throw it here and store in errorMessage state
                     throw Error(data['error']);
                 }
-                console.log(`Sentence with id ${sentences[id]['sentence_id']} updated..`)
-            }).catch((error) => setErrorMessage(error.message))
-        });
-        resetState();
+                if (!stopped) {
+                    listen(data['ticket']);
+                }
+            }).catch((error) => {
+                //Stream is not available. The sentences are loaded once, without live updates
+                console.log(error.message);
+                loadSentences();
+            });
+        }
+
+        const listen = (ticket) => {
+            let opened = false;
+            events = new EventSource("http://localhost:8000/wiki/" + projectId + "/sentence/events?ticket=" + encodeURIComponent(ticket));
+            events.onopen = () => {
+                opened = true;
+                loadSentences();
+            };
+            events.addEventListener("sentences", (event) => {
+                //Deltas of the saved sentences: sentence_id, translated_sentence and version
+                const deltas = Object.fromEntries(JSON.parse(event.data).map(delta => [delta['sentence_id'], delta]));
+                setSentences(previous => previous.map(sentence => {
+                    const delta = deltas[sentence['sentence_id']];
+                    if (!delta || editedTexts.current.has(sentence['sentence_id'])) {
+                        return sentence;
+                    }
+                    return {...sentence, translated_sentence: delta['translated_sentence']};
+                }));
+            });
+            events.addEventListener("removed", (event) => {
+                //Sentences moved to another project
+                const removed = JSON.parse(event.data);
+                removed.forEach(id => editedTexts.current.delete(id));
+                setSentences(previous => previous.filter(sentence => !removed.includes(sentence['sentence_id'])));
+            });
+            //Sent when this page missed changes
+            events.addEventListener("reset", () => loadSentences());
+            events.onerror = () => {
+                if (events.readyState !== EventSource.CLOSED) {
+                    //Browser reconnects by itself
+                    return;
+                }
+                if (opened) {
+                    //Reconnection was refused, as the ticket expired. A new ticket is asked for
+                    connect();
+                } else {
+                    //Stream was refused. The sentences are loaded once, without live updates
+                    loadSentences();
+                }
+            };
+        }
+
+        connect();
+        return () => {
+            stopped = true;
+            if (events) {
+                events.close();
+            }
+        };
+    }, []);
+
+    //Function for patching the sentences
+    const saveChanges = () => {
+        //All the changed sentences are sent in a single AJAX call, with the last text of each
+        const changes = [...editedTexts.current].map(([id, text]) => ({
+            sentence_id: id,
+            translated_sentence: text,
+        }));
+        fetch("http://localhost:8000/wiki/" + projectId + "/sentence", {
+            method: "PATCH",
+            headers: {
+                "Content-Type": "application/json",
+                "Authorization": `Bearer ${localStorage.getItem("wiki-trans-token")}`
+            },
+            body: JSON.stringify(changes)
+        }).then(response => {
+            if (response.status == 401) {
+                //If the user is not authenticated, it routes to login page.
+                window.location.href = '/login';
+            }
+            return response.json()
+        }).then(data => {
+            if (data['error']) {
+                //Incase we get a error response, we throw it here and store in errorMessage state
+                throw Error(data['error']);
+            }
+            //Saved sentences are not kept as changed, unless they were changed again during the save. The failed ones are sent again with the next save
+            const sent = new Map(changes.map(change => [change['sentence_id'], change['translated_sentence']]));
+            (data['updated'] || []).forEach(id => {
+                if (editedTexts.current.get(id) === sent.get(id)) {
+                    editedTexts.current.delete(id);
+                }
+            });
+            if (editedTexts.current.size === 0) {
+                resetState();
+            }
+            if (data['failed'] && data['failed'].length > 0) {
+                //Some of the sentences are not saved
+                throw Error(`${data['failed'].length} sentence(s) could not be saved`);
+            }
+            console.log(`${data['updated'].length} sentences updated..`)
+        }).catch((error) => setErrorMessage(error.message))
     }
 
     //Function that handles when the user changes the translated sentences
     const handleChange = (text, index) => {
         setTranslated(Math.abs(1 - translated)); 
         sentences[index]['translated_sentence'] = text;
-        changedSentences.push(index);
+        editedTexts.current.set(sentences[index]['sentence_id'], text);
     };
 
     //Handle sign out and redirect to login page
@@ -118,13 +232,12 @@ export const SentenceList = (props) => {
                         </div>
                         <div className="rightPane">
                             {/* Right side: Translated sentences */}
-                            {/* ReactTransliterate is used for transliterating the sentence */}
-                            <ReactTransliterate
-                                renderComponent={(props) => <textarea {...props} />}
+                            {/* TransliterationInput suggests words of the target language from GET /wiki/transliterate/ */}
+                            <TransliterationInput
                                 value={sentence['translated_sentence']}
                                 onChangeText={text => handleChange(text, index)}
                                 lang={projectId.substring(0, 2)}
-                                containerStyles={{color: "black"}}
+                                style={{color: "black"}}
                             />
                         </div>
                     </div>
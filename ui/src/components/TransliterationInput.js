@@ -0,0 +1,135 @@
+import React, {useState, useEffect, useRef} from "react";
+
+//Suggestions already received, by language and typed word, so the same word is not requested again
+const suggestionCache = new Map();
+
+//Latin letters typed right before the caret, which are transliterated
+const WORD_BEFORE_CARET = /[A-Za-z]+$/;
+
+//Max length of the typed word accepted by GET /wiki/transliterate/
+const MAX_PREFIX = 50;
+
+//Time to wait after a key press before asking for suggestions, so quick key presses make a single request
+const SUGGEST_DELAY = 150;
+
+//Textarea which shows a drop down of the words of the target language for the latin word being typed.
+//Suggestions come from GET /wiki/transliterate/ of the service, so no external transliteration service is called
+export const TransliterationInput = ({value, onChangeText, lang, style}) => {
+
+    //Candidates for the word being typed, best first, and the index of the highlighted one
+    const [candidates, setCandidates] = useState([]);
+    const [active, setActive] = useState(0);
+    //Start and end of the typed word the candidates replace
+    const word = useRef(null);
+    const timer = useRef(null);
+    //Incremented on every change of the text. Suggestions for an older word are dropped
+    const generation = useRef(0);
+    const textarea = useRef(null);
+
+    useEffect(() => () => clearTimeout(timer.current), []);
+
+    //Hides the drop down and drops the pending suggestions
+    const close = () => {
+        generation.current += 1;
+        clearTimeout(timer.current);
+        word.current = null;
+        setCandidates([]);
+    }
+
+    //AJAX call for getting the candidates of a typed word
+    const fetchSuggestions = (prefix) => {
+        const key = lang + ":" + prefix.toLowerCase();
+        if (suggestionCache.has(key)) {
+            return Promise.resolve(suggestionCache.get(key));
+        }
+        return fetch("http://localhost:8000/wiki/transliterate/?" + new URLSearchParams({prefix: prefix, lang: lang}), {
+            method: "GET",
+            headers: {
+                "Authorization": `Bearer ${localStorage.getItem("wiki-trans-token")}`
+            }
+        }).then(response => {
+            if (response.status == 401) {
+                //If the user is not authenticated, it routes to login page.
+                window.location.href = '/login';
+            }
+            return response.json()
+        }).then(data => {
+            if (data['error']) {
+                throw Error(data['error']);
+            }
+            const texts = data['candidates'].map(candidate => candidate['text']);
+            suggestionCache.set(key, texts);
+            return texts;
+        });
+    }
+
+    const handleChange = (event) => {
+        const text = event.target.value;
+        const caret = event.target.selectionStart;
+        onChangeText(text);
+        close();
+        const match = text.substring(0, caret).match(WORD_BEFORE_CARET);
+        if (!match || match[0].length > MAX_PREFIX) {
+            return;
+        }
+        const current = generation.current;
+        const typed = {start: caret - match[0].length, end: caret};
+        timer.current = setTimeout(() => {
+            fetchSuggestions(match[0]).then(texts => {
+                if (current !== generation.current) {
+                    //Text was changed again
+                    return;
+                }
+                word.current = typed;
+                setActive(0);
+                //Typed word is the last choice, so it can be kept in latin letters
+                setCandidates(texts.includes(match[0]) ? texts : texts.concat(match[0]));
+            }).catch((error) => console.log(error.message))
+        }, SUGGEST_DELAY);
+    }
+
+    //Replaces the typed word with the candidate, followed by suffix
+    const pick = (candidate, suffix) => {
+        const text = value || "";
+        const {start, end} = word.current;
+        close();
+        onChangeText(text.substring(0, start) + candidate + suffix + text.substring(end));
+        //Caret is put after the inserted word once the new text is rendered
+        const caret = start + candidate.length + suffix.length;
+        setTimeout(() => textarea.current && textarea.current.setSelectionRange(caret, caret));
+    }
+
+    const handleKeyDown = (event) => {
+        if (candidates.length === 0) {
+            return;
+        }
+        if (event.key === "ArrowDown" || event.key === "ArrowUp") {
+            event.preventDefault();
+            const step = event.key === "ArrowDown" ? 1 : candidates.length - 1;
+            setActive((active + step) % candidates.length);
+        } else if (event.key === "Enter" || event.key === "Tab" || event.key === " ") {
+            event.preventDefault();
+            pick(candidates[active], event.key === " " ? " " : "");
+        } else if (event.key === "Escape" || event.key === "ArrowLeft" || event.key === "ArrowRight") {
+            //Caret leaves the typed word
+            close();
+        }
+    }
+
+    return (
+        <div className="transliteration-container">
+            <textarea ref={textarea} value={value || ""} onChange={handleChange} onKeyDown={handleKeyDown} onBlur={close} style={style} />
+            {candidates.length > 0 && (
+                <ul className="transliteration-list">
+                    {candidates.map((candidate, index) =>
+                        //mousedown is used, as a click would first blur the textarea and close the list
+                        <li key={candidate} className={index === active ? "transliteration-item active" : "transliteration-item"}
+                            onMouseDown={(event) => { event.preventDefault(); pick(candidate, ""); }}>
+                            {candidate}
+                        </li>
+                    )}
+                </ul>
+            )}
+        </div>
+    );
+}